@@ -0,0 +1,161 @@
+# Deterministic synthetic corpus for the end-to-end benchmark: PDFs (text and
+# optionally image-only pages that force OCR), DOCX and WAV files in several
+# sizes. Run from backend/: python -m benchmarks.corpus --out /tmp/corpus
+import os
+import wave
+import random
+import zipfile
+import argparse
+import numpy as np
+from xml.sax.saxutils import escape
+
+# Units per size: pages for PDF, paragraphs for DOCX, seconds for WAV.
+SIZES={
+    "small": {"pdf": 2,"docx": 20,"wav": 15},
+    "medium": {"pdf": 20,"docx": 200,"wav": 60},
+    "large": {"pdf": 120,"docx": 1200,"wav": 300},
+}
+KINDS=("pdf","docx","wav")
+
+_vocabulary=(
+    "pump valve pressure sensor calibration maintenance schedule warranty filter bearing motor "
+    "voltage current controller firmware update reset procedure alarm threshold temperature "
+    "coolant flow rate gasket seal torque inspection report customer service ticket invoice "
+    "shipment delivery order account payment refund policy contract clause liability notice "
+    "network router switch gateway latency throughput bandwidth packet server cluster backup "
+    "storage volume snapshot replica failover region deployment release version rollback "
+    "the a of to and in for with on by from is are was be this that which when where how"
+).split()
+
+
+def make_codes(rng:random.Random,count:int=40) -> list:
+    # Identifier-like terms that exercise the keyword index.
+    return [f"ERR-{rng.randint(1000,9999)}" for _ in range(count)]+[f"PN{rng.randint(10000,99999)}" for _ in range(count)]
+
+
+def sentence(rng:random.Random,codes:list) -> str:
+    words=[rng.choice(_vocabulary) for _ in range(rng.randint(8,20))]
+    if rng.random()<0.15:
+        words.insert(rng.randrange(len(words)),rng.choice(codes))
+    return " ".join(words).capitalize()+"."
+
+
+def paragraph(rng:random.Random,codes:list) -> str:
+    return " ".join(sentence(rng,codes) for _ in range(rng.randint(3,7)))
+
+
+def write_pdf(path:str,pages:int,rng:random.Random,codes:list,scanned_every:int=0) -> None:
+    # Every scanned_every-th page is rendered to an image with no text layer.
+    import fitz
+    doc=fitz.open()
+    for number in range(pages):
+        text="\n\n".join(paragraph(rng,codes) for _ in range(4))
+        page=doc.new_page()
+        page.insert_textbox(fitz.Rect(54,54,558,738),text,fontsize=10)
+        if scanned_every and number%scanned_every==scanned_every-1:
+            pixmap=page.get_pixmap(dpi=150)
+            doc.delete_page(number)
+            scanned=doc.new_page(pno=number)
+            scanned.insert_image(scanned.rect,pixmap=pixmap)
+    doc.save(path,deflate=True)
+    doc.close()
+
+
+def write_docx(path:str,paragraphs:int,rng:random.Random,codes:list) -> None:
+    # The smallest package docx2txt (and Word) will open.
+    body="".join(
+        f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(paragraph(rng,codes))}</w:t></w:r></w:p>"
+        for _ in range(paragraphs)
+    )
+    document=(
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    content_types=(
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    relationships=(
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+        "</Relationships>"
+    )
+    with zipfile.ZipFile(path,"w",zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml",content_types)
+        archive.writestr("_rels/.rels",relationships)
+        archive.writestr("word/document.xml",document)
+
+
+def write_wav(path:str,seconds:int,rng:random.Random,sample_rate:int=16000) -> None:
+    # Speech-like bursts of modulated tones separated by short silences, so
+    # the transcriber's silence-aware splitting has real cut points.
+    generator=np.random.default_rng(rng.randint(0,2**32-1))
+    audio=np.zeros(seconds*sample_rate,dtype=np.float32)
+    position=0
+    while position<len(audio):
+        burst=int(sample_rate*generator.uniform(0.8,3.0))
+        t=np.arange(min(burst,len(audio)-position))/sample_rate
+        pitch=generator.uniform(110,260)
+        audio[position:position+len(t)]=0.3*np.sin(2*np.pi*pitch*t)*(0.6+0.4*np.sin(2*np.pi*3*t))
+        position+=burst+int(sample_rate*generator.uniform(0.2,0.8))
+    audio+=generator.normal(0,0.005,len(audio)).astype(np.float32)
+    with wave.open(path,"wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(audio,-1,1)*32767).astype(np.int16).tobytes())
+
+
+def generate(directory:str,sizes=("small","medium"),kinds=("pdf","docx"),copies:int=1,seed:int=0,scanned_every:int=0) -> dict:
+    # Returns {"files": [{path, filename, kind, size, bytes}], "codes": [...]}.
+    os.makedirs(directory,exist_ok=True)
+    rng=random.Random(seed)
+    codes=make_codes(rng)
+    files=[]
+    for size in sizes:
+        for kind in kinds:
+            for copy in range(copies):
+                filename=f"{size}_{copy}.{kind}"
+                path=os.path.join(directory,filename)
+                units=SIZES[size][kind]
+                if kind=="pdf":
+                    write_pdf(path,units,rng,codes,scanned_every)
+                elif kind=="docx":
+                    write_docx(path,units,rng,codes)
+                elif kind=="wav":
+                    write_wav(path,units,rng)
+                else:
+                    raise ValueError(f"Unknown corpus kind {kind}")
+                files.append({"path": path,"filename": filename,"kind": kind,"size": size,"bytes": os.path.getsize(path)})
+    return {"files": files,"codes": codes}
+
+
+def make_queries(count:int,codes:list,seed:int=0,keyword_share:float=0.2) -> list:
+    rng=random.Random(seed+1)
+    queries=[]
+    for _ in range(count):
+        if rng.random()<keyword_share:
+            queries.append(rng.choice(codes))
+        else:
+            queries.append(" ".join(rng.choice(_vocabulary[:60]) for _ in range(rng.randint(3,8)))+"?")
+    return queries
+
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--out",required=True)
+    parser.add_argument("--sizes",nargs="+",default=["small","medium"],choices=list(SIZES))
+    parser.add_argument("--kinds",nargs="+",default=["pdf","docx"],choices=list(KINDS))
+    parser.add_argument("--copies",type=int,default=1)
+    parser.add_argument("--seed",type=int,default=0)
+    parser.add_argument("--scanned-every",type=int,default=0,help="make every Nth PDF page image-only (needs tesseract to index)")
+    args=parser.parse_args()
+    corpus=generate(args.out,args.sizes,args.kinds,args.copies,args.seed,args.scanned_every)
+    for item in corpus["files"]:
+        print(item["filename"],item["bytes"])
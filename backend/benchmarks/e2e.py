@@ -0,0 +1,335 @@
+# End-to-end ingestion and retrieval benchmark against the local stand-ins in
+# benchmarks.fakes: single-file indexing, a multi-file ingest job and
+# concurrent /retrieve/query calls. Reports per-stage latency percentiles and
+# throughput, wall-clock latency per scenario and peak RSS, and writes JSON.
+# tiktoken's encoding file must already be cached (TIKTOKEN_CACHE_DIR); WAV
+# files additionally need whisper and ffmpeg, scanned PDF pages tesseract.
+# Run from backend/:
+#   python -m benchmarks.e2e --sizes small medium --copies 2 --queries 300 --concurrency 16 --output run.json
+#   python -m benchmarks.e2e ... --output next.json --compare run.json
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from datetime import datetime,timezone
+from benchmarks import fakes
+from benchmarks.corpus import KINDS,SIZES,generate,make_queries
+
+
+def percentiles(samples:list) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered=sorted(samples)
+
+    def at(q:float) -> float:
+        return round(ordered[min(len(ordered)-1,int(q*len(ordered)))]*1000,3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered)/len(ordered)*1000,3),
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": round(ordered[-1]*1000,3)
+    }
+
+
+class RssSampler:
+    # Peak resident set size over a block, sampled from /proc; falls back to
+    # the process-lifetime peak where /proc isn't available.
+
+    def __init__(self,interval:float=0.02):
+        self.interval=interval
+        self.peak=0
+        self._stop=threading.Event()
+        self._thread=None
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1])*os.sysconf("SC_PAGE_SIZE")
+        except (OSError,ValueError):
+            peak=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform=="darwin" else peak*1024
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak=max(self.peak,self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak=self.current()
+        self._thread=threading.Thread(target=self._run,daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self,*exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak=max(self.peak,self.current())
+
+
+class StageRecorder:
+    # Keeps every raw observation made to the app's stage histograms while
+    # active, so percentiles are exact instead of bucket estimates.
+
+    def __init__(self):
+        from utils import metrics
+        self.metrics=metrics
+        self.samples={}
+        self._originals={}
+        self._items_before={}
+        self._lock=threading.Lock()
+
+    def _wrap(self,name:str,histogram):
+        original=histogram.observe
+
+        def observe(value:float,**labels):
+            with self._lock:
+                self.samples.setdefault((name,labels.get("stage")),[]).append(value)
+            original(value,**labels)
+
+        self._originals[name]=(histogram,original)
+        histogram.observe=observe
+
+    def __enter__(self):
+        self._wrap("stage",self.metrics.stage_seconds)
+        self._wrap("query",self.metrics.query_stage_seconds)
+        self._items_before=dict(self.metrics.stage_items._values)
+        self.started=time.perf_counter()
+        return self
+
+    def __exit__(self,*exc):
+        self.seconds=time.perf_counter()-self.started
+        for histogram,original in self._originals.values():
+            histogram.observe=original
+
+    def report(self) -> dict:
+        items={
+            key[0]: value-self._items_before.get(key,0)
+            for key,value in self.metrics.stage_items._values.items()
+        }
+        stages={}
+        for (kind,stage),samples in sorted(self.samples.items()):
+            entry=percentiles(samples)
+            busy=sum(samples)
+            if kind=="stage" and items.get(stage):
+                entry["items"]=items[stage]
+                entry["items_per_busy_second"]=round(items[stage]/busy,2) if busy else None
+                entry["items_per_wall_second"]=round(items[stage]/self.seconds,2)
+            stages[f"{kind}.{stage}"]=entry
+        return stages
+
+
+def scenario_single_file(corpus:dict,workdir:str) -> dict:
+    from utils.file_index import index_file
+    latencies={}
+    total_bytes=0
+    chunks=0
+    with RssSampler() as rss,StageRecorder() as recorder:
+        for item in corpus["files"]:
+            # index_file leaves its input alone, but keep the corpus pristine anyway.
+            path=os.path.join(workdir,"single_"+item["filename"])
+            shutil.copyfile(item["path"],path)
+            start=time.perf_counter()
+            result=index_file(index_name="bench-single",filename=item["filename"],path=path,key=f"bench-single/{item['filename']}")
+            latencies.setdefault(f"{item['kind']}.{item['size']}",[]).append(time.perf_counter()-start)
+            total_bytes+=item["bytes"]
+            chunks+=result["chunks_indexed"]
+            os.remove(path)
+    return {
+        "files": len(corpus["files"]),
+        "seconds": round(recorder.seconds,3),
+        "megabytes_per_second": round(total_bytes/1e6/recorder.seconds,3),
+        "chunks": chunks,
+        "chunks_per_second": round(chunks/recorder.seconds,2),
+        "file_latency": {key: percentiles(values) for key,values in sorted(latencies.items())},
+        "stages": recorder.report(),
+        "peak_rss_mb": round(rss.peak/1e6,1)
+    }
+
+
+def scenario_multi_file(corpus:dict,workdir:str) -> dict:
+    # The same path /files/upload queues: one ingest job, files processed
+    # concurrently on the ingest pools, temp files consumed by the job.
+    from controllers.file_upload_controller import run_ingest_job
+    from utils.ingest_queue import IngestJob,get_queue
+    inputs=[]
+    for item in corpus["files"]:
+        path=os.path.join(workdir,"multi_"+item["filename"])
+        shutil.copyfile(item["path"],path)
+        inputs.append({"filename": item["filename"],"path": path})
+    job=IngestJob(index_name="bench-multi",files=inputs)
+    with RssSampler() as rss,StageRecorder() as recorder:
+        run_ingest_job(job,get_queue())
+    statuses=[f["status"] for f in job.files]
+    return {
+        "files": len(inputs),
+        "indexed": statuses.count("indexed"),
+        "failed": statuses.count("failed"),
+        "errors": sorted({f.get("error") for f in job.files if f.get("error")}),
+        "seconds": round(recorder.seconds,3),
+        "files_per_second": round(len(inputs)/recorder.seconds,3),
+        "megabytes_per_second": round(sum(item["bytes"] for item in corpus["files"])/1e6/recorder.seconds,3),
+        "stages": recorder.report(),
+        "peak_rss_mb": round(rss.peak/1e6,1)
+    }
+
+
+def scenario_queries(queries:list,concurrency:int,stream:bool) -> dict:
+    from controllers.retrieval_controller import QueryRequest,query_kb
+    latencies=[]
+    retrieval={}
+    failures=[]
+
+    async def consume(response) -> None:
+        async for _ in response.body_iterator:
+            pass
+
+    async def one(query:str,limit:asyncio.Semaphore) -> None:
+        async with limit:
+            start=time.perf_counter()
+            try:
+                response=await query_kb(QueryRequest(query=query,index_name="bench-single",stream=stream))
+                if stream:
+                    await consume(response)
+                else:
+                    kind=response["timings"].get("retrieval") or ("cache" if response["timings"].get("answer_cache")=="hit" else "unknown")
+                    retrieval[kind]=retrieval.get(kind,0)+1
+            except Exception as e:
+                failures.append(str(e))
+                return
+            latencies.append(time.perf_counter()-start)
+
+    async def run_all() -> None:
+        limit=asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(one(query,limit) for query in queries))
+
+    with RssSampler() as rss,StageRecorder() as recorder:
+        asyncio.run(run_all())
+    return {
+        "queries": len(queries),
+        "concurrency": concurrency,
+        "stream": stream,
+        "failed": len(failures),
+        "errors": sorted(set(failures))[:5],
+        "seconds": round(recorder.seconds,3),
+        "queries_per_second": round(len(latencies)/recorder.seconds,2),
+        "retrieval": retrieval,
+        "latency": percentiles(latencies),
+        "stages": recorder.report(),
+        "peak_rss_mb": round(rss.peak/1e6,1)
+    }
+
+
+def git_revision() -> str|None:
+    try:
+        return subprocess.run(["git","rev-parse","HEAD"],capture_output=True,text=True,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+
+def compare(current:dict,previous:dict) -> list:
+    # One line per metric present in both runs: previous -> current (change).
+    lines=[]
+
+    def walk(a,b,path:str):
+        if isinstance(a,dict) and isinstance(b,dict):
+            for key in a:
+                if key in b:
+                    walk(a[key],b[key],f"{path}.{key}" if path else key)
+        elif isinstance(a,(int,float)) and isinstance(b,(int,float)) and not isinstance(a,bool):
+            if path.endswith(("_ms","_per_second","seconds","peak_rss_mb")) and b:
+                lines.append(f"{path}: {b} -> {a} ({(a-b)/b*100:+.1f}%)")
+
+    walk(current["scenarios"],previous.get("scenarios",{}),"")
+    return lines
+
+
+def main() -> None:
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--sizes",nargs="+",default=["small","medium"],choices=list(SIZES))
+    parser.add_argument("--kinds",nargs="+",default=["pdf","docx"],choices=list(KINDS))
+    parser.add_argument("--copies",type=int,default=2)
+    parser.add_argument("--scanned-every",type=int,default=0)
+    parser.add_argument("--queries",type=int,default=200)
+    parser.add_argument("--concurrency",type=int,default=16)
+    parser.add_argument("--stream",action="store_true",help="also run the query scenario over SSE")
+    parser.add_argument("--scenarios",nargs="+",default=["single_file","multi_file","queries"],choices=["single_file","multi_file","queries"])
+    parser.add_argument("--embedding-latency",type=float,default=0.05)
+    parser.add_argument("--vector-latency",type=float,default=0.01)
+    parser.add_argument("--storage-latency",type=float,default=0.02)
+    parser.add_argument("--llm-latency",type=float,default=0.2)
+    parser.add_argument("--answer-cache",action="store_true")
+    parser.add_argument("--seed",type=int,default=0)
+    parser.add_argument("--workdir",default=None,help="scratch directory (default: a fresh temp dir, removed afterwards)")
+    parser.add_argument("--output",default=None)
+    parser.add_argument("--compare",default=None,help="earlier JSON result to diff against")
+    args=parser.parse_args()
+
+    workdir=args.workdir or tempfile.mkdtemp(prefix="rag-bench-")
+    try:
+        fakes.install(
+            workdir,
+            llm_latency=args.llm_latency,
+            storage_latency=args.storage_latency,
+            vector_latency=args.vector_latency,
+            answer_cache=args.answer_cache
+        )
+        from utils.embeddings import EmbeddingEngine,FakeEmbeddingBackend,set_engine
+        from utils.embedding_cache import get_cache
+        set_engine(EmbeddingEngine(FakeEmbeddingBackend(latency=args.embedding_latency),cache=get_cache()))
+
+        started=time.perf_counter()
+        corpus=generate(os.path.join(workdir,"corpus"),args.sizes,args.kinds,args.copies,args.seed,args.scanned_every)
+        corpus_seconds=time.perf_counter()-started
+
+        scenarios={}
+        if "single_file" in args.scenarios or "queries" in args.scenarios:
+            # The query scenario searches what this one indexed.
+            scenarios["single_file"]=scenario_single_file(corpus,workdir)
+        if "multi_file" in args.scenarios:
+            scenarios["multi_file"]=scenario_multi_file(corpus,workdir)
+        if "queries" in args.scenarios:
+            queries=make_queries(args.queries,corpus["codes"],args.seed)
+            scenarios["queries"]=scenario_queries(queries,args.concurrency,stream=False)
+            if args.stream:
+                scenarios["queries_stream"]=scenario_queries(queries,args.concurrency,stream=True)
+
+        result={
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": vars(args),
+            "corpus": {
+                "files": [{k: item[k] for k in ("filename","kind","size","bytes")} for item in corpus["files"]],
+                "generation_seconds": round(corpus_seconds,3)
+            },
+            "scenarios": scenarios
+        }
+        text=json.dumps(result,indent=2,default=str)
+        if args.output:
+            with open(args.output,"w") as f:
+                f.write(text)
+        print(text)
+        if args.compare:
+            with open(args.compare) as f:
+                print("\n".join(compare(result,json.load(f))))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir,ignore_errors=True)
+
+
+if __name__=='__main__':
+    main()
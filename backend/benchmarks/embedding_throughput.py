@@ -0,0 +1,35 @@
+# Offline embedding throughput check against the fake backend.
+# Run from backend/: python -m benchmarks.embedding_throughput --chunks 2000 --latency 0.05
+import argparse
+import time
+from utils.embeddings import EmbeddingEngine,FakeEmbeddingBackend
+
+
+def run(chunks:int,chunk_chars:int,latency:float,concurrency:int,batch_size:int) -> dict:
+    texts=[f"chunk {i} "+("lorem ipsum dolor sit amet "*(chunk_chars//27+1))[:chunk_chars] for i in range(chunks)]
+    results={}
+    for label,size,workers in (("serial",1,1),("batched",batch_size,concurrency)):
+        backend=FakeEmbeddingBackend(latency=latency)
+        engine=EmbeddingEngine(backend,batch_size=size,concurrency=workers)
+        start=time.perf_counter()
+        embeddings=engine.embed(texts)
+        elapsed=time.perf_counter()-start
+        assert len(embeddings)==len(texts)
+        results[label]={
+            "seconds": round(elapsed,3),
+            "requests": backend.calls,
+            "chunks_per_second": round(len(texts)/elapsed,1)
+        }
+    return results
+
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--chunks",type=int,default=1000)
+    parser.add_argument("--chunk-chars",type=int,default=2000)
+    parser.add_argument("--latency",type=float,default=0.05,help="simulated seconds per request")
+    parser.add_argument("--concurrency",type=int,default=4)
+    parser.add_argument("--batch-size",type=int,default=256)
+    args=parser.parse_args()
+    for label,stats in run(args.chunks,args.chunk_chars,args.latency,args.concurrency,args.batch_size).items():
+        print(label,stats)
@@ -0,0 +1,165 @@
+# Local stand-ins for OpenAI, Pinecone, Supabase Storage and Gemini so the
+# app can be benchmarked offline. install() must run before any app module is
+# imported: it puts the fakes in the service registry and points every
+# on-disk cache at a scratch directory.
+import os
+import sys
+import time
+import shutil
+import asyncio
+import hashlib
+from types import SimpleNamespace
+
+
+def _answer(prompt:str,tokens:int) -> list:
+    seed=hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return [f"tok{seed[i%len(seed)]}{i}" for i in range(tokens)]
+
+
+class FakeChatCompletions:
+
+    def __init__(self,latency:float,tokens:int,token_latency:float):
+        self.latency=latency
+        self.tokens=tokens
+        self.token_latency=token_latency
+        self.calls=0
+
+    def _stream(self,words:list):
+        for word in words:
+            time.sleep(self.token_latency)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word+" "))])
+
+    def create(self,model:str,messages:list,stream:bool=False,**kwargs):
+        self.calls+=1
+        time.sleep(self.latency)
+        words=_answer(messages[-1]["content"],self.tokens)
+        if stream:
+            return self._stream(words)
+        time.sleep(self.token_latency*len(words))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" ".join(words)))])
+
+
+class FakeAsyncChatCompletions(FakeChatCompletions):
+
+    async def _astream(self,words:list):
+        for word in words:
+            await asyncio.sleep(self.token_latency)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word+" "))])
+
+    async def create(self,model:str,messages:list,stream:bool=False,**kwargs):
+        self.calls+=1
+        await asyncio.sleep(self.latency)
+        words=_answer(messages[-1]["content"],self.tokens)
+        if stream:
+            return self._astream(words)
+        await asyncio.sleep(self.token_latency*len(words))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" ".join(words)))])
+
+
+class FakeOpenAI:
+
+    def __init__(self,completions):
+        self.chat=SimpleNamespace(completions=completions)
+
+
+class FakeBucket:
+    # One directory per bucket; objects are plain files under it.
+
+    def __init__(self,root:str,name:str,latency:float):
+        self.root=os.path.join(root,name)
+        self.name=name
+        self.latency=latency
+
+    def upload(self,path:str,file,file_options=None):
+        time.sleep(self.latency)
+        target=os.path.join(self.root,path)
+        os.makedirs(os.path.dirname(target),exist_ok=True)
+        if isinstance(file,(bytes,bytearray)):
+            with open(target,"wb") as f:
+                f.write(file)
+        elif isinstance(file,(str,os.PathLike)):
+            shutil.copyfile(file,target)
+        else:
+            with open(target,"wb") as f:
+                shutil.copyfileobj(file,f,1<<20)
+        return SimpleNamespace(path=path,full_path=f"{self.name}/{path}")
+
+    def create_signed_urls(self,paths:list,expires_in:int):
+        time.sleep(self.latency)
+        expires=int(time.time())+expires_in
+        return [
+            {"path": path,"signedURL": f"file://{os.path.join(self.root,path)}?expires={expires}","error": None}
+            for path in paths
+        ]
+
+
+class FakeSupabase:
+
+    def __init__(self,root:str,latency:float):
+        self.root=root
+        self.latency=latency
+        self.storage=SimpleNamespace(from_=lambda name: FakeBucket(root,name,latency))
+
+
+class FakeGemini:
+
+    def __init__(self,latency:float):
+        self.latency=latency
+
+        async def agenerate(model:str,contents,**kwargs):
+            await asyncio.sleep(self.latency)
+            return SimpleNamespace(text="a synthetic caption")
+
+        def generate(model:str,contents,**kwargs):
+            time.sleep(self.latency)
+            return SimpleNamespace(text="a synthetic caption")
+
+        self.models=SimpleNamespace(generate_content=generate)
+        self.aio=SimpleNamespace(models=SimpleNamespace(generate_content=agenerate))
+
+
+def install(
+    workdir:str,
+    llm_latency:float=0.2,
+    llm_tokens:int=60,
+    llm_token_latency:float=0.002,
+    storage_latency:float=0.02,
+    vector_latency:float=0.01,
+    gemini_latency:float=0.3,
+    answer_cache:bool=False
+) -> dict:
+    if "utils.file_index" in sys.modules:
+        raise RuntimeError("benchmarks.fakes.install() must run before the app is imported")
+    cache=os.path.join(workdir,"cache")
+    os.environ.update({
+        "EMBEDDING_BACKEND": "fake",
+        "VECTOR_STORE": "pinecone",
+        "EMBEDDING_CACHE_DIR": os.path.join(cache,"embeddings"),
+        "INDEX_MANIFEST_DIR": os.path.join(cache,"manifests"),
+        "KEYWORD_INDEX_DIR": os.path.join(cache,"keyword_index"),
+        "ANSWER_CACHE_DIR": os.path.join(cache,"answer_cache"),
+        "ANSWER_CACHE_ENABLED": "true" if answer_cache else "false",
+        "UPLOAD_SPOOL_DIR": os.path.join(workdir,"spool"),
+        "SUPABASE_BUCKET": "files_rag",
+    })
+
+    from services.registry import registry
+    from utils.memory_index import InMemoryClient,InMemoryIndex
+
+    class FakePinecone(InMemoryClient):
+        def create_index(self,name:str,dimension:int,metric:str="cosine",spec=None,**kwargs) -> None:
+            with self._lock:
+                if name in self._indexes:
+                    raise ValueError(f"Index {name} already exists")
+                self._indexes[name]=InMemoryIndex(dimension=dimension,latency=vector_latency)
+
+    fakes={
+        "openai": FakeOpenAI(FakeChatCompletions(llm_latency,llm_tokens,llm_token_latency)),
+        "async_openai": FakeOpenAI(FakeAsyncChatCompletions(llm_latency,llm_tokens,llm_token_latency)),
+        "supabase": FakeSupabase(os.path.join(workdir,"bucket"),storage_latency),
+        "gemini": FakeGemini(gemini_latency),
+        "pinecone": FakePinecone(),
+    }
+    for name,fake in fakes.items():
+        registry.set(name,fake)
+    return fakes
@@ -0,0 +1,123 @@
+# Cold-start report for a server worker: wall time and RSS to import the app,
+# the slowest modules by cumulative import time (python -X importtime), and
+# optionally the load time of each lazy registry entry. Each measurement runs
+# in a fresh interpreter. Exits non-zero when a budget is exceeded, so it can
+# gate CI as features are added.
+# Run from backend/:
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup --warm all --max-import-seconds 1.5 --max-rss-mb 200 --output startup.json
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+_probe="""
+import json,os,sys,time,resource
+start=time.perf_counter()
+import server
+seconds=time.perf_counter()-start
+def rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1])*os.sysconf("SC_PAGE_SIZE")
+    except (OSError,ValueError):
+        peak=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform=="darwin" else peak*1024
+result={"import_seconds": seconds,"rss_bytes": rss(),"modules": len(sys.modules)}
+from services.registry import registry
+result["registered"]=registry.names()
+warm=json.loads(sys.argv[1])
+if warm:
+    start=time.perf_counter()
+    result["warm_loaded"]=registry.warm_up(warm)
+    result["warm_seconds"]=time.perf_counter()-start
+    result["warm_rss_bytes"]=rss()
+print(json.dumps(result))
+"""
+
+
+def probe(prelude:list,warm:list) -> dict:
+    code="\n".join(f"import {module}" for module in prelude)+_probe
+    output=subprocess.run([sys.executable,"-c",code,json.dumps(warm)],capture_output=True,text=True,check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(prelude:list,top:int) -> list:
+    # -X importtime writes "import time: self [us] | cumulative | imported package" to stderr.
+    code="\n".join(f"import {module}" for module in prelude+["server"])
+    stderr=subprocess.run([sys.executable,"-X","importtime","-c",code],capture_output=True,text=True,check=True).stderr
+    rows=[]
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts=[part.strip() for part in line[len("import time:"):].split("|")]
+        if not parts[0].isdigit():
+            continue
+        name=parts[2]
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name)-len(name.lstrip()))//2,
+            "self_ms": int(parts[0])/1000,
+            "cumulative_ms": int(parts[1])/1000
+        })
+    # First-party modules plus the heaviest third-party roots they pull in.
+    rows.sort(key=lambda row: row["cumulative_ms"],reverse=True)
+    return rows[:top]
+
+
+def main() -> None:
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--top",type=int,default=25)
+    parser.add_argument("--runs",type=int,default=3,help="fresh-interpreter import runs; the median is reported")
+    parser.add_argument("--warm",nargs="*",default=[],help='registry names to load after import ("all" for every one)')
+    parser.add_argument("--prelude",nargs="*",default=[],help="modules imported before the app (e.g. test shims)")
+    parser.add_argument("--max-import-seconds",type=float,default=None)
+    parser.add_argument("--max-rss-mb",type=float,default=None)
+    parser.add_argument("--output",default=None)
+    args=parser.parse_args()
+
+    runs=[probe(args.prelude,[]) for _ in range(max(1,args.runs))]
+    runs.sort(key=lambda run: run["import_seconds"])
+    median=runs[len(runs)//2]
+    report={
+        "python": sys.version.split()[0],
+        "import_seconds": round(median["import_seconds"],3),
+        "import_seconds_runs": [round(run["import_seconds"],3) for run in runs],
+        "rss_mb": round(median["rss_bytes"]/1e6,1),
+        "modules": median["modules"],
+        "registered": median["registered"],
+        "slowest_imports": import_profile(args.prelude,args.top)
+    }
+    if args.warm:
+        warmed=probe(args.prelude,args.warm)
+        report["warm_up"]={
+            "seconds": round(warmed["warm_seconds"],3),
+            "loaded": warmed["warm_loaded"],
+            "rss_mb": round(warmed["warm_rss_bytes"]/1e6,1)
+        }
+
+    print(f"import server: {report['import_seconds']}s (runs {report['import_seconds_runs']}), RSS {report['rss_mb']} MB, {report['modules']} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for row in report["slowest_imports"]:
+        print(f"{row['cumulative_ms']:>14.1f} {row['self_ms']:>9.1f}  {'  '*row['depth']}{row['module']}")
+    if args.warm:
+        print(f"warm-up: {report['warm_up']['seconds']}s, RSS {report['warm_up']['rss_mb']} MB")
+        for name,seconds in report["warm_up"]["loaded"].items():
+            print(f"{seconds:>14.3f}s  {name}")
+    if args.output:
+        with open(args.output,"w") as f:
+            json.dump(report,f,indent=2)
+
+    failures=[]
+    if args.max_import_seconds is not None and report["import_seconds"]>args.max_import_seconds:
+        failures.append(f"import took {report['import_seconds']}s, budget {args.max_import_seconds}s")
+    if args.max_rss_mb is not None and report["rss_mb"]>args.max_rss_mb:
+        failures.append(f"RSS after import is {report['rss_mb']} MB, budget {args.max_rss_mb} MB")
+    for failure in failures:
+        print(f"over budget: {failure}",file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,136 @@
+# Typeahead load on UserSearch over a synthetic profiles table (1M rows by
+# default) held in memory. The stand-in for search_profiles answers prefix
+# queries by bisect and substring queries by scanning, in the function's
+# order and with its keyset semantics, and adds a fixed round-trip latency.
+# Reports round trips per keystroke, cache hit rate and per-keystroke latency,
+# and checks every cached answer against the stand-in.
+# The Postgres side (query plans on 1M rows) is in benchmarks/user_search.sql.
+# Run from backend/: python -m benchmarks.user_search --rows 1000000 --sessions 1000
+import time
+import random
+import bisect
+import argparse
+from utils.user_search import UserSearch,sort_key
+
+_s1=["al","be","ca","da","el","fa","gi","ha","is","jo","ka","li","ma","ni","ol","pa","ra","sa","ta","vi"]
+_s2=["an","ber","cy","den","ex","fin","gar","hal","ice","jan","kin","lor","mon","nor","ory"]
+_s3=["a","o","us","ie","en","er","ia","y"]
+
+
+def make_profiles(rows:int) -> list:
+    # Same shape as the rows benchmarks/user_search.sql generates.
+    profiles=[]
+    for i in range(1,rows+1):
+        s1,s2,s3=_s1[(i*7)%20],_s2[(i*13)%15],_s3[(i*31)%8]
+        username=f"{s1}{s2}{s3}".capitalize() if i%5==0 else f"{s1}{s2}{s3}"
+        profiles.append({"id": str(i),"username": f"{username}_{i}","name": (s1+s2).capitalize()})
+    profiles.sort(key=sort_key)
+    return profiles
+
+
+class FakeProfiles:
+
+    def __init__(self,profiles:list,latency:float,min_contains:int):
+        self.profiles=profiles
+        self.keys=[sort_key(row) for row in profiles]
+        self.lowered=[key[0] for key in self.keys]
+        # One string in result order; substring scans are str.find over it.
+        self.text="\n".join(self.lowered)+"\n"
+        self.offsets=[]
+        position=0
+        for name in self.lowered:
+            self.offsets.append(position)
+            position+=len(name)+1
+        self.latency=latency
+        self.min_contains=min_contains
+        self.calls=0
+
+    def fetch(self,query:str,after:str|None,limit:int) -> list:
+        self.calls+=1
+        time.sleep(self.latency)
+        return self.query(query,after,limit)
+
+    def query(self,query:str,after:str|None,limit:int) -> list:
+        start=bisect.bisect_right(self.keys,(after.lower(),after)) if after is not None else 0
+        if len(query)<self.min_contains:
+            start=max(start,bisect.bisect_left(self.lowered,query))
+            rows=[]
+            for row,name in zip(self.profiles[start:start+limit],self.lowered[start:start+limit]):
+                if not name.startswith(query):
+                    break
+                rows.append(row)
+            return rows
+        rows=[]
+        position=self.offsets[start] if start<len(self.offsets) else len(self.text)
+        while len(rows)<limit:
+            found=self.text.find(query,position)
+            if found<0:
+                break
+            index=bisect.bisect_right(self.offsets,found)-1
+            rows.append(self.profiles[index])
+            position=self.offsets[index+1] if index+1<len(self.offsets) else len(self.text)
+        return rows
+
+
+def percentiles(samples:list) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered=sorted(samples)
+    at=lambda q: round(ordered[min(len(ordered)-1,int(q*len(ordered)))]*1000,3)
+    return {"count": len(ordered),"p50_ms": at(0.5),"p95_ms": at(0.95),"p99_ms": at(0.99),"max_ms": round(ordered[-1]*1000,3)}
+
+
+def main() -> None:
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--rows",type=int,default=1_000_000)
+    parser.add_argument("--sessions",type=int,default=1000)
+    parser.add_argument("--max-typed",type=int,default=8)
+    parser.add_argument("--page-share",type=float,default=0.1,help="share of keystrokes followed by a next-page request")
+    parser.add_argument("--limit",type=int,default=10)
+    parser.add_argument("--db-latency",type=float,default=0.002)
+    parser.add_argument("--prefetch",type=int,default=100)
+    parser.add_argument("--seed",type=int,default=0)
+    args=parser.parse_args()
+
+    started=time.perf_counter()
+    profiles=make_profiles(args.rows)
+    db=FakeProfiles(profiles,args.db_latency,min_contains=3)
+    print(f"generated {len(profiles)} profiles in {time.perf_counter()-started:.1f}s")
+
+    search=UserSearch(fetch=db.fetch,min_contains=3,prefetch=args.prefetch,ttl=3600,max_entries=50_000)
+    rng=random.Random(args.seed)
+    hit_latency=[]
+    miss_latency=[]
+    requests=0
+    mismatches=0
+    for _ in range(args.sessions):
+        target=rng.choice(profiles)["username"].lower()
+        for typed in range(1,min(len(target),args.max_typed)+1):
+            query=target[:typed]
+            pages=[None]
+            if rng.random()<args.page_share:
+                pages.append("next")
+            cursor=None
+            for page in pages:
+                if page=="next" and cursor is None:
+                    break
+                calls=db.calls
+                start=time.perf_counter()
+                result=search.search(query,limit=args.limit,after=cursor)
+                elapsed=time.perf_counter()-start
+                requests+=1
+                (miss_latency if db.calls>calls else hit_latency).append(elapsed)
+                expected=db.query(query,cursor,args.limit)
+                if [row["id"] for row in result]!=[row["id"] for row in expected]:
+                    mismatches+=1
+                cursor=result[-1]["username"] if len(result)==args.limit else None
+
+    print(f"requests: {requests}, round trips: {db.calls} ({db.calls/requests:.3f} per request)")
+    print(f"cache hits: {search.hits} ({search.hits/requests:.1%}), misses: {search.misses}")
+    print(f"hit latency:  {percentiles(hit_latency)}")
+    print(f"miss latency: {percentiles(miss_latency)}")
+    print(f"mismatches against the uncached query: {mismatches}")
+
+
+if __name__=='__main__':
+    main()
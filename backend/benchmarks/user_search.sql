@@ -0,0 +1,78 @@
+-- User search against a synthetic 1M-row profiles table, old query shape vs
+-- the indexed ones public.search_profiles runs. Uses a scratch schema; drop it
+-- afterwards with DROP SCHEMA bench_user_search CASCADE.
+-- psql "$DATABASE_URL" -f benchmarks/user_search.sql
+\timing on
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+DROP SCHEMA IF EXISTS bench_user_search CASCADE;
+CREATE SCHEMA bench_user_search;
+
+CREATE TABLE bench_user_search.profiles (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  name text,
+  username text
+);
+
+-- Pronounceable names from a small syllable set plus a unique suffix, so
+-- short prefixes match many rows and longer ones narrow quickly; one in
+-- five is capitalized.
+INSERT INTO bench_user_search.profiles (name, username)
+SELECT
+  initcap(s1 || s2),
+  CASE WHEN i % 5 = 0 THEN initcap(s1 || s2 || s3) ELSE s1 || s2 || s3 END || '_' || i
+FROM (
+  SELECT
+    i,
+    (array['al','be','ca','da','el','fa','gi','ha','is','jo','ka','li','ma','ni','ol','pa','ra','sa','ta','vi'])[1 + (i * 7) % 20] AS s1,
+    (array['an','ber','cy','den','ex','fin','gar','hal','ice','jan','kin','lor','mon','nor','ory'])[1 + (i * 13) % 15] AS s2,
+    (array['a','o','us','ie','en','er','ia','y'])[1 + (i * 31) % 8] AS s3
+  FROM generate_series(1, 1000000) AS i
+) AS g;
+
+CREATE UNIQUE INDEX ON bench_user_search.profiles (username) WHERE username IS NOT NULL;
+CREATE INDEX bench_profiles_username_search
+  ON bench_user_search.profiles ((lower(username) COLLATE "C"), (username COLLATE "C"))
+  WHERE username IS NOT NULL;
+CREATE INDEX bench_profiles_username_trgm
+  ON bench_user_search.profiles USING gin (lower(username) gin_trgm_ops)
+  WHERE username IS NOT NULL;
+VACUUM ANALYZE bench_user_search.profiles;
+
+-- Before: substring ILIKE with OFFSET paging (page 10 of a common term).
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT id, username, name FROM bench_user_search.profiles
+WHERE username ILIKE '%al%' LIMIT 10 OFFSET 90;
+
+-- Before: a rare term has to scan everything.
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT id, username, name FROM bench_user_search.profiles
+WHERE username ILIKE '%zzq%' LIMIT 10 OFFSET 0;
+
+-- After, short query: prefix range on the btree, first page.
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT p.id, p.username, p.name FROM bench_user_search.profiles p
+WHERE p.username IS NOT NULL AND lower(p.username) COLLATE "C" LIKE 'al%'
+ORDER BY lower(p.username) COLLATE "C", p.username COLLATE "C"
+LIMIT 10;
+
+-- After, short query: a deep page by keyset cursor costs the same as the first.
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT p.id, p.username, p.name FROM bench_user_search.profiles p
+WHERE p.username IS NOT NULL AND lower(p.username) COLLATE "C" LIKE 'al%'
+  AND (lower(p.username) COLLATE "C", p.username COLLATE "C") > ('alhalus_500000' COLLATE "C", 'alhalus_500000' COLLATE "C")
+ORDER BY lower(p.username) COLLATE "C", p.username COLLATE "C"
+LIMIT 10;
+
+-- After, 3+ characters: substring match through the trigram index.
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT p.id, p.username, p.name FROM bench_user_search.profiles p
+WHERE p.username IS NOT NULL AND lower(p.username) LIKE '%berie%'
+ORDER BY lower(p.username) COLLATE "C", p.username COLLATE "C"
+LIMIT 10;
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT p.id, p.username, p.name FROM bench_user_search.profiles p
+WHERE p.username IS NOT NULL AND lower(p.username) LIKE '%zzq%'
+ORDER BY lower(p.username) COLLATE "C", p.username COLLATE "C"
+LIMIT 10;
@@ -0,0 +1,49 @@
+# Load-tests VectorWriter against the in-memory index stand-in.
+# Run from backend/: python -m benchmarks.vector_writer_load --vectors 20000 --latency 0.05 --failure-rate 0.05
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from utils.memory_index import InMemoryIndex
+from utils.vector_writer import VectorWriter
+
+
+def make_vectors(count:int,dimension:int,text_chars:int) -> list:
+    rng=np.random.default_rng(0)
+    values=rng.standard_normal((count,dimension),dtype=np.float32)
+    return [
+        {
+            "id": f"doc.pdf_chunk_{i}",
+            "values": values[i].tolist(),
+            "metadata": {"filename": "doc.pdf","filekey": "general/doc.pdf","chunk_index": i,"text": "x"*text_chars}
+        }
+        for i in range(count)
+    ]
+
+
+def run(vectors:int,dimension:int,text_chars:int,latency:float,failure_rate:float,concurrency:int) -> dict:
+    index=InMemoryIndex(dimension=dimension,latency=latency,failure_rate=failure_rate,seed=0)
+    writer=VectorWriter(index,executor=ThreadPoolExecutor(max_workers=concurrency),backoff_base=0.01)
+    report=writer.upsert(make_vectors(vectors,dimension,text_chars))
+    seconds=sorted(t["seconds"] for t in report["batch_timings"])
+    return {
+        "vectors": report["vectors"],
+        "batches": report["batches"],
+        "retries": report["retries"],
+        "seconds": report["seconds"],
+        "vectors_per_second": round(report["vectors"]/report["seconds"],1),
+        "batch_p50": seconds[len(seconds)//2],
+        "batch_max": seconds[-1],
+        "stored": index.describe_index_stats()["total_vector_count"]
+    }
+
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--vectors",type=int,default=5000)
+    parser.add_argument("--dimension",type=int,default=1536)
+    parser.add_argument("--text-chars",type=int,default=2000)
+    parser.add_argument("--latency",type=float,default=0.05,help="simulated seconds per request")
+    parser.add_argument("--failure-rate",type=float,default=0.0)
+    parser.add_argument("--concurrency",type=int,default=4)
+    args=parser.parse_args()
+    print(run(args.vectors,args.dimension,args.text_chars,args.latency,args.failure_rate,args.concurrency))
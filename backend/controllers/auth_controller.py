@@ -1,8 +1,12 @@
 from services.supabase import supabase
-from fastapi import APIRouter,HTTPException,status,Response
+from fastapi import APIRouter,HTTPException,status,Response,Request,Depends
+from utils.user_search import get_user_search
+from utils.auth import ACCESS_TOKEN_COOKIE,REFRESH_TOKEN_COOKIE,get_current_user,get_verifier,set_session_cookies
 from pydantic import BaseModel
+import logging
 
 router=APIRouter(prefix="/auth",tags=["auth"])
+logger=logging.getLogger(__name__)
 
 class UserRequest(BaseModel):
     email:str
@@ -26,11 +30,13 @@ def signup(body: UserRequest):
                 }
             }
         })
-        print(response.user)
+        logger.debug("Signed up user: %s",response.user.id if response.user else None)
+        # The new profile should be searchable right away on this worker.
+        get_user_search().clear()
 
         return {"message": "User registered successfully", "user": response.user.user_metadata}
     except Exception as e:
-        print(e)
+        logger.warning("Signup failed: %s",e)
         raise HTTPException(status_code=500,detail=str(e))
 
 @router.post('/login',status_code=status.HTTP_200_OK)
@@ -46,22 +52,7 @@ def login(body: UserRequest,res:Response):
             'email': email,
             'password': password
         })
-        res.set_cookie(
-            key="access_token",
-            value=response.session.access_token,
-            httponly=True,
-            samesite="Lax",
-            secure=False,
-            max_age=3600
-        )
-        res.set_cookie(
-            key="refresh_token",
-            value=response.session.refresh_token,
-            httponly=True,
-            samesite="Lax",
-            secure=False,
-            max_age=3600*24*30
-        )
+        set_session_cookies(res,response.session.access_token,response.session.refresh_token)
         return {"message": "User logged in successfully", "user": response.user.user_metadata}
     except Exception as e:
         raise HTTPException(status_code=500,detail=str(e))
@@ -69,33 +60,32 @@ def login(body: UserRequest,res:Response):
 
 
 @router.post('/logout', status_code=status.HTTP_200_OK)
-def logout():
+def logout(request:Request,res:Response):
     try:
         supabase.auth.sign_out()
+        token=request.cookies.get(ACCESS_TOKEN_COOKIE)
+        if token:
+            get_verifier().forget(token)
+        res.delete_cookie(ACCESS_TOKEN_COOKIE)
+        res.delete_cookie(REFRESH_TOKEN_COOKIE)
         return {"message": "User logged out successfully"}
     except Exception as e:
         raise HTTPException(status_code=500,detail=str(e))
     
 
 @router.get('/user', status_code=status.HTTP_200_OK)
-def get_user():
-    try:
-        user = supabase.auth.get_user()
-        print(user)
-        if user is None or user.user is None:
-            raise HTTPException(status_code=404,detail="User not found. Check your authentication.")
-        return {"user": user.user.user_metadata}
-    except Exception as e:
-        raise HTTPException(status_code=500,detail=str(e))
+async def get_user(user: dict = Depends(get_current_user)):
+    # Answered from the verified access-token claims; no call to Supabase.
+    return {"user": user.get("user_metadata") or {}}
     
 
 
 @router.delete('/delete_user', status_code=status.HTTP_200_OK)
-def delete_user():
+def delete_user(res:Response,user: dict = Depends(get_current_user)):
     try:
-        supabase.auth.admin.delete_user(
-            #get user id via middleware or other means
-        )
+        supabase.auth.admin.delete_user(user["sub"])
+        res.delete_cookie(ACCESS_TOKEN_COOKIE)
+        res.delete_cookie(REFRESH_TOKEN_COOKIE)
         return {"message": "User deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500,detail=str(e))
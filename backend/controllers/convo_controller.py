@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, status, Depends
 from services.supabase import supabase
+from utils.auth import get_current_user
 from pydantic import BaseModel
+import logging
 
 router = APIRouter(prefix="/convo", tags=["conversations"])
+logger = logging.getLogger(__name__)
 
 class ConversationCreateRequest(BaseModel):
     name: str
@@ -13,19 +16,21 @@ class ConversationCreateRequest(BaseModel):
 
 @router.post('/create', status_code=status.HTTP_201_CREATED)
 def create_conversation(
-    body: ConversationCreateRequest
+    body: ConversationCreateRequest,
+    user: dict = Depends(get_current_user)
 ):
+    owner_id=body.owner_id or user["sub"]
+    if owner_id!=user["sub"]:
+        raise HTTPException(status_code=403, detail="Conversations can only be created for yourself")
     try:
-        #auth status verify to be done
         response=supabase.table("conversations").insert({
             "type": "group" if body.group else "direct",
             "name": body.name,
-            "owner_id": body.owner_id,
+            "owner_id": owner_id,
             "description": body.description if body.description else ""
         }).execute()
-        print("Created")
         row=response.data[0]
-        print("Row:",row)
+        logger.debug("Created conversation: %s",row)
         rows=    [{
                 "user_id": member,
                 "conversation_id": row["id"],
@@ -36,28 +41,32 @@ def create_conversation(
         supabase.table("conversation_members").insert( 
             rows
         ).execute()
-        return {"message": "Conversation created successfully","name":body.name,"members":body.members,"owner_id":body.owner_id}
+        return {"message": "Conversation created successfully","name":body.name,"members":body.members,"owner_id":owner_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete('/delete/{conversation_id}', status_code=status.HTTP_200_OK)
 def delete_conversation(
-    conversation_id: str
+    conversation_id: str,
+    user: dict = Depends(get_current_user)
 ):
     try:
-        #user auth status verify to be done
-        supabase.table("conversations").delete().eq("id", conversation_id).execute()
-        return {"message": "Conversation deleted successfully", "conversation_id": conversation_id}
+        response=supabase.table("conversations").delete().eq("id", conversation_id).eq("owner_id", user["sub"]).execute()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Conversation not found or not owned by you")
+    return {"message": "Conversation deleted successfully", "conversation_id": conversation_id}
 
 @router.delete('/leave/{conversation_id}/user/{user_id}', status_code=status.HTTP_200_OK)
 def leave_conversation(
     conversation_id: str,
-    user_id: str
+    user_id: str,
+    user: dict = Depends(get_current_user)
 ):
+    if user_id!=user["sub"]:
+        raise HTTPException(status_code=403, detail="You can only remove yourself from a conversation")
     try:
-        #user auth status verify to be done
         supabase.table("conversation_members").delete().eq("conversation_id", conversation_id).eq("user_id", user_id).execute()
         return {"message": "Left conversation successfully", "conversation_id": conversation_id, "user_id": user_id}
     except Exception as e:
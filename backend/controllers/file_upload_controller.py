@@ -1,13 +1,22 @@
 # from flask import Blueprint,request,jsonify
-from fastapi import APIRouter,UploadFile,File,Form,HTTPException,status
-from utils.file_index import index_file,index_image_caption
+from fastapi import APIRouter,UploadFile,File,Form,HTTPException,Request,Response,status
+from utils.file_index import index_file,prepare_chunks,upload_and_index_image
 from utils.upload_to_bucket import upload_to_bucket
+from utils.ingest_queue import INGEST_FILE_CONCURRENCY,IngestJob,get_queue,get_cpu_pool,get_io_pool
+from utils.upload_spool import spool_upload,remove_spooled
+from utils.index_registry import check_index_name
+from utils.auth import get_current_user
+from utils.conversation_access import require_room_member
 import os
+import logging
+import asyncio
+import functools
 from typing import List
 from dotenv import load_dotenv
 load_dotenv()
 
 SUPABASE_BUCKET=os.getenv("SUPABASE_BUCKET")
+logger=logging.getLogger(__name__)
 
 router=APIRouter(prefix="/files",tags=["file_handling"])
 
@@ -22,51 +31,130 @@ def allowed_image_file(filename):
 
 
 
-@router.post('/upload',status_code=status.HTTP_200_OK)
+def upload_file_to_bucket(path:str,filename:str,index_name:str)->str:
+    # The storage client streams an open file handle instead of buffering it.
+    with open(path,"rb") as f:
+        res=upload_to_bucket(bucket_name=SUPABASE_BUCKET,file_obj=f,file_name=filename,index_name=index_name)
+    filekey=res.full_path
+
+    if filekey.startswith(f"{SUPABASE_BUCKET}"):
+        filekey=filekey[len(f"{SUPABASE_BUCKET}/"):]
+    return filekey
+
+
+async def ingest_one(job,queue,position:int,item:dict,limit:asyncio.Semaphore)->None:
+    filename=item["filename"]
+    path=item["path"]
+    loop=asyncio.get_running_loop()
+    try:
+        async with limit:
+            job.update_file(position,status="uploading")
+            queue.notify(job)
+            # The upload and the extraction don't depend on each other; both
+            # must finish before the temp file can go, even if one fails.
+            upload,prepared=await asyncio.gather(
+                loop.run_in_executor(get_io_pool(),upload_file_to_bucket,path,filename,job.index_name),
+                loop.run_in_executor(get_cpu_pool(),prepare_chunks,job.index_name,filename,path),
+                return_exceptions=True
+            )
+            for outcome in (upload,prepared):
+                if isinstance(outcome,BaseException):
+                    raise outcome
+            filekey=upload
+            source_hash,chunks=prepared
+
+            job.update_file(position,status="indexing",filekey=filekey)
+            queue.notify(job)
+            result=await loop.run_in_executor(
+                get_io_pool(),
+                functools.partial(index_file,index_name=job.index_name,filename=filename,path=path,key=filekey,chunks=chunks,source_hash=source_hash)
+            )
+            job.update_file(position,status="indexed",chunks_indexed=result["chunks_indexed"])
+    except Exception as e:
+        job.update_file(position,status="failed",error=str(e))
+        logger.warning("Error indexing file %s: %s",filename,e)
+    finally:
+        remove_spooled(path)
+    queue.notify(job)
+
+
+def run_ingest_job(job,queue):
+    # Runs on an ingest queue worker; files of the job go through the CPU and
+    # IO pools at most INGEST_FILE_CONCURRENCY at a time.
+    async def ingest_all():
+        limit=asyncio.Semaphore(INGEST_FILE_CONCURRENCY)
+        await asyncio.gather(*(
+            ingest_one(job,queue,position,item,limit)
+            for position,item in enumerate(job.inputs)
+        ))
+    try:
+        asyncio.run(ingest_all())
+    finally:
+        remove_spooled(*(item["path"] for item in job.inputs))
+
+
+@router.post('/upload',status_code=status.HTTP_202_ACCEPTED)
 async def upload_files(
+    request: Request,
+    response: Response,
     files: List[UploadFile]=File(...),
-    index_name: str = Form('general')
+    index_name: str = Form('general'),
+    room: str | None = Form(None)
 ):
 
     if not files:
         raise HTTPException(status_code=400,detail="No files part in the request")
-    
-    results=[]
-    for upload_file in files:
-
-        if upload_file.filename == '':
-            results.append({"filename": upload_file.filename, "status": "No selected file"})
-            continue
-
-        if not allowed_file(upload_file.filename):
-            results.append({"filename": upload_file.filename, "status": "File type not allowed"})
-            continue
+    try:
+        check_index_name(index_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400,detail=str(e))
+    if room:
+        # Progress events go to every member of the room.
+        await require_room_member(room,await get_current_user(request,response))
 
-        else:
-            try:
-                print(upload_file.filename)
-                file_bytes=upload_file.read()
-                res=upload_to_bucket(bucket_name=SUPABASE_BUCKET,file_obj=file_bytes,file_name=upload_file.filename,index_name=index_name)
-                print(res)
-                filekey=res.full_path
-
-                if filekey.startswith(f"{SUPABASE_BUCKET}"):
-                    filekey=filekey[len(f"{SUPABASE_BUCKET}/"):]
-
-                print("File key:",filekey)
-                index_file(index_name=index_name,file=upload_file,key=filekey)
-                results.append({"filename": upload_file.filename, "status": "File uploaded and indexed successfully", "filekey": filekey})
-                print("File indexed successfully.")
-            
-            except Exception as e:
-                results.append({"filename": upload_file.filename, "status": f"Failed to index file: {str(e)}"})
-                print(f"Error indexing file {upload_file.filename}: {str(e)}")
-
-    return {"results": results}
+    results=[]
+    accepted=[]
+    try:
+        for upload_file in files:
+
+            if upload_file.filename == '':
+                results.append({"filename": upload_file.filename, "status": "No selected file"})
+                continue
+
+            if not allowed_file(upload_file.filename):
+                results.append({"filename": upload_file.filename, "status": "File type not allowed"})
+                continue
+
+            ext=upload_file.filename.rsplit('.',1)[1].lower()
+            path=await spool_upload(upload_file,suffix=f".{ext}")
+            accepted.append({"filename": upload_file.filename,"path": path})
+            results.append({"filename": upload_file.filename, "status": "queued"})
+    except BaseException:
+        remove_spooled(*(item["path"] for item in accepted))
+        raise
+
+    if not accepted:
+        return {"job_id": None,"results": results}
+
+    job=IngestJob(index_name=index_name,files=accepted,room=room,loop=asyncio.get_running_loop())
+    try:
+        get_queue().submit(job,run_ingest_job)
+    except BaseException:
+        remove_spooled(*(item["path"] for item in accepted))
+        raise
+    return {"job_id": job.id,"status": job.status,"results": results}
+
+
+@router.get('/jobs/{job_id}',status_code=status.HTTP_200_OK)
+def get_job(job_id: str):
+    job=get_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404,detail="Job not found")
+    return job.to_dict()
 
 
 @router.post('/upload_images',status_code=status.HTTP_200_OK)
-def upload_images(
+async def upload_images(
     files:List[UploadFile]=File(...),
     captions:List[str]=Form(...),
     index_name:str=Form('general')
@@ -74,31 +162,41 @@ def upload_images(
 
     if not files:
         return {"error": "No image part in the request"}, 400
-    results=[]
+    try:
+        check_index_name(index_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400,detail=str(e))
+    results=[None]*len(files)
+    loop=asyncio.get_running_loop()
+    limit=asyncio.Semaphore(INGEST_FILE_CONCURRENCY)
+
+    async def process(i:int,file:UploadFile):
+        try:
+            async with limit:
+                logger.debug("Uploading image %s",file.filename)
+                img_bytes=await file.read()
+                await loop.run_in_executor(get_io_pool(),upload_and_index_image,img_bytes,file.filename,captions[i],index_name)
+            results[i]={"filename": file.filename, "status": "Image uploaded and indexed successfully"}
+            logger.debug("Image %s indexed successfully.",file.filename)
+
+        except Exception as e:
+            results[i]={"filename": file.filename, "status": f"Failed to index image: {str(e)}"}
+            logger.warning("Error indexing image %s: %s",file.filename,e)
+
+    pending=[]
     for i,file in enumerate(files):
 
         if file.filename == '':
-            results.append({"filename": file.filename, "status": "No selected file"})
+            results[i]={"filename": file.filename, "status": "No selected file"}
             continue
 
         if not allowed_image_file(file.filename):
-            results.append({"filename": file.filename, "status": "Image file type not allowed"})
+            results[i]={"filename": file.filename, "status": "Image file type not allowed"}
             continue
 
-        else:
-            try:
-                print(file.filename)
-                img_bytes=file.read()
-                res=upload_to_bucket(bucket_name="files_rag",file_obj=img_bytes,file_name=file.filename,index_name=index_name)
-                filekey=res.full_path
-                index_image_caption(index_name=index_name,filename=file.filename,caption=captions[i],key=filekey)
-                results.append({"filename": file.filename, "status": "Image uploaded and indexed successfully"})
-                print("Image indexed successfully.")
-            
-            except Exception as e:
-                results.append({"filename": file.filename, "status": f"Failed to index image: {str(e)}"})
-                print(f"Error indexing image {file.filename}: {str(e)}")
+        pending.append(process(i,file))
 
+    await asyncio.gather(*pending)
     return {"results": results}
 
 
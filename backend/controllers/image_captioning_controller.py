@@ -1,14 +1,56 @@
 from services.gemini import client as gemini_client
-from google.genai.types import Part,Content
-from fastapi import APIRouter,UploadFile,File,HTTPException,status
+from fastapi import APIRouter,UploadFile,File,Form,HTTPException,status
+from utils.image_prep import prepare_image
+from utils.ingest_queue import get_cpu_pool,get_io_pool
+from utils.metrics import span
+from utils.index_registry import check_index_name
+from utils.file_index import upload_and_index_image
+import os
+import asyncio
+import logging
+from typing import List
+from dotenv import load_dotenv
+load_dotenv()
+
+CAPTION_MODEL=os.getenv("CAPTION_MODEL","gemini-2.5-flash-lite")
+# Gemini calls in flight at once across all caption requests.
+CAPTION_CONCURRENCY=int(os.getenv("CAPTION_CONCURRENCY","8"))
+CAPTION_PROMPT="Generate a accurate and concise caption for this image which should capture the full meaning of the image."
 
 router=APIRouter(prefix="/images",tags=["image_captioning"])
+logger=logging.getLogger(__name__)
+_caption_limit=asyncio.Semaphore(CAPTION_CONCURRENCY)
 
 allowed_extensions={"png", "jpg", "jpeg", "gif"}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.',1)[1].lower() in allowed_extensions
 
 
+async def generate_caption(img_bytes:bytes)->str:
+    from google.genai.types import Part,Content
+    loop=asyncio.get_running_loop()
+    with span("image_prep"):
+        data,mime_type=await loop.run_in_executor(get_cpu_pool(),prepare_image,img_bytes)
+
+    content=[
+        Content(
+            parts=[
+                Part.from_bytes(data=data,mime_type=mime_type),
+                Part.from_text(text=CAPTION_PROMPT)
+            ]
+        )
+    ]
+
+    async with _caption_limit:
+        with span("caption"):
+            response=await gemini_client.aio.models.generate_content(
+                model=CAPTION_MODEL,
+                contents=content
+            )
+
+    return response.text.strip() if response.text else "No caption generated."
+
+
 @router.post('/caption', status_code=status.HTTP_200_OK)
 async def caption_image(
     image: UploadFile = File(...)
@@ -20,24 +62,49 @@ async def caption_image(
 
     try:
         img_bytes=await image.read()
+        caption=await generate_caption(img_bytes)
+        return {"filename": image.filename, "caption": caption}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to caption image: {str(e)}")
 
-        content=[
-            Content(
-                parts=[
-                    Part.from_bytes(data=img_bytes,mime_type=image.content_type),
-                    Part.from_text(text="Generate a accurate and concise caption for this image which should capture the full meaning of the image.")
-                ]
-            )
-        ]
 
-        response=gemini_client.models.generate_content(
-            model="gemini-2.5-flash-lite",
-            contents=content
-        )
+@router.post('/caption/batch', status_code=status.HTTP_200_OK)
+async def caption_images(
+    images: List[UploadFile] = File(...),
+    index: bool = Form(False),
+    index_name: str = Form('general')
+):
+    # Captions every image concurrently (bounded by CAPTION_CONCURRENCY) and,
+    # with index=true, uploads each image and indexes its caption as soon as
+    # that caption is ready. Results keep the order of the request.
+    if not images:
+        raise HTTPException(status_code=400, detail="No image part in the request")
+    if index:
+        try:
+            check_index_name(index_name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        caption=response.text.strip() if response.text else "No caption generated."
-        return {"filename": image.filename, "caption": caption}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to caption image: {str(e)}")   
-    
+    loop=asyncio.get_running_loop()
+
+    async def process(image:UploadFile)->dict:
+        if not allowed_file(image.filename):
+            return {"filename": image.filename, "status": "File type not allowed"}
+        try:
+            img_bytes=await image.read()
+            caption=await generate_caption(img_bytes)
+        except Exception as e:
+            logger.warning("Error captioning image %s: %s",image.filename,e)
+            return {"filename": image.filename, "status": f"Failed to caption image: {str(e)}"}
+        result={"filename": image.filename, "caption": caption, "status": "captioned"}
+        if index:
+            try:
+                await loop.run_in_executor(get_io_pool(),upload_and_index_image,img_bytes,image.filename,caption,index_name)
+                result["status"]="indexed"
+            except Exception as e:
+                logger.warning("Error indexing image %s: %s",image.filename,e)
+                result["status"]=f"Failed to index image: {str(e)}"
+        return result
 
+    results=await asyncio.gather(*(process(image) for image in images))
+    return {"results": results}
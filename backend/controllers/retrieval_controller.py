@@ -1,20 +1,196 @@
-from fastapi import APIRouter
-from utils.file_index import generate_embeddings,get_index
-from utils.retrieval_utils import prepare_query,generate_prompt,generate_response,generate_presigned_urls
+from fastapi import APIRouter,HTTPException,Request,Response
+from fastapi.responses import StreamingResponse
+from utils.file_index import get_index
+from utils.index_registry import check_index_name
+from utils.embeddings import aembed_texts
+from utils.answer_cache import get_answer_cache
+from utils.keyword_index import get_keyword_index,is_keyword_query,reciprocal_rank_fusion
+from utils.context_builder import build_context
+from utils.retrieval_utils import generate_prompt,generate_response_async,generate_response_stream_async,generate_presigned_urls
+from utils.metrics import METRICS_ENABLED,query_stage_seconds
+from utils.auth import get_current_user
+from utils.conversation_access import require_room_member
+from services.realtime import sio
 import os
+import json
+import time
+import uuid
+import asyncio
 from dotenv import load_dotenv
 from pydantic import BaseModel
 load_dotenv()
 
 SUPABASE_BUCKET=os.getenv("SUPABASE_BUCKET")
 router=APIRouter(prefix="/retrieve",tags=["retrieval"])
+TOP_K=5
+# Holds references so room streams aren't garbage collected mid-answer.
+_background_tasks=set()
 
 class QueryRequest(BaseModel):
     query: str
     index_name: str
+    stream: bool = False
+    room: str | None = None
+
+
+async def timed(timings:dict,stage:str,awaitable):
+    start=time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        record(timings,stage,start)
+
+
+def record(timings:dict,stage:str,start:float)->None:
+    elapsed=time.perf_counter()-start
+    timings[stage]=round(elapsed*1000,2)
+    if METRICS_ENABLED:
+        query_stage_seconds.observe(elapsed,stage=stage)
+
+
+def to_hit(doc_id:str,metadata:dict,**scores)->dict:
+    return {
+        'id': doc_id,
+        **scores,
+        'filekey': metadata.get('filekey'),
+        'filename': metadata.get('filename'),
+        'chunk_index': metadata.get('chunk_index'),
+        'text': metadata.get('text'),
+    }
+
+
+def fuse_hits(matches,keyword_results:list)->list:
+    # Reciprocal rank fusion of dense matches (above the 0.5 cosine floor) and
+    # BM25 results; 'score' is the fused score.
+    dense={m.id: m for m in matches if m.score>=0.5}
+    keyword={r["id"]: r for r in keyword_results}
+    fused=reciprocal_rank_fusion([list(dense),list(keyword)])[:TOP_K]
+    hits=[]
+    for doc_id,score in fused:
+        match=dense.get(doc_id)
+        result=keyword.get(doc_id)
+        metadata=match.metadata if match is not None else result["metadata"]
+        hits.append(to_hit(
+            doc_id,
+            metadata,
+            score=score,
+            vector_score=match.score if match is not None else None,
+            keyword_score=result["score"] if result is not None else None
+        ))
+    return hits
+
+
+async def keyword_search(query:str,index_name:str,timings:dict)->list:
+    def search()->list:
+        # Nothing indexed under this name yet: no hits, and no file created.
+        index=get_keyword_index(index_name,create=False)
+        return index.search(query,top_k=TOP_K*2) if index is not None else []
+    return await timed(timings,"keyword_query",asyncio.to_thread(search))
+
+
+async def embed_and_resolve(query:str,index_name:str,timings:dict)->tuple:
+    # Embedding the query and resolving the index handle don't depend on each other.
+    query_embedding,index=await asyncio.gather(
+        timed(timings,"embed",aembed_texts([query])),
+        timed(timings,"get_index",asyncio.to_thread(get_index,index_name))
+    )
+    return query_embedding[0],index
+
+
+async def vector_search(index,query_embedding:list,timings:dict)->list:
+    results=await timed(timings,"vector_query",asyncio.to_thread(
+        index.query,
+        vector=query_embedding,
+        top_k=TOP_K*2,
+        include_metadata=True,
+        include_values=True,
+    ))
+    return results.matches
+
+
+def remember_answer(index_name:str,query:str,query_embedding:list,hits:list,response:str)->None:
+    cache=get_answer_cache()
+    if cache is not None:
+        cache.store(index_name,query,query_embedding,{"response": response,"sources": hits})
+
+
+async def replay(answer:str):
+    yield answer
+
+
+def presign_sources(hits:list)->list:
+    return generate_presigned_urls(
+        bucket_name=SUPABASE_BUCKET,
+        object_keys=list({hit['filekey'] for hit in hits}),
+        expiration_time=3600
+    )
+
+def start_presign(hits:list,timings:dict)->asyncio.Task:
+    # URL signing runs alongside the LLM call instead of after it.
+    return asyncio.create_task(timed(timings,"presign",asyncio.to_thread(presign_sources,hits)))
+
+
+def sse_event(event:str,data)->str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_answer(deltas,presign:asyncio.Task,timings:dict,started:float):
+    # Yields ("sources", urls) once signing finishes, then ("delta", text) per
+    # token and finally ("done", answer). The first token is requested before
+    # waiting on the signing task so both round trips overlap.
+    first=asyncio.create_task(anext(deltas,None))
+    try:
+        presigned_urls=await presign
+    except Exception:
+        first.cancel()
+        raise
+    yield "sources",presigned_urls
+    answer=[]
+    delta=await first
+    if delta is not None:
+        record(timings,"first_token",started)
+    while delta is not None:
+        answer.append(delta)
+        yield "delta",delta
+        delta=await anext(deltas,None)
+    record(timings,"total",started)
+    yield "done","".join(answer)
+
+
+async def stream_sse(query:str,hits:list,deltas,timings:dict,started:float,on_done=None):
+    presign=start_presign(hits,timings)
+    try:
+        async for kind,value in stream_answer(deltas,presign,timings,started):
+            if kind=="sources":
+                yield sse_event("sources",{"query": query,"sources": hits,"presigned_urls": value})
+            elif kind=="delta":
+                yield sse_event("delta",{"content": value})
+            else:
+                if on_done:
+                    on_done(value)
+                yield sse_event("done",{"response": value,"timings": timings})
+    except Exception as e:
+        yield sse_event("error",{"detail": str(e)})
+
+
+async def stream_to_room(room:str,query_id:str,query:str,hits:list,deltas,timings:dict,started:float,on_done=None)->None:
+    presign=start_presign(hits,timings)
+    try:
+        async for kind,value in stream_answer(deltas,presign,timings,started):
+            if kind=="sources":
+                await sio.emit('query_sources',{"query_id": query_id,"query": query,"sources": hits,"presigned_urls": value},room=room)
+            elif kind=="delta":
+                await sio.emit('query_delta',{"query_id": query_id,"content": value},room=room)
+            else:
+                if on_done:
+                    on_done(value)
+                await sio.emit('query_done',{"query_id": query_id,"response": value,"timings": timings},room=room)
+    except Exception as e:
+        await sio.emit('query_error',{"query_id": query_id,"detail": str(e)},room=room)
+
 
 @router.post('/query')
-def query_kb(body: QueryRequest):
+async def query_kb(body: QueryRequest,request: Request,response: Response):
     query=body.query
     index_name=body.index_name
 
@@ -23,44 +199,92 @@ def query_kb(body: QueryRequest):
 
     if not index_name:
         return {"error": "Index name is required"}, 400
-    
-    print("Entering retrieval pipeline")
-    
-    query_embedding=generate_embeddings(query)
-    index=get_index(index_name)
+    try:
+        check_index_name(index_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400,detail=str(e))
+    if body.room:
+        # Streaming into a room reaches every member, so only members may.
+        await require_room_member(body.room,await get_current_user(request,response))
 
-    results=index.query(
-        vector=query_embedding,
-        top_k=5,
-        include_metadata=True,
-    )
-    print("Retrieved results: ")
-    results=[m for m in results.matches if m.score>=0.5]
-    hits=[]
-    for match in results:
-        hits.append({
-            'score': match.score,
-            'filekey': match.metadata.get('filekey'),
-            'filename': match.metadata.get('filename'),
-            'chunk_index': match.metadata.get('chunk_index'),
-            'text': match.metadata.get('text'),
-        })
-    print("Hits generated")
-    context=prepare_query(hits)
-    prompt=generate_prompt(context,query)
-    response=generate_response(prompt)
-    presigned_urls=generate_presigned_urls(
-        bucket_name=SUPABASE_BUCKET,
-        object_keys=list({hit['filekey'] for hit in hits}),
-        expiration_time=3600
-    )
+    started=time.perf_counter()
+    timings={}
+    cached=None
+    hits=None
+    keyword_results=None
+    vectors={}
+    if is_keyword_query(query):
+        # Codes and part numbers: if the keyword index knows them, no embedding call at all.
+        keyword_results=await keyword_search(query,index_name,timings)
+        if keyword_results:
+            hits=fuse_hits([],keyword_results)
+            timings["retrieval"]="keyword"
+
+    if hits is None:
+        searches=[embed_and_resolve(query,index_name,timings)]
+        if keyword_results is None:
+            searches.append(keyword_search(query,index_name,timings))
+        results=await asyncio.gather(*searches)
+        query_embedding,index=results[0]
+        keyword_results=results[1] if len(results)>1 else keyword_results
+
+        answer_cache=get_answer_cache()
+        cached=answer_cache.lookup(index_name,query_embedding) if answer_cache else None
+        timings["answer_cache"]="hit" if cached else "miss"
+        if cached:
+            hits=cached["sources"]
+        else:
+            matches=await vector_search(index,query_embedding,timings)
+            vectors={m.id: m.values for m in matches if m.values}
+            hits=fuse_hits(matches,keyword_results)
+            timings["retrieval"]="hybrid"
+
+    on_done=None
+    if not cached:
+        context=build_context(hits,vectors)
+        timings["context_tokens"]=context["tokens"]
+        prompt=generate_prompt(context["text"],query)
+        if timings["retrieval"]=="hybrid":
+            on_done=lambda response: remember_answer(index_name,query,query_embedding,hits,response)
+
+    def answer_deltas():
+        if cached:
+            return replay(cached["response"])
+        return generate_response_stream_async(prompt)
+
+    if body.stream:
+        return StreamingResponse(
+            stream_sse(query,hits,answer_deltas(),timings,started,on_done),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache","X-Accel-Buffering": "no"}
+        )
+
+    if body.room:
+        query_id=uuid.uuid4().hex
+        task=asyncio.create_task(stream_to_room(
+            body.room,query_id,query,hits,answer_deltas(),timings,started,on_done
+        ))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return {"query_id": query_id,"query": query,"sources": hits,"streaming": True,"room": body.room}
+
+    presign=start_presign(hits,timings)
+    if cached:
+        response=cached["response"]
+    else:
+        try:
+            response=await timed(timings,"llm",generate_response_async(prompt))
+        except Exception:
+            presign.cancel()
+            raise
+        if on_done:
+            on_done(response)
+    presigned_urls=await presign
+    record(timings,"total",started)
     return {
         "query": query,
         "response": response,
         "sources": hits,
-        "presigned_urls": presigned_urls
+        "presigned_urls": presigned_urls,
+        "timings": timings
     }
-
-
-
-
@@ -1,24 +1,26 @@
 from fastapi import APIRouter,HTTPException,status,Query
-from services.supabase import supabase
+from utils.user_search import get_user_search
+import logging
 
 router=APIRouter(prefix="/users",tags=["users"])  
+logger=logging.getLogger(__name__)
 
 
 @router.get('/search',status_code=status.HTTP_200_OK)
 def search_users(
     query:str = Query(...,min_length=1,max_length=15),
-    limit: int = 10,
-    skip: int = 0
+    limit: int = Query(10,ge=1,le=50),
+    after: str | None = Query(None,description="username of the last result of the previous page")
 ):
 
     if not query:
-        return {"users": []}
-    print(query)
+        return {"users": [],"next": None}
     try:
-        response=supabase.table("profiles").select("id, username, name").filter("username","ilike",f"%{query}%").limit(limit).offset(skip*limit).execute()
-        print("Search response:",response)
+        users=get_user_search().search(query,limit=limit,after=after)
+        logger.debug("Search for %r returned %d users",query,len(users))
 
     except Exception as e:
         raise HTTPException(status_code=500,detail=str(e))
     
-    return {"users": response.data}
+    # Keyset cursor: pass it back as `after` for the next page.
+    return {"users": users,"next": users[-1]["username"] if len(users)==limit else None}
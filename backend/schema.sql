@@ -126,3 +126,57 @@ AFTER DELETE ON auth.users
 FOR EACH ROW
 EXECUTE PROCEDURE public.handle_user_deletion();
 
+
+
+-- User search: prefix lookups walk this btree in (lower(username), username)
+-- order, which is also the keyset cursor order; "C" collation lets LIKE 'abc%'
+-- become an index range. Substring lookups (3+ characters) use the trigram index.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_profiles_username_search
+  ON public.profiles ((lower(username) COLLATE "C"), (username COLLATE "C"))
+  WHERE username IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_profiles_username_trgm
+  ON public.profiles USING gin (lower(username) gin_trgm_ops)
+  WHERE username IS NOT NULL;
+
+-- Built as dynamic SQL so every call is planned with the literal pattern:
+-- a cached generic plan can't turn LIKE 'abc%' into an index range.
+CREATE OR REPLACE FUNCTION public.search_profiles(
+  search_query text,
+  after_username text DEFAULT NULL,
+  result_limit int DEFAULT 10,
+  min_contains_length int DEFAULT 3
+)
+RETURNS TABLE (id uuid, username text, name text)
+LANGUAGE plpgsql
+STABLE
+SET search_path = public
+AS $$
+DECLARE
+  pattern text := replace(replace(replace(lower(search_query), '\', '\\'), '%', '\%'), '_', '\_');
+  match_clause text;
+  after_clause text := '';
+BEGIN
+  IF length(search_query) < min_contains_length THEN
+    match_clause := format('lower(p.username) COLLATE "C" LIKE %L', pattern || '%');
+  ELSE
+    match_clause := format('lower(p.username) LIKE %L', '%' || pattern || '%');
+  END IF;
+  IF after_username IS NOT NULL THEN
+    after_clause := format(
+      'AND (lower(p.username) COLLATE "C", p.username COLLATE "C") > (%L COLLATE "C", %L COLLATE "C")',
+      lower(after_username), after_username
+    );
+  END IF;
+  RETURN QUERY EXECUTE format(
+    'SELECT p.id, p.username, p.name
+     FROM public.profiles p
+     WHERE p.username IS NOT NULL AND %s %s
+     ORDER BY lower(p.username) COLLATE "C", p.username COLLATE "C"
+     LIMIT %s',
+    match_clause, after_clause, greatest(1, least(result_limit, 1000))
+  );
+END;
+$$;
@@ -4,18 +4,45 @@ from controllers.file_upload_controller import router as file_upload_router
 from controllers.image_captioning_controller import router as image_captioning_router
 from controllers.user_controller import router as user_router
 from controllers.convo_controller import router as convo_router
-from fastapi import FastAPI
+from controllers.retrieval_controller import router as retrieval_router
+from fastapi import FastAPI,Request
 from fastapi.middleware.cors import CORSMiddleware
-import socketio
+from fastapi.responses import PlainTextResponse
 from socketio import ASGIApp
+from socketio.exceptions import ConnectionRefusedError
+from services.realtime import sio
+from services.registry import WARMUP,WARMUP_BLOCKING,registry
+from utils.metrics import METRICS_ENABLED,http_request_seconds,render as render_metrics
+from utils.auth import get_verifier,socket_token
+from utils.conversation_access import can_use_room,is_uuid
+from utils.message_store import MESSAGE_TYPES,get_message_writer,message_row
+from contextlib import asynccontextmanager
+from datetime import datetime,timezone
+import os
+import time
+import uuid
+import asyncio
+import logging
+import jwt
 
-sio=socketio.AsyncServer(
-    cors_allowed_origins=[],
-    cors_credentials=True,
-    engineio_logger=True,
-    async_mode='asgi'
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL","INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
 )
-app=FastAPI()
+logger=logging.getLogger("server")
+
+@asynccontextmanager
+async def lifespan(app:FastAPI):
+    # Clients and models load on first use; WARMUP names what to load up front.
+    if WARMUP:
+        warm=asyncio.get_running_loop().run_in_executor(None,registry.warm_up,WARMUP)
+        if WARMUP_BLOCKING:
+            await warm
+    yield
+    # Messages still in the write-behind buffer go out before the worker exits.
+    await get_message_writer().close()
+
+app=FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,45 +53,121 @@ app.add_middleware(
 )
 
 @sio.event
-async def connect(sid,environ):
-    print(f"Client connected: {sid}")
+async def connect(sid,environ,auth=None):
+    # Same access token as the HTTP API; the verified sub is the only sender
+    # identity this socket gets.
+    token=socket_token(environ,auth)
+    if not token:
+        raise ConnectionRefusedError("Not authenticated")
+    verifier=get_verifier()
+    claims=verifier.cached(token)
+    if claims is None:
+        try:
+            claims=await asyncio.to_thread(verifier.verify,token)
+        except jwt.PyJWKClientConnectionError as e:
+            logger.error("Could not load signing keys: %s",e)
+            raise ConnectionRefusedError("Authentication unavailable")
+        except jwt.PyJWTError as e:
+            logger.debug("Rejected socket token: %s",e)
+            raise ConnectionRefusedError("Invalid access token")
+    await sio.save_session(sid,{"user_id": claims["sub"]})
+    logger.debug("Client connected: %s (user %s)",sid,claims["sub"])
 
 @sio.event
 async def join_room(sid,data):
-    room=data.get('room')
-    if room:
-        await sio.enter_room(sid,room)
-        print(f"Client {sid} joined room: {room}")
+    # Rooms are conversation ids; only members may join.
+    room=data.get('room') if isinstance(data,dict) else None
+    if not room:
+        return
+    user_id=(await sio.get_session(sid)).get("user_id")
+    try:
+        allowed=await can_use_room(room,user_id)
+    except Exception as e:
+        logger.error("Membership check for room %s failed: %s",room,e)
+        await sio.emit('join_error',{"room": room,"detail": "Could not check conversation membership"},to=sid)
+        return
+    if not allowed:
+        await sio.emit('join_error',{"room": room,"detail": "Not a member of this conversation"},to=sid)
+        return
+    await sio.enter_room(sid,room)
+    logger.debug("Client %s joined room: %s",sid,room)
 
 @sio.event
 async def leave_room(sid,data):
-    room=data.get('room')
+    room=data.get('room') if isinstance(data,dict) else None
     if room:
         await sio.leave_room(sid,room)
-        print(f"Client {sid} left room: {room}")
+        logger.debug("Client %s left room: %s",sid,room)
 
 @sio.event
 async def message(sid,data):
-    print(f"Message from {sid}: {data}")
-    await sio.emit('message',data)
+    # Delivered to the conversation's room only (the sender must have joined
+    # it, which checked membership), then queued for a batched insert into
+    # messages. The sender is the socket's verified user, never the payload's.
+    room=data.get('room') if isinstance(data,dict) else None
+    if not room or room not in sio.rooms(sid):
+        await sio.emit('message_error',{"detail": "Join the conversation room before sending messages"},to=sid)
+        return
+    if (data.get('type') or "text") not in MESSAGE_TYPES:
+        await sio.emit('message_error',{"detail": f"Message type must be one of {', '.join(MESSAGE_TYPES)}"},to=sid)
+        return
+    if not isinstance(data.get('content'),(str,type(None))):
+        await sio.emit('message_error',{"detail": "Message content must be a string"},to=sid)
+        return
+    reply_to=data.get('reply_to_message_id')
+    if reply_to is not None and not is_uuid(reply_to):
+        await sio.emit('message_error',{"detail": "reply_to_message_id must be a message id"},to=sid)
+        return
+    user_id=(await sio.get_session(sid)).get("user_id")
+    logger.debug("Message from %s to room %s",sid,room)
+    message_id=str(uuid.uuid4())
+    created_at=datetime.now(timezone.utc).isoformat()
+    row=message_row(room,user_id,data,message_id,created_at)
+    get_message_writer().add(row)
+    await sio.emit('message',{**row,"room": room},room=room)
 
 @sio.event
 async def disconnect(sid):
-    print(f"Client disconnected: {sid}")
+    logger.debug("Client disconnected: %s",sid)
 
 
 
+@app.middleware("http")
+async def record_request_latency(request:Request,call_next):
+    start=time.perf_counter()
+    status_code=500
+    try:
+        response=await call_next(request)
+        status_code=response.status_code
+        return response
+    finally:
+        if METRICS_ENABLED:
+            # Route templates keep the label set small (/files/jobs/{job_id}, not every id).
+            route=request.scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter()-start,
+                method=request.method,
+                route=getattr(route,"path","unmatched"),
+                status=status_code
+            )
+
+
 @app.get('/')
 def home():
     return {"message":"API is working"}
 
+@app.get('/metrics',include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(),media_type="text/plain; version=0.0.4")
+
 app.include_router(auth_router)
 app.include_router(file_upload_router)
 app.include_router(image_captioning_router)
 app.include_router(user_router)
 app.include_router(convo_router)
+app.include_router(retrieval_router)
 
 socket_app=ASGIApp(sio,other_asgi_app=app)
 
 if __name__=='__main__':
-    print("Server is running")
\ No newline at end of file
+    logger.info("Server is running")
\ No newline at end of file
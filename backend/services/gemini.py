@@ -1,9 +1,13 @@
-from google import genai
+from services.registry import lazy
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 GEMINI_API_KEY=os.getenv("GEMINI_API_KEY")
-client=genai.Client(api_key=GEMINI_API_KEY)
 
+def _gemini_client():
+    from google import genai
+    return genai.Client(api_key=GEMINI_API_KEY)
+
+client=lazy("gemini",_gemini_client)
@@ -1,9 +1,17 @@
-from openai import OpenAI
+from services.registry import lazy
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
 OPENAI_KEY=os.getenv("OPENAI_API_KEY")
-openai_client=OpenAI(api_key=OPENAI_KEY)
 
+def _openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_KEY)
 
+def _async_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=OPENAI_KEY)
+
+openai_client=lazy("openai",_openai_client)
+async_openai_client=lazy("async_openai",_async_openai_client)
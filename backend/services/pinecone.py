@@ -1,7 +1,12 @@
-from pinecone import Pinecone
+from services.registry import lazy
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
 PINECONE_KEY=os.getenv("PINECONE_API_KEY")
-pc=Pinecone(api_key=PINECONE_KEY)
\ No newline at end of file
+
+def _pinecone_client():
+    from pinecone import Pinecone
+    return Pinecone(api_key=PINECONE_KEY)
+
+pc=lazy("pinecone",_pinecone_client)
@@ -0,0 +1,23 @@
+import os
+import socketio
+from dotenv import load_dotenv
+load_dotenv()
+
+# With REDIS_URL set, rooms and emits are shared through Redis pub/sub so any
+# number of Uvicorn workers can serve the same conversation. Without it the
+# default in-process manager is used (single worker, tests).
+REDIS_URL=os.getenv("REDIS_URL")
+SOCKETIO_CHANNEL=os.getenv("SOCKETIO_CHANNEL","socketio")
+
+def make_client_manager():
+    if REDIS_URL:
+        return socketio.AsyncRedisManager(REDIS_URL,channel=SOCKETIO_CHANNEL)
+    return socketio.AsyncManager()
+
+sio=socketio.AsyncServer(
+    cors_allowed_origins=[],
+    cors_credentials=True,
+    engineio_logger=True,
+    async_mode='asgi',
+    client_manager=make_client_manager()
+)
@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+logger=logging.getLogger(__name__)
+
+# Comma-separated registry names to load in the background when the server
+# starts ("all" for everything registered), e.g. WARMUP=supabase,openai,tokenizer.
+WARMUP=[name.strip() for name in os.getenv("WARMUP","").split(",") if name.strip()]
+# Hold startup until warm-up finishes instead of serving while it runs.
+WARMUP_BLOCKING=os.getenv("WARMUP_BLOCKING","false").lower()=="true"
+
+
+class LazyRegistry:
+    # Named SDK clients and heavy modules, built on first get() so a worker
+    # only pays for what its requests touch. Each name has its own lock so a
+    # slow load (whisper) never holds up a fast one (supabase).
+
+    def __init__(self):
+        self._factories={}
+        self._locks={}
+        self._values={}
+        self._load_seconds={}
+        self._lock=threading.Lock()
+
+    def register(self,name:str,factory) -> None:
+        with self._lock:
+            self._factories[name]=factory
+            self._locks.setdefault(name,threading.Lock())
+
+    def get(self,name:str):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        if name not in self._factories:
+            raise KeyError(f"Nothing registered as {name!r}")
+        with self._locks[name]:
+            if name not in self._values:
+                start=time.perf_counter()
+                self._values[name]=self._factories[name]()
+                self._load_seconds[name]=time.perf_counter()-start
+                logger.info("Loaded %s in %.2fs",name,self._load_seconds[name])
+        return self._values[name]
+
+    def set(self,name:str,value) -> None:
+        # Tests and benchmarks swap in stand-ins before first use.
+        with self._lock:
+            self._locks.setdefault(name,threading.Lock())
+            self._values[name]=value
+
+    def names(self) -> list:
+        return sorted(self._factories)
+
+    def loaded(self) -> dict:
+        return {name: round(self._load_seconds.get(name,0.0),4) for name in sorted(self._values)}
+
+    def warm_up(self,names:list|None=None) -> dict:
+        if names is None or "all" in names:
+            names=self.names()
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning("Warm-up of %s failed: %s",name,e)
+        return self.loaded()
+
+
+class LazyProxy:
+    # Module-level stand-in for a registry entry, so `from services.supabase
+    # import supabase` stays cheap and call sites don't change.
+
+    def __init__(self,registry:LazyRegistry,name:str):
+        object.__setattr__(self,"_registry",registry)
+        object.__setattr__(self,"_name",name)
+
+    def __getattr__(self,attribute:str):
+        return getattr(self._registry.get(self._name),attribute)
+
+    def __setattr__(self,attribute:str,value) -> None:
+        setattr(self._registry.get(self._name),attribute,value)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._name}>"
+
+
+registry=LazyRegistry()
+
+def lazy(name:str,factory) -> LazyProxy:
+    registry.register(name,factory)
+    return LazyProxy(registry,name)
@@ -1,4 +1,4 @@
-from supabase import create_client,Client
+from services.registry import lazy
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -6,6 +6,9 @@ load_dotenv()
 SUPABASE_URL=os.getenv("SUPABASE_URL")
 SUPABASE_KEY_SERVICE=os.getenv("SUPABASE_KEY_SERVICE")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY_SERVICE)
+def _supabase_client():
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY_SERVICE)
 
+supabase=lazy("supabase",_supabase_client)
 
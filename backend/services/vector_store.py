@@ -0,0 +1,20 @@
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+# pinecone (default), local (memory-mapped files under LOCAL_VECTOR_DIR) or
+# memory (process-local, for tests and benchmarks).
+VECTOR_STORE=os.getenv("VECTOR_STORE","pinecone").lower()
+
+
+def get_vector_client():
+    if VECTOR_STORE=="pinecone":
+        from services.pinecone import pc
+        return pc
+    if VECTOR_STORE=="local":
+        from utils.local_vector_store import LocalVectorClient
+        return LocalVectorClient()
+    if VECTOR_STORE=="memory":
+        from utils.memory_index import InMemoryClient
+        return InMemoryClient()
+    raise ValueError(f"Unknown VECTOR_STORE {VECTOR_STORE!r}")
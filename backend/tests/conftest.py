@@ -0,0 +1,25 @@
+import os
+import time
+import uuid
+import jwt
+import pytest
+
+# Modules read their config at import; keep tests off real services.
+os.environ.setdefault("SUPABASE_URL","http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY_SERVICE","test")
+os.environ.setdefault("EMBEDDING_BACKEND","fake")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED","false")
+
+JWT_SECRET="test-secret-that-is-long-enough-for-hs256"
+
+
+@pytest.fixture
+def session(monkeypatch):
+    # A signed-in user who belongs to one conversation.
+    from utils import auth,conversation_access
+    monkeypatch.setattr(auth,"_verifier",auth.TokenVerifier(secret=JWT_SECRET,jwks_url=""))
+    user_id=str(uuid.uuid4())
+    conversation_id=str(uuid.uuid4())
+    monkeypatch.setattr(conversation_access,"is_member",lambda c,u: (c,u)==(conversation_id,user_id))
+    token=jwt.encode({"sub": user_id,"aud": "authenticated","exp": int(time.time())+600},JWT_SECRET,algorithm="HS256")
+    return {"user_id": user_id,"conversation_id": conversation_id,"cookies": {"access_token": token}}
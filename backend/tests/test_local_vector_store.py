@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import utils.local_vector_store as local_vector_store
+from utils.local_vector_store import LocalVectorClient
+
+DIMENSION=16
+
+
+def vectors(ids:list,seed:int=0) -> list:
+    rng=np.random.default_rng(seed)
+    return [{"id": i,"values": rng.normal(size=DIMENSION).tolist()} for i in ids]
+
+
+def unit(values) -> np.ndarray:
+    values=np.asarray(values,dtype=np.float32)
+    return values/np.linalg.norm(values)
+
+
+@pytest.mark.parametrize("quantization",["float32","int8"])
+def test_query_from_second_instance_survives_compaction(tmp_path,monkeypatch,quantization):
+    monkeypatch.setattr(local_vector_store,"LOCAL_VECTOR_COMPACT_MIN_ROWS",0)
+    client=LocalVectorClient(str(tmp_path),quantization=quantization)
+    client.create_index("docs",dimension=DIMENSION)
+    writer=client.Index("docs")
+    # A second instance over the same directory, as another worker would have.
+    reader=LocalVectorClient(str(tmp_path),quantization=quantization).Index("docs")
+
+    writer.upsert(vectors([f"dead-{n}" for n in range(40)],seed=1))
+    kept=vectors([f"live-{n}" for n in range(10)],seed=2)
+    writer.upsert(kept)
+    reader.query(kept[0]["values"],top_k=1)
+
+    # More rows land, so the reader has a log tail to pick up on its next query.
+    writer.upsert(vectors(["extra"],seed=3))
+    compacted=[]
+    refresh=reader._refresh
+
+    def refresh_then_compact():
+        # The writer compacts between the reader reading the log and scoring.
+        refresh()
+        writer.delete(ids=[f"dead-{n}" for n in range(40)])
+        compacted.append(writer.describe_index_stats()["stored_rows"])
+
+    monkeypatch.setattr(reader,"_refresh",refresh_then_compact)
+    tolerance=1e-5 if quantization=="float32" else 2e-2
+    for vector in kept:
+        match=reader.query(vector["values"],top_k=1,include_values=True).matches[0]
+        assert match.id==vector["id"]
+        assert match.score==pytest.approx(1.0,abs=tolerance)
+        assert np.allclose(match.values,unit(vector["values"]),atol=tolerance)
+    assert compacted and compacted[0]==11
+
+    monkeypatch.setattr(reader,"_refresh",refresh)
+    stats=reader.describe_index_stats()
+    assert stats["total_vector_count"]==11
+    assert stats["stored_rows"]==11
+    match=reader.query(kept[3]["values"],top_k=1).matches[0]
+    assert match.id==kept[3]["id"]
+    assert match.score==pytest.approx(1.0,abs=tolerance)
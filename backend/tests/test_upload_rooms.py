@@ -0,0 +1,58 @@
+import uuid
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import controllers.file_upload_controller as file_upload_controller
+
+
+class RecordingQueue:
+
+    def __init__(self):
+        self.jobs=[]
+
+    def submit(self,job,fn):
+        self.jobs.append(job)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    queue=RecordingQueue()
+    monkeypatch.setattr(file_upload_controller,"get_queue",lambda: queue)
+    app=FastAPI()
+    app.include_router(file_upload_controller.router)
+    client=TestClient(app)
+    client.queue=queue
+    return client
+
+
+def upload(client,room,cookies=None):
+    client.cookies.clear()
+    for name,value in (cookies or {}).items():
+        client.cookies.set(name,value)
+    return client.post(
+        "/files/upload",
+        files=[("files",("notes.txt",b"hello","text/plain"))],
+        data={"index_name": "general","room": room}
+    )
+
+
+def test_upload_to_room_requires_session(client,session):
+    res=upload(client,session["conversation_id"])
+    assert res.status_code==401
+    assert client.queue.jobs==[]
+
+
+def test_upload_to_room_rejects_non_member(client,session):
+    res=upload(client,str(uuid.uuid4()),session["cookies"])
+    assert res.status_code==403
+    res=upload(client,"not-a-conversation",session["cookies"])
+    assert res.status_code==403
+    assert client.queue.jobs==[]
+
+
+def test_upload_to_room_accepts_member(client,session):
+    res=upload(client,session["conversation_id"],session["cookies"])
+    assert res.status_code==202
+    job,=client.queue.jobs
+    assert job.room==session["conversation_id"]
+    file_upload_controller.remove_spooled(*(item["path"] for item in job.inputs))
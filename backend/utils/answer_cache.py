@@ -0,0 +1,167 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.index_registry import check_index_name
+from dotenv import load_dotenv
+load_dotenv()
+
+ANSWER_CACHE_ENABLED=os.getenv("ANSWER_CACHE_ENABLED","true").lower()=="true"
+ANSWER_CACHE_THRESHOLD=float(os.getenv("ANSWER_CACHE_THRESHOLD","0.95"))
+ANSWER_CACHE_TTL=float(os.getenv("ANSWER_CACHE_TTL","3600"))
+ANSWER_CACHE_MAX_ENTRIES=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES","500"))
+# Invalidations touch a per-index stamp file here so every worker process on
+# the host notices uploads handled by another one.
+ANSWER_CACHE_DIR=os.getenv("ANSWER_CACHE_DIR",".cache/answer_cache")
+
+
+class _IndexEntries:
+
+    def __init__(self,generation):
+        self.generation=generation
+        self.entries=OrderedDict()
+        self.matrix=None
+        self.keys=[]
+
+    def rebuild(self) -> None:
+        self.keys=list(self.entries)
+        if self.keys:
+            self.matrix=np.vstack([self.entries[k]["embedding"] for k in self.keys])
+        else:
+            self.matrix=None
+
+
+class SemanticAnswerCache:
+
+    def __init__(
+        self,
+        threshold:float=ANSWER_CACHE_THRESHOLD,
+        ttl:float=ANSWER_CACHE_TTL,
+        max_entries:int=ANSWER_CACHE_MAX_ENTRIES,
+        directory:str|None=ANSWER_CACHE_DIR
+    ):
+        self.threshold=threshold
+        self.ttl=ttl
+        self.max_entries=max_entries
+        self.directory=directory
+        self._indexes={}
+        self._lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+        self.invalidations=0
+
+    def _stamp_path(self,index_name:str) -> str|None:
+        if not self.directory:
+            return None
+        return os.path.join(self.directory,f"{check_index_name(index_name)}.gen")
+
+    def _generation(self,index_name:str):
+        path=self._stamp_path(index_name)
+        if path is None:
+            return None
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _entries(self,index_name:str) -> _IndexEntries:
+        generation=self._generation(index_name)
+        current=self._indexes.get(index_name)
+        if current is None or current.generation!=generation:
+            current=_IndexEntries(generation)
+            self._indexes[index_name]=current
+        return current
+
+    def _expire(self,bucket:_IndexEntries) -> None:
+        cutoff=time.time()-self.ttl
+        stale=[k for k,entry in bucket.entries.items() if entry["created_at"]<cutoff]
+        for key in stale:
+            del bucket.entries[key]
+            self.evictions+=1
+        if stale:
+            bucket.rebuild()
+
+    def lookup(self,index_name:str,embedding) -> dict|None:
+        query=_unit(embedding)
+        with self._lock:
+            bucket=self._entries(index_name)
+            self._expire(bucket)
+            if bucket.matrix is None:
+                self.misses+=1
+                return None
+            scores=bucket.matrix@query
+            best=int(np.argmax(scores))
+            if scores[best]<self.threshold:
+                self.misses+=1
+                return None
+            key=bucket.keys[best]
+            bucket.entries.move_to_end(key)
+            self.hits+=1
+            entry=bucket.entries[key]
+            return {"query": entry["query"],"similarity": float(scores[best]),**entry["payload"]}
+
+    def store(self,index_name:str,query:str,embedding,payload:dict) -> None:
+        with self._lock:
+            bucket=self._entries(index_name)
+            bucket.entries[uuid.uuid4().hex]={
+                "query": query,
+                "embedding": _unit(embedding),
+                "payload": payload,
+                "created_at": time.time()
+            }
+            while len(bucket.entries)>self.max_entries:
+                bucket.entries.popitem(last=False)
+                self.evictions+=1
+            bucket.rebuild()
+
+    def invalidate(self,index_name:str) -> None:
+        with self._lock:
+            self._indexes.pop(index_name,None)
+            self.invalidations+=1
+            path=self._stamp_path(index_name)
+            if path is not None:
+                os.makedirs(self.directory,exist_ok=True)
+                with open(path,"a"):
+                    pass
+                os.utime(path,None)
+
+    def stats(self) -> dict:
+        lookups=self.hits+self.misses
+        with self._lock:
+            entries={name: len(bucket.entries) for name,bucket in self._indexes.items()}
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits/lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": entries
+        }
+
+
+def _unit(embedding):
+    vector=np.asarray(embedding,dtype=np.float32)
+    norm=np.linalg.norm(vector)
+    return vector/norm if norm else vector
+
+
+_cache=None
+_cache_lock=threading.Lock()
+
+def get_answer_cache() -> SemanticAnswerCache|None:
+    global _cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache=SemanticAnswerCache()
+    return _cache
+
+def invalidate_index(index_name:str) -> None:
+    cache=get_answer_cache()
+    if cache is not None:
+        cache.invalidate(index_name)
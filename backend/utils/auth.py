@@ -0,0 +1,212 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import jwt
+from collections import OrderedDict
+from http.cookies import SimpleCookie,CookieError
+from fastapi import HTTPException,Request,Response,status
+from services.supabase import SUPABASE_URL,SUPABASE_KEY_SERVICE
+from dotenv import load_dotenv
+load_dotenv()
+
+logger=logging.getLogger(__name__)
+
+# Legacy projects sign access tokens with this shared HS256 secret; newer ones
+# use asymmetric keys published at the project's JWKS endpoint.
+SUPABASE_JWT_SECRET=os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL=os.getenv("SUPABASE_JWKS_URL",f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else "")
+JWKS_CACHE_TTL=int(os.getenv("JWKS_CACHE_TTL","600"))
+JWT_AUDIENCE=os.getenv("JWT_AUDIENCE","authenticated")
+JWT_LEEWAY=int(os.getenv("JWT_LEEWAY","10"))
+AUTH_CLAIMS_CACHE_SIZE=int(os.getenv("AUTH_CLAIMS_CACHE_SIZE","10000"))
+# Supabase rotates refresh tokens on use; parallel requests carrying the same
+# expired session share one refresh within this window.
+AUTH_REFRESH_REUSE_SECONDS=float(os.getenv("AUTH_REFRESH_REUSE_SECONDS","10"))
+
+ACCESS_TOKEN_COOKIE="access_token"
+REFRESH_TOKEN_COOKIE="refresh_token"
+
+
+class TokenVerifier:
+    # Verifies access tokens without calling Supabase and keeps the decoded
+    # claims until the token's own exp, so repeat requests are a dict lookup.
+
+    def __init__(self,secret:str|None=SUPABASE_JWT_SECRET,jwks_url:str=SUPABASE_JWKS_URL,audience:str=JWT_AUDIENCE,leeway:int=JWT_LEEWAY,max_entries:int=AUTH_CLAIMS_CACHE_SIZE):
+        self.secret=secret
+        self.audience=audience
+        self.leeway=leeway
+        self.max_entries=max_entries
+        self._jwks=jwt.PyJWKClient(jwks_url,cache_keys=True,lifespan=JWKS_CACHE_TTL) if jwks_url else None
+        self._claims=OrderedDict()
+        self._lock=threading.Lock()
+
+    def cached(self,token:str) -> dict|None:
+        with self._lock:
+            entry=self._claims.get(token)
+            if entry is None:
+                return None
+            if entry["exp"]+self.leeway<=time.time():
+                del self._claims[token]
+                return None
+            self._claims.move_to_end(token)
+            return entry
+
+    def _key(self,token:str):
+        algorithm=jwt.get_unverified_header(token).get("alg")
+        if algorithm=="HS256":
+            if not self.secret:
+                raise jwt.InvalidTokenError("HS256 token but SUPABASE_JWT_SECRET is not set")
+            return self.secret,["HS256"]
+        if self._jwks is None:
+            raise jwt.InvalidTokenError("No JWKS endpoint configured")
+        # PyJWKClient refetches the key set when it sees an unknown kid.
+        return self._jwks.get_signing_key_from_jwt(token).key,["RS256","ES256"]
+
+    def verify(self,token:str) -> dict:
+        # Raises jwt.ExpiredSignatureError, jwt.InvalidTokenError or, when the
+        # key set can't be fetched, jwt.PyJWKClientError.
+        claims=self.cached(token)
+        if claims is not None:
+            return claims
+        key,algorithms=self._key(token)
+        claims=jwt.decode(
+            token,
+            key,
+            algorithms=algorithms,
+            audience=self.audience,
+            leeway=self.leeway,
+            options={"require": ["exp","sub"]}
+        )
+        with self._lock:
+            self._claims[token]=claims
+            while len(self._claims)>self.max_entries:
+                self._claims.popitem(last=False)
+        return claims
+
+    def forget(self,token:str) -> None:
+        with self._lock:
+            self._claims.pop(token,None)
+
+
+_verifier=None
+_verifier_lock=threading.Lock()
+
+def get_verifier() -> TokenVerifier:
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier=TokenVerifier()
+    return _verifier
+
+
+async def _exchange(refresh_token:str) -> dict:
+    import httpx
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response=await client.post(
+                f"{SUPABASE_URL}/auth/v1/token",
+                params={"grant_type": "refresh_token"},
+                headers={"apikey": SUPABASE_KEY_SERVICE},
+                json={"refresh_token": refresh_token}
+            )
+    except httpx.HTTPError as e:
+        logger.error("Session refresh failed: %s",e)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,detail="Authentication unavailable")
+    if response.status_code!=200:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="Session expired, please log in again")
+    return response.json()
+
+
+_refreshes={}
+
+async def refresh_session(refresh_token:str) -> dict:
+    # The one network call: exchange the refresh token at Supabase Auth
+    # directly, so the shared service client's session is left alone.
+    now=time.monotonic()
+    for token in [t for t,(at,_) in _refreshes.items() if now-at>AUTH_REFRESH_REUSE_SECONDS]:
+        del _refreshes[token]
+    entry=_refreshes.get(refresh_token)
+    if entry is None:
+        entry=_refreshes[refresh_token]=(now,asyncio.ensure_future(_exchange(refresh_token)))
+    try:
+        return await asyncio.shield(entry[1])
+    except HTTPException:
+        if _refreshes.get(refresh_token) is entry and entry[1].done():
+            del _refreshes[refresh_token]
+        raise
+
+
+def set_session_cookies(res:Response,access_token:str,refresh_token:str) -> None:
+    res.set_cookie(
+        key=ACCESS_TOKEN_COOKIE,
+        value=access_token,
+        httponly=True,
+        samesite="Lax",
+        secure=False,
+        max_age=3600
+    )
+    res.set_cookie(
+        key=REFRESH_TOKEN_COOKIE,
+        value=refresh_token,
+        httponly=True,
+        samesite="Lax",
+        secure=False,
+        max_age=3600*24*30
+    )
+
+
+def request_token(request:Request) -> str|None:
+    header=request.headers.get("authorization","")
+    if header.lower().startswith("bearer "):
+        return header[7:].strip() or None
+    return request.cookies.get(ACCESS_TOKEN_COOKIE)
+
+
+def socket_token(environ:dict,auth=None) -> str|None:
+    # Socket.IO handshake: an explicit auth={"token": ...} from the client, or
+    # the access_token cookie the browser sends with the upgrade request.
+    if isinstance(auth,dict) and isinstance(auth.get("token"),str):
+        return auth["token"].strip() or None
+    try:
+        morsel=SimpleCookie(environ.get("HTTP_COOKIE","")).get(ACCESS_TOKEN_COOKIE)
+    except CookieError:
+        return None
+    return morsel.value if morsel is not None and morsel.value else None
+
+
+async def get_current_user(request:Request,response:Response) -> dict:
+    # FastAPI dependency returning the verified token claims (sub, email,
+    # user_metadata, ...). An expired access token is refreshed with the
+    # refresh_token cookie and the new pair is set on the response.
+    verifier=get_verifier()
+    token=request_token(request)
+    if token:
+        claims=verifier.cached(token)
+        if claims is not None:
+            return claims
+        try:
+            # A miss may need to fetch the JWKS; keep that off the event loop.
+            return await asyncio.to_thread(verifier.verify,token)
+        except jwt.ExpiredSignatureError:
+            pass
+        except jwt.PyJWKClientConnectionError as e:
+            logger.error("Could not load signing keys: %s",e)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,detail="Authentication unavailable")
+        except jwt.PyJWTError as e:
+            logger.debug("Rejected access token: %s",e)
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="Invalid access token")
+
+    refresh_token=request.cookies.get(REFRESH_TOKEN_COOKIE)
+    if not refresh_token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="Not authenticated")
+    session=await refresh_session(refresh_token)
+    try:
+        claims=await asyncio.to_thread(verifier.verify,session["access_token"])
+    except (KeyError,jwt.PyJWTError) as e:
+        logger.warning("Refreshed session failed verification: %s",e)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="Session expired, please log in again")
+    set_session_cookies(response,session["access_token"],session["refresh_token"])
+    return claims
@@ -0,0 +1,106 @@
+import os
+from array import array
+from functools import lru_cache
+from services.registry import registry
+
+DEFAULT_MODEL="text-embedding-3-small"
+# Larger segments are split on whitespace before encoding so one huge
+# transcript string never becomes one huge token list.
+MAX_SEGMENT_CHARS=1<<16
+ENCODE_BATCH_PIECES=16
+ENCODE_THREADS=min(8,os.cpu_count() or 1)
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model:str=DEFAULT_MODEL):
+    import tiktoken
+    return tiktoken.encoding_for_model(model)
+
+registry.register("tokenizer",get_encoder)
+
+
+def split_segment(text:str,max_chars:int=MAX_SEGMENT_CHARS):
+    start=0
+    while len(text)-start>max_chars:
+        end=start+max_chars
+        cut=max(text.rfind("\n",start,end),text.rfind(" ",start,end))
+        if cut<=start:
+            cut=end
+        else:
+            cut+=1
+        yield text[start:cut]
+        start=cut
+    if start<len(text):
+        yield text[start:]
+
+
+def _encode_pieces(encoder,segments):
+    # Encodes ENCODE_BATCH_PIECES pieces at a time on tiktoken's thread pool.
+    # encode_ordinary: document text that happens to contain "<|endoftext|>"
+    # is just text, not a reason to fail the upload.
+    batch=[]
+    for segment in segments:
+        for piece in split_segment(segment):
+            batch.append(piece)
+            if len(batch)>=ENCODE_BATCH_PIECES:
+                yield from encoder.encode_ordinary_batch(batch,num_threads=ENCODE_THREADS)
+                batch=[]
+    if batch:
+        yield from encoder.encode_ordinary_batch(batch,num_threads=ENCODE_THREADS)
+
+
+def iter_chunk_spans(segments,chunk_size:int=500,overlap:int=50,model:str=DEFAULT_MODEL):
+    # Yields (text, start_token, end_token) for windows of chunk_size tokens
+    # every chunk_size-overlap tokens, matching chunk_text over the joined
+    # segments. Tokens live in a compact array that drops consumed windows,
+    # and every token is decoded once: the overlap bytes of one window are
+    # carried over as the head of the next.
+    encoder=get_encoder(model)
+    stride=chunk_size-overlap
+    if stride<=0:
+        raise ValueError("overlap must be smaller than chunk_size")
+    tokens=array("I")
+    base=0
+    start=0
+    carry=None
+
+    def window(end:int):
+        nonlocal carry
+        split=min(start+stride,end)
+        if carry is not None and carry[0]==start and carry[1]<=split:
+            head=carry[2]
+            position=carry[1]
+        else:
+            head=b""
+            position=start
+        body=encoder.decode_bytes(tokens[position-base:split-base]) if split>position else b""
+        tail_from=max(split,position)
+        tail=encoder.decode_bytes(tokens[tail_from-base:end-base])
+        carry=(tail_from,end,tail)
+        return (head+body+tail).decode("utf-8",errors="replace")
+
+    for encoded in _encode_pieces(encoder,segments):
+        tokens.extend(encoded)
+        while base+len(tokens)-start>=chunk_size:
+            end=start+chunk_size
+            yield window(end),start,end
+            start+=stride
+        # Compact only once the consumed prefix dominates the buffer, so
+        # trimming stays amortised O(1) per token.
+        if start-base>len(tokens)//2:
+            del tokens[:start-base]
+            base=start
+    total=base+len(tokens)
+    while start<total:
+        end=min(start+chunk_size,total)
+        yield window(end),start,end
+        start+=stride
+
+
+def iter_chunks(segments,chunk_size:int=500,overlap:int=50,model:str=DEFAULT_MODEL):
+    for text,_,_ in iter_chunk_spans(segments,chunk_size,overlap,model):
+        yield text
+
+
+def chunk_text(text:str,chunk_size:int=500,overlap:int=50,model:str=DEFAULT_MODEL):
+    return list(iter_chunks([text],chunk_size,overlap,model))
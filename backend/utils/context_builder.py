@@ -0,0 +1,152 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+from utils.chunker import get_encoder
+from utils.keyword_index import tokenize
+load_dotenv()
+
+CONTEXT_TOKEN_BUDGET=int(os.getenv("CONTEXT_TOKEN_BUDGET","1500"))
+# 1.0 ranks purely by relevance; lower values penalise passages that repeat
+# what has already been picked.
+CONTEXT_MMR_LAMBDA=float(os.getenv("CONTEXT_MMR_LAMBDA","0.7"))
+# A passage that doesn't fit is cut to the remaining budget only if at least
+# this many tokens are left; smaller tails aren't worth the prompt space.
+CONTEXT_MIN_TAIL_TOKENS=int(os.getenv("CONTEXT_MIN_TAIL_TOKENS","64"))
+SEPARATOR="\n\n"
+_probe_chars=32
+
+
+def join_overlapping(head:str,tail:str) -> str:
+    # Adjacent chunks repeat the last overlap tokens of the previous chunk;
+    # find where tail's opening appears in head's end and join once.
+    probe=tail[:_probe_chars]
+    if not probe:
+        return head
+    position=head.find(probe,max(0,len(head)-len(tail)))
+    while position!=-1:
+        if tail.startswith(head[position:]):
+            return head[:position]+tail
+        position=head.find(probe,position+1)
+    return head+SEPARATOR+tail
+
+
+def merge_adjacent(hits:list,vectors:dict) -> list:
+    # Collapses runs of consecutive chunk_index from the same file into one
+    # passage. Passages keep the best member's relevance and the normalised
+    # sum of member vectors.
+    groups={}
+    for position,hit in enumerate(hits):
+        groups.setdefault((hit.get('filekey'),hit.get('filename')),[]).append((position,hit))
+
+    passages=[]
+    for members in groups.values():
+        members.sort(key=lambda member: (member[1].get('chunk_index') is None,member[1].get('chunk_index') or 0))
+        run=[]
+        for position,hit in members:
+            previous=run[-1][1] if run else None
+            if previous is not None and previous.get('chunk_index') is not None and hit.get('chunk_index')==previous['chunk_index']+1:
+                run.append((position,hit))
+                continue
+            if run:
+                passages.append(_passage(run,vectors))
+            run=[(position,hit)]
+        if run:
+            passages.append(_passage(run,vectors))
+    passages.sort(key=lambda passage: passage["rank"])
+    return passages
+
+
+def _passage(run:list,vectors:dict) -> dict:
+    text=run[0][1]['text'] or ""
+    for _,hit in run[1:]:
+        text=join_overlapping(text,hit['text'] or "")
+    members=[vectors[hit['id']] for _,hit in run if hit.get('id') in vectors and vectors[hit['id']] is not None]
+    vector=None
+    if members:
+        vector=np.sum(np.asarray(members,dtype=np.float32),axis=0)
+        norm=np.linalg.norm(vector)
+        vector=vector/norm if norm else vector
+    return {
+        "text": text,
+        "rank": min(position for position,_ in run),
+        "score": max(hit.get('score') or 0.0 for _,hit in run),
+        "vector": vector,
+        "hits": [hit for _,hit in run]
+    }
+
+
+def _similarity(passages:list) -> np.ndarray:
+    # Cosine between passage vectors; keyword-only passages have none, so
+    # pairs involving one fall back to term-set Jaccard.
+    n=len(passages)
+    similarity=np.zeros((n,n),dtype=np.float32)
+    terms=[None]*n
+    for i in range(n):
+        for j in range(i+1,n):
+            a,b=passages[i]["vector"],passages[j]["vector"]
+            if a is not None and b is not None:
+                value=float(a@b)
+            else:
+                if terms[i] is None:
+                    terms[i]=set(tokenize(passages[i]["text"]))
+                if terms[j] is None:
+                    terms[j]=set(tokenize(passages[j]["text"]))
+                union=terms[i]|terms[j]
+                value=len(terms[i]&terms[j])/len(union) if union else 0.0
+            similarity[i,j]=similarity[j,i]=value
+    return similarity
+
+
+def mmr_order(passages:list,lambda_:float=CONTEXT_MMR_LAMBDA) -> list:
+    if len(passages)<2:
+        return list(passages)
+    best=max(passage["score"] for passage in passages) or 1.0
+    relevance=[passage["score"]/best for passage in passages]
+    similarity=_similarity(passages)
+    remaining=list(range(len(passages)))
+    order=[]
+    while remaining:
+        pick=max(
+            remaining,
+            key=lambda i: lambda_*relevance[i]-(1-lambda_)*max((similarity[i,j] for j in order),default=0.0)
+        )
+        order.append(pick)
+        remaining.remove(pick)
+    return [passages[i] for i in order]
+
+
+def build_context(hits:list,vectors:dict|None=None,budget:int=CONTEXT_TOKEN_BUDGET) -> dict:
+    # hits: best first, as returned by retrieval; vectors: hit id -> embedding
+    # for the hits that have one. Returns the packed context text with its
+    # token count and the hits that made it in.
+    passages=mmr_order(merge_adjacent(hits,vectors or {}))
+    encoder=get_encoder()
+    encoded=encoder.encode_ordinary_batch([passage["text"] for passage in passages]) if passages else []
+    separator_tokens=len(encoder.encode_ordinary(SEPARATOR))
+
+    texts=[]
+    used=[]
+    seen=set()
+    tokens=0
+    for passage,passage_tokens in zip(passages,encoded):
+        key=passage["text"].strip()
+        if not key or key in seen:
+            continue
+        cost=len(passage_tokens)+separator_tokens
+        if tokens+cost<=budget:
+            texts.append(passage["text"])
+        else:
+            room=budget-tokens-separator_tokens
+            if room<CONTEXT_MIN_TAIL_TOKENS:
+                continue
+            texts.append(encoder.decode(passage_tokens[:room]))
+            cost=room+separator_tokens
+        seen.add(key)
+        used.extend(passage["hits"])
+        tokens+=cost
+    return {
+        "text": "".join(text+SEPARATOR for text in texts),
+        "tokens": tokens,
+        "passages": len(texts),
+        "hits": used
+    }
@@ -0,0 +1,41 @@
+import uuid
+import asyncio
+import logging
+from fastapi import HTTPException,status
+from services.supabase import supabase
+
+logger=logging.getLogger(__name__)
+
+# Socket.IO rooms are conversation ids. Anything that emits into one on a
+# caller's behalf (socket joins, query streams, ingest progress) checks that
+# the caller is a member first.
+
+
+def is_uuid(value) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def is_member(conversation_id:str,user_id:str) -> bool:
+    return bool(
+        supabase.table("conversation_members").select("conversation_id")
+        .eq("conversation_id",conversation_id).eq("user_id",user_id)
+        .limit(1).execute().data
+    )
+
+
+async def can_use_room(room:str,user_id:str) -> bool:
+    return is_uuid(room) and bool(user_id) and await asyncio.to_thread(is_member,room,user_id)
+
+
+async def require_room_member(room:str,user:dict) -> None:
+    try:
+        allowed=await can_use_room(room,user.get("sub"))
+    except Exception as e:
+        logger.error("Membership check for room %s failed: %s",room,e)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,detail="Could not check conversation membership")
+    if not allowed:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="Not a member of this conversation")
@@ -0,0 +1,226 @@
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+try:
+    import fcntl
+except ImportError:
+    fcntl=None
+from dotenv import load_dotenv
+load_dotenv()
+
+EMBEDDING_CACHE_ENABLED=os.getenv("EMBEDDING_CACHE_ENABLED","true").lower()=="true"
+EMBEDDING_CACHE_SIZE=int(os.getenv("EMBEDDING_CACHE_SIZE","10000"))
+EMBEDDING_CACHE_DIR=os.getenv("EMBEDDING_CACHE_DIR",".cache/embeddings")
+
+_whitespace=re.compile(r"\s+")
+
+
+def normalize_text(text:str) -> str:
+    return _whitespace.sub(" ",unicodedata.normalize("NFC",text)).strip()
+
+def cache_key(model:str,dimensions:int,text:str) -> str:
+    payload=f"{model}\x00{dimensions}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+
+    def __init__(self,capacity:int):
+        self.capacity=capacity
+        self._entries=OrderedDict()
+        self._lock=threading.Lock()
+
+    def get(self,key:str):
+        with self._lock:
+            vector=self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self,key:str,vector) -> None:
+        if self.capacity<=0:
+            return
+        with self._lock:
+            self._entries[key]=vector
+            self._entries.move_to_end(key)
+            while len(self._entries)>self.capacity:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _FileLock:
+
+    def __init__(self,path:str,shared:bool=False):
+        self.path=path
+        self.shared=shared
+        self._fd=None
+
+    def __enter__(self):
+        self._fd=os.open(self.path,os.O_CREAT|os.O_RDWR)
+        if fcntl is not None:
+            fcntl.flock(self._fd,fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self,*exc):
+        if fcntl is not None:
+            fcntl.flock(self._fd,fcntl.LOCK_UN)
+        os.close(self._fd)
+
+
+class DiskTier:
+    # Append-only float32 rows in vectors.f32, read back through a memory map.
+    # keys.idx holds one hex key per line; line n is row n. A key is only
+    # appended after its row is flushed, so a crash can't index a torn vector.
+
+    def __init__(self,directory:str,dimensions:int):
+        self.directory=directory
+        self.dimensions=dimensions
+        self.vectors_path=os.path.join(directory,"vectors.f32")
+        self.keys_path=os.path.join(directory,"keys.idx")
+        self._rows={}
+        self._map=None
+        self._lock=threading.Lock()
+        os.makedirs(directory,exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        with self._file_lock():
+            row_bytes=self.dimensions*4
+            stored_rows=os.path.getsize(self.vectors_path)//row_bytes if os.path.exists(self.vectors_path) else 0
+            lines=[b""]
+            if os.path.exists(self.keys_path):
+                with open(self.keys_path,"rb") as f:
+                    lines=f.read().split(b"\n")
+            # The piece after the last newline is empty, or a key torn by a
+            # crash mid-append; either way it isn't a row.
+            lines.pop()
+            # Keep only rows that have both a key and a whole vector, so later
+            # appends stay aligned line for row.
+            rows=min(len(lines),stored_rows)
+            for row,line in enumerate(lines[:rows]):
+                key=line.decode("ascii","replace").strip()
+                if key:
+                    self._rows[key]=row
+            keys_bytes=sum(len(line)+1 for line in lines[:rows])
+            if os.path.exists(self.keys_path) and os.path.getsize(self.keys_path)!=keys_bytes:
+                with open(self.keys_path,"r+b") as f:
+                    f.truncate(keys_bytes)
+            if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path)!=rows*row_bytes:
+                with open(self.vectors_path,"r+b") as f:
+                    f.truncate(rows*row_bytes)
+
+    def _file_lock(self):
+        # Serialises appends across processes (uvicorn workers share the directory).
+        return _FileLock(self.keys_path+".lock")
+
+    def _mapped(self,row:int):
+        if self._map is None or row>=self._map.shape[0]:
+            rows=os.path.getsize(self.vectors_path)//(self.dimensions*4)
+            self._map=np.memmap(self.vectors_path,dtype=np.float32,mode="r",shape=(rows,self.dimensions))
+        return self._map
+
+    def get(self,key:str):
+        row=self._rows.get(key)
+        if row is None:
+            return None
+        with self._lock:
+            return np.array(self._mapped(row)[row])
+
+    def put_many(self,items:list) -> None:
+        with self._lock,self._file_lock():
+            fresh=[(key,vector) for key,vector in items if key not in self._rows]
+            if not fresh:
+                return
+            row_bytes=self.dimensions*4
+            start=os.path.getsize(self.vectors_path)//row_bytes if os.path.exists(self.vectors_path) else 0
+            block=np.asarray([vector for _,vector in fresh],dtype=np.float32)
+            with open(self.vectors_path,"ab") as f:
+                f.write(block.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path,"a") as f:
+                for offset,(key,_) in enumerate(fresh):
+                    f.write(key+"\n")
+                    self._rows[key]=start+offset
+
+    def __len__(self):
+        return len(self._rows)
+
+
+class EmbeddingCache:
+
+    def __init__(self,capacity:int=EMBEDDING_CACHE_SIZE,directory:str|None=EMBEDDING_CACHE_DIR):
+        self.memory=MemoryTier(capacity)
+        self.directory=directory
+        self._disk={}
+        self._disk_lock=threading.Lock()
+        self.memory_hits=0
+        self.disk_hits=0
+        self.misses=0
+
+    def _disk_tier(self,model:str,dimensions:int):
+        if not self.directory:
+            return None
+        name=f"{model}-{dimensions}"
+        with self._disk_lock:
+            if name not in self._disk:
+                self._disk[name]=DiskTier(os.path.join(self.directory,name),dimensions)
+            return self._disk[name]
+
+    def get_many(self,model:str,dimensions:int,texts:list) -> list:
+        disk=self._disk_tier(model,dimensions)
+        found=[]
+        for text in texts:
+            key=cache_key(model,dimensions,text)
+            vector=self.memory.get(key)
+            if vector is not None:
+                self.memory_hits+=1
+            elif disk is not None and (vector:=disk.get(key)) is not None:
+                self.disk_hits+=1
+                self.memory.put(key,vector)
+            else:
+                self.misses+=1
+            found.append(vector)
+        return found
+
+    def put_many(self,model:str,dimensions:int,texts:list,vectors:list) -> None:
+        items=[]
+        for text,vector in zip(texts,vectors):
+            key=cache_key(model,dimensions,text)
+            vector=np.asarray(vector,dtype=np.float32)
+            self.memory.put(key,vector)
+            items.append((key,vector))
+        disk=self._disk_tier(model,dimensions)
+        if disk is not None:
+            disk.put_many(items)
+
+    def stats(self) -> dict:
+        lookups=self.memory_hits+self.disk_hits+self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits+self.disk_hits)/lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": sum(len(tier) for tier in self._disk.values())
+        }
+
+
+_cache=None
+_cache_lock=threading.Lock()
+
+def get_cache():
+    global _cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache=EmbeddingCache()
+    return _cache
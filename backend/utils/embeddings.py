@@ -0,0 +1,281 @@
+import os
+import time
+import asyncio
+import random
+import hashlib
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.embedding_cache import get_cache
+from utils.metrics import span
+from dotenv import load_dotenv
+load_dotenv()
+
+EMBEDDING_MODEL=os.getenv("EMBEDDING_MODEL","text-embedding-3-small")
+EMBEDDING_DIMENSIONS=int(os.getenv("EMBEDDING_DIMENSIONS","1536"))
+EMBEDDING_BACKEND=os.getenv("EMBEDDING_BACKEND","openai")
+EMBEDDING_BATCH_TOKENS=int(os.getenv("EMBEDDING_BATCH_TOKENS","100000"))
+EMBEDDING_BATCH_SIZE=int(os.getenv("EMBEDDING_BATCH_SIZE","256"))
+EMBEDDING_CONCURRENCY=int(os.getenv("EMBEDDING_CONCURRENCY","4"))
+EMBEDDING_MAX_RETRIES=int(os.getenv("EMBEDDING_MAX_RETRIES","5"))
+
+# OpenAI caps a single embeddings request at 2048 inputs
+MAX_INPUTS_PER_REQUEST=2048
+
+
+def estimate_tokens(text:str) -> int:
+    # cl100k averages ~4 chars per token for English; 3 keeps the budget conservative
+    return len(text)//3+1
+
+
+def is_transient_error(error:Exception) -> bool:
+    # Worth retrying: rate limits, timeouts, dropped connections and 5xx. Bad
+    # keys, invalid input and over-long texts fail the same way every time.
+    if isinstance(error,(TimeoutError,ConnectionError)):
+        return True
+    import openai
+    if isinstance(error,(openai.APIConnectionError,openai.RateLimitError)):
+        return True
+    if isinstance(error,openai.APIStatusError):
+        return error.status_code>=500 or error.status_code in (408,409,429)
+    return False
+
+
+class OpenAIEmbeddingBackend:
+
+    def __init__(self,model:str=EMBEDDING_MODEL,dimensions:int=EMBEDDING_DIMENSIONS):
+        self.model=model
+        self.dimensions=dimensions
+
+    def embed(self,texts:list) -> list:
+        from services.openai import openai_client
+        response=openai_client.embeddings.create(
+            input=texts,
+            model=self.model,
+            dimensions=self.dimensions
+        )
+        data=sorted(response.data,key=lambda d: d.index)
+        return [d.embedding for d in data]
+
+    async def aembed(self,texts:list) -> list:
+        from services.openai import async_openai_client
+        response=await async_openai_client.embeddings.create(
+            input=texts,
+            model=self.model,
+            dimensions=self.dimensions
+        )
+        data=sorted(response.data,key=lambda d: d.index)
+        return [d.embedding for d in data]
+
+
+class FakeEmbeddingBackend:
+    # Deterministic, offline stand-in: the same text always maps to the same unit vector.
+
+    def __init__(self,model:str=f"fake-{EMBEDDING_MODEL}",dimensions:int=EMBEDDING_DIMENSIONS,latency:float=0.0):
+        self.model=model
+        self.dimensions=dimensions
+        self.latency=latency
+        self.calls=0
+
+    def embed(self,texts:list) -> list:
+        self.calls+=1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed(self,texts:list) -> list:
+        self.calls+=1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def _vector(self,text:str) -> list:
+        seed=int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8],"big")
+        rng=random.Random(seed)
+        values=[rng.gauss(0.0,1.0) for _ in range(self.dimensions)]
+        norm=math.sqrt(sum(v*v for v in values)) or 1.0
+        return [v/norm for v in values]
+
+
+class EmbeddingEngine:
+
+    def __init__(
+        self,
+        backend,
+        batch_tokens:int=EMBEDDING_BATCH_TOKENS,
+        batch_size:int=EMBEDDING_BATCH_SIZE,
+        concurrency:int=EMBEDDING_CONCURRENCY,
+        max_retries:int=EMBEDDING_MAX_RETRIES,
+        backoff_base:float=0.5,
+        backoff_max:float=20.0,
+        cache=None
+    ):
+        self.backend=backend
+        self.cache=cache
+        self.batch_tokens=batch_tokens
+        self.batch_size=min(batch_size,MAX_INPUTS_PER_REQUEST)
+        self.concurrency=max(1,concurrency)
+        self.max_retries=max_retries
+        self.backoff_base=backoff_base
+        self.backoff_max=backoff_max
+        self._executor=ThreadPoolExecutor(max_workers=self.concurrency,thread_name_prefix="embed")
+        self._semaphore=asyncio.Semaphore(self.concurrency)
+
+    @property
+    def model(self) -> str:
+        return self.backend.model
+
+    @property
+    def dimensions(self) -> int:
+        return self.backend.dimensions
+
+    def make_batches(self,texts:list) -> list:
+        # Returns lists of positions into `texts`; each batch stays under both limits.
+        batches=[]
+        current=[]
+        current_tokens=0
+        for i,text in enumerate(texts):
+            tokens=estimate_tokens(text)
+            if current and (current_tokens+tokens>self.batch_tokens or len(current)>=self.batch_size):
+                batches.append(current)
+                current=[]
+                current_tokens=0
+            current.append(i)
+            current_tokens+=tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _backoff(self,attempt:int) -> float:
+        delay=min(self.backoff_max,self.backoff_base*(2**(attempt-1)))
+        return delay*random.uniform(0.5,1.0)
+
+    @staticmethod
+    def _checked(texts:list,embeddings:list) -> list:
+        # A short response is a backend bug, not something a retry fixes.
+        if len(embeddings)!=len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        return embeddings
+
+    def _embed_batch(self,texts:list) -> list:
+        attempt=0
+        while True:
+            try:
+                with span("embed",items=len(texts)):
+                    embeddings=self.backend.embed(texts)
+                break
+            except Exception as e:
+                attempt+=1
+                if attempt>self.max_retries or not is_transient_error(e):
+                    raise
+                time.sleep(self._backoff(attempt))
+        return self._checked(texts,embeddings)
+
+    async def _aembed_batch(self,texts:list) -> list:
+        attempt=0
+        while True:
+            try:
+                async with self._semaphore:
+                    with span("embed",items=len(texts)):
+                        embeddings=await self.backend.aembed(texts)
+                break
+            except Exception as e:
+                attempt+=1
+                if attempt>self.max_retries or not is_transient_error(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+        return self._checked(texts,embeddings)
+
+    def _lookup(self,texts:list) -> tuple:
+        # Returns embeddings with None holes, and distinct missing text -> positions.
+        # Identical chunks within one document are embedded once.
+        cached=self.cache.get_many(self.model,self.dimensions,texts) if self.cache else [None]*len(texts)
+        embeddings=[None if vector is None else vector.tolist() for vector in cached]
+        missing={}
+        for i,vector in enumerate(cached):
+            if vector is None:
+                missing.setdefault(texts[i],[]).append(i)
+        return embeddings,missing
+
+    def _fill(self,embeddings:list,missing:dict,fresh:list) -> list:
+        unique=list(missing)
+        if self.cache:
+            self.cache.put_many(self.model,self.dimensions,unique,fresh)
+        for text,embedding in zip(unique,fresh):
+            for i in missing[text]:
+                embeddings[i]=embedding
+        return embeddings
+
+    def _embed_uncached(self,texts:list) -> list:
+        batches=self.make_batches(texts)
+        futures=[
+            self._executor.submit(self._embed_batch,[texts[i] for i in batch])
+            for batch in batches
+        ]
+        embeddings=[None]*len(texts)
+        for batch,future in zip(batches,futures):
+            for i,embedding in zip(batch,future.result()):
+                embeddings[i]=embedding
+        return embeddings
+
+    async def _aembed_uncached(self,texts:list) -> list:
+        batches=self.make_batches(texts)
+        results=await asyncio.gather(*(self._aembed_batch([texts[i] for i in batch]) for batch in batches))
+        embeddings=[None]*len(texts)
+        for batch,result in zip(batches,results):
+            for i,embedding in zip(batch,result):
+                embeddings[i]=embedding
+        return embeddings
+
+    def embed(self,texts:list) -> list:
+        if not texts:
+            return []
+        embeddings,missing=self._lookup(texts)
+        if not missing:
+            return embeddings
+        return self._fill(embeddings,missing,self._embed_uncached(list(missing)))
+
+    async def aembed(self,texts:list) -> list:
+        # Event-loop counterpart of embed() for request handlers. The cache's
+        # disk tier locks, writes and fsyncs, so it's used from a thread.
+        if not texts:
+            return []
+        if self.cache:
+            embeddings,missing=await asyncio.to_thread(self._lookup,texts)
+        else:
+            embeddings,missing=self._lookup(texts)
+        if not missing:
+            return embeddings
+        fresh=await self._aembed_uncached(list(missing))
+        if self.cache:
+            return await asyncio.to_thread(self._fill,embeddings,missing,fresh)
+        return self._fill(embeddings,missing,fresh)
+
+def make_backend(name:str=EMBEDDING_BACKEND):
+    if name=="openai":
+        return OpenAIEmbeddingBackend()
+    if name=="fake":
+        return FakeEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+_engine=None
+_engine_lock=threading.Lock()
+
+def get_engine() -> EmbeddingEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine=EmbeddingEngine(make_backend(),cache=get_cache())
+    return _engine
+
+def set_engine(engine:EmbeddingEngine) -> None:
+    global _engine
+    _engine=engine
+
+def embed_texts(texts:list) -> list:
+    return get_engine().embed(texts)
+
+async def aembed_texts(texts:list) -> list:
+    return await get_engine().aembed(texts)
@@ -1,145 +1,152 @@
-import os
+import time
+import logging
 from dotenv import load_dotenv
 load_dotenv()
-import tempfile
-import fitz
-import tiktoken
 import docx2txt
-from pinecone import ServerlessSpec
-from services.pinecone import pc
-from services.openai import openai_client
-import whisper
-import pytesseract
-from pdf2image import convert_from_path
-
-
-def index_file(index_name:str,file,key:str) -> None:
-    
-    ext = file.filename.rsplit('.', 1)[1].lower()
-    tmp_fd, path = tempfile.mkstemp(suffix=f".{ext}")
-    os.close(tmp_fd)  
-    file.stream.seek(0)
-    file.save(path)
-    print("Saved temp file:", path)
+from utils.index_registry import check_index_name,get_registry
+from utils.embeddings import EMBEDDING_DIMENSIONS,embed_texts
+from utils.vector_writer import VectorWriter
+from utils.answer_cache import invalidate_index
+from utils.keyword_index import get_keyword_index
+from utils.upload_to_bucket import upload_to_bucket
+from utils.chunker import iter_chunks,chunk_text
+from utils.index_manifest import chunk_hash,diff_chunks,file_digest,load_manifest,save_manifest,manifest_lock
+from utils.transcription import iter_transcript
+from utils.pdf_extract import iter_pdf_pages
+from utils.text_extract import iter_text_file
+from utils.metrics import observe,timed_iter
+
+logger=logging.getLogger(__name__)
+
+
+def index_file(index_name:str,filename:str,path:str,key:str,chunks:list|None=None,source_hash:str|None=None) -> None:
+    # chunks/source_hash may come from prepare_chunks run ahead of time (e.g.
+    # while the bucket upload is in flight); otherwise they're computed here.
+
+    # Byte-identical re-upload under the same key: skip extraction entirely.
+    source_hash=source_hash or file_digest(path)
+    manifest=load_manifest(index_name,filename)
+    if manifest and manifest.get("source_hash")==source_hash and manifest.get("filekey")==key:
+        return {"status": "unchanged","chunks_indexed": len(manifest["chunks"]),"chunks_upserted": 0,"chunks_deleted": 0,"filename": filename}
+
+    if chunks is None:
+        chunks=extract_chunks(filename,path)
+    return sync_chunks(index_name,name=filename,id_prefix=f"{filename}_chunk_",filename=filename,key=key,chunks=chunks,source_hash=source_hash)
+
+
+def extract_chunks(filename:str,path:str) -> list:
+    ext = filename.rsplit('.', 1)[1].lower()
 
     if ext=='pdf':
-        extracted_text=extract_text_from_pdf(path)
+        segments=iter_pdf_pages(path)
     elif ext in ['docx','doc']:
-        extracted_text=extract_text_from_docx(path)
+        segments=[extract_text_from_docx(path)]
     elif ext in ['mp3','wav','m4a']:
-        extracted_text=transcribe_audio(path)
-        print("Transcription text: ",extracted_text)
+        segments=iter_transcript(path)
+    elif ext=='txt':
+        segments=iter_text_file(path)
     else:
         raise NotImplementedError(f"File type {ext} not supported yet.")
 
-    chunks=chunk_text(extracted_text)
-    vectors=[]
-    for i,chunk in enumerate(chunks):
-        if not chunk.strip():
-            continue
-
-        embedding=generate_embeddings(chunk)
-        print(file.filename)
-        vectors.append({
-            'id': f"{file.filename}_chunk_{i}",
-            'values': embedding,
-            'metadata': {
-                'filename': file.filename,
-                'filekey': key,
-                'chunk_index': i,
-                'text': chunk
-            }
-        })
-    index=get_index(index_name)
-    if vectors:
-        index.upsert(vectors=vectors)
-    os.remove(path)
-    return {"status": "success","chunks_indexed": len(vectors),"filename": file.filename}
+    # Extraction is lazy and interleaves with chunking; timed_iter separates the two.
+    source=timed_iter(segments,"extract")
+    start=time.perf_counter()
+    chunks=[(i,chunk) for i,chunk in enumerate(iter_chunks(source)) if chunk.strip()]
+    observe("chunk",time.perf_counter()-start-source.seconds,len(chunks))
+    return chunks
+
+
+def prepare_chunks(index_name:str,filename:str,path:str) -> tuple:
+    # The extraction half of index_file, which doesn't need the bucket key.
+    # Returns (source_hash, chunks); chunks is None when the content matches
+    # the last indexed version, leaving index_file to confirm the key.
+    source_hash=file_digest(path)
+    manifest=load_manifest(index_name,filename)
+    if manifest and manifest.get("source_hash")==source_hash:
+        return source_hash,None
+    return source_hash,extract_chunks(filename,path)
 
 
 def index_image_caption(index_name:str,filename:str,caption:str,key:str)->None:
-    chunks=chunk_text(caption)
-    vectors=[]
-    for i,chunk in enumerate(chunks):
-        if not chunk.strip():
-            continue
-
-        embedding=generate_embeddings(chunk)
-        vectors.append({
-            'id': f"{filename}_caption_chunk_{i}",
-            'values': embedding,
-            'metadata': {
-                'filename': filename,
-                'filekey': key,
-                'chunk_index': i,
-                'text': chunk
-            }
-        })
-
-    index=get_index(index_name)
-    if vectors:
-        index.upsert(vectors=vectors)
-    return {"status": "success","chunks_indexed": len(vectors),"filename": filename}
-
-
-def extract_text_from_pdf(path:str) -> str:
-    text=""
-    with fitz.open(path) as doc:
-        for page in doc:
-            text+=page.get_text("text")
-    print("Fitz text: ",text)
-    if not text.strip():
-        pages= convert_from_path(path)
-        for page in pages:
-            text+=pytesseract.image_to_string(page)
-    print("Tesseract text: ",text)
-    return text
+    chunks=[(i,chunk) for i,chunk in enumerate(chunk_text(caption)) if chunk.strip()]
+    return sync_chunks(index_name,name=f"{filename}#caption",id_prefix=f"{filename}_caption_chunk_",filename=filename,key=key,chunks=chunks)
+
+
+def upload_and_index_image(img_bytes:bytes,filename:str,caption:str,index_name:str)->None:
+    res=upload_to_bucket(bucket_name="files_rag",file_obj=img_bytes,file_name=filename,index_name=index_name)
+    filekey=res.full_path
+    index_image_caption(index_name=index_name,filename=filename,caption=caption,key=filekey)
+
+
+def sync_chunks(index_name:str,name:str,id_prefix:str,filename:str,key:str,chunks:list,source_hash:str|None=None) -> dict:
+    # Upserts only chunks whose content hash differs from the last indexed
+    # version of this document and deletes ids that no longer exist.
+    current={f"{id_prefix}{i}": chunk_hash(chunk,key) for i,chunk in chunks}
+    with manifest_lock(index_name,name):
+        manifest=load_manifest(index_name,name)
+        index=get_index(index_name)
+        if manifest is None:
+            previous={chunk_id: None for chunk_id in list_vector_ids(index,id_prefix)}
+        else:
+            previous=manifest["chunks"]
+        changed,removed=diff_chunks(previous,current)
+        changed=set(changed)
+
+        pending=[(i,chunk) for i,chunk in chunks if f"{id_prefix}{i}" in changed]
+        embeddings=embed_texts([chunk for _,chunk in pending])
+        vectors=[]
+        for (i,chunk),embedding in zip(pending,embeddings):
+            vectors.append({
+                'id': f"{id_prefix}{i}",
+                'values': embedding,
+                'metadata': {
+                    'filename': filename,
+                    'filekey': key,
+                    'chunk_index': i,
+                    'text': chunk
+                }
+            })
+        writer=VectorWriter(index)
+        if vectors:
+            report=writer.upsert(vectors)
+            logger.info("Upserted %d vectors for %s in %d batches (%ss)",report['vectors'],filename,report['batches'],report['seconds'])
+        if removed:
+            writer.delete(removed)
+        keywords=get_keyword_index(index_name)
+        if vectors:
+            keywords.add([(v['id'],v['metadata']['text'],v['metadata']) for v in vectors])
+        if removed:
+            keywords.remove(removed)
+        if vectors or removed:
+            invalidate_index(index_name)
+        save_manifest(index_name,name,key,current,source_hash)
+    return {
+        "status": "success",
+        "chunks_indexed": len(current),
+        "chunks_upserted": len(vectors),
+        "chunks_deleted": len(removed),
+        "filename": filename
+    }
+
+
+def list_vector_ids(index,prefix:str) -> list:
+    # Documents indexed before manifests existed: ask the vector store which of their
+    # ids are live so shrunken documents don't keep stale tail chunks.
+    lister=getattr(index,"list",None)
+    if lister is None:
+        return []
+    try:
+        return [chunk_id for page in lister(prefix=prefix) for chunk_id in page]
+    except Exception as e:
+        logger.warning("Could not list vectors for prefix %s: %s",prefix,e)
+        return []
+
 
 def extract_text_from_docx(path:str) -> str:
     return docx2txt.process(path)
 
 def generate_embeddings(text:str):
-    response=openai_client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small",
-        dimensions=1536
-    )
-    embeddings=response.data[0].embedding
-    return embeddings
-
-def chunk_text(text:str,chunk_size:int=500,overlap:int=50,model:str="text-embedding-3-small"):
-    encoder=tiktoken.encoding_for_model(model)
-    tokens=encoder.encode(text)
-    chunks=[]
-    start=0
-
-    while start<len(tokens):
-        end=min(start+chunk_size,len(tokens))
-        chunk_tokens=tokens[start:end]
-        chunk_text=encoder.decode(chunk_tokens)
-        chunks.append(chunk_text)
-        start+= chunk_size-overlap
-    return chunks
-
-def get_index(index_name:str,dimension:int=1536):
-    print("Getting index:",index_name)
-    print("Index list: ",[i["name"] for i in pc.list_indexes()])
-    if index_name not in [i["name"] for i in pc.list_indexes()]:
-        print("Creating index:",index_name)
-        pc.create_index(
-            name=index_name,
-            dimension=dimension,
-            metric="cosine",
-            spec=ServerlessSpec(
-                cloud="aws",
-                region="us-east-1",
-            )
-        )
-    return pc.Index(index_name)
-
-
-def transcribe_audio(file_path:str)->str:
-    model=whisper.load_model("small")
-    result=model.transcribe(file_path)
-    return result["text"]
+    return embed_texts([text])[0]
 
+def get_index(index_name:str,dimension:int=EMBEDDING_DIMENSIONS):
+    return get_registry().get(check_index_name(index_name),dimension)
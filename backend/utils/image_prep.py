@@ -0,0 +1,38 @@
+import io
+import os
+from PIL import Image,ImageOps
+from dotenv import load_dotenv
+load_dotenv()
+
+# Images larger than this on either side, or heavier than IMAGE_MAX_BYTES,
+# are downscaled and re-encoded as JPEG before being sent to a model.
+IMAGE_MAX_SIDE=int(os.getenv("IMAGE_MAX_SIDE","1536"))
+IMAGE_MAX_BYTES=int(os.getenv("IMAGE_MAX_BYTES",str(4*1024*1024)))
+IMAGE_JPEG_QUALITY=int(os.getenv("IMAGE_JPEG_QUALITY","85"))
+
+_passthrough_formats={"JPEG": "image/jpeg","PNG": "image/png","WEBP": "image/webp"}
+
+
+def prepare_image(data:bytes) -> tuple:
+    # Returns (bytes, mime_type). Small images in a format the model takes
+    # as-is go through untouched; anything else is decoded once, rotated
+    # per EXIF, shrunk to IMAGE_MAX_SIDE and re-encoded. GIFs keep their
+    # first frame.
+    with Image.open(io.BytesIO(data)) as image:
+        fits=max(image.size)<=IMAGE_MAX_SIDE and len(data)<=IMAGE_MAX_BYTES
+        if fits and image.format in _passthrough_formats:
+            return data,_passthrough_formats[image.format]
+        image.seek(0)
+        image.draft("RGB",(IMAGE_MAX_SIDE,IMAGE_MAX_SIDE))
+        frame=ImageOps.exif_transpose(image)
+        if frame.mode in ("RGBA","LA") or (frame.mode=="P" and "transparency" in frame.info):
+            frame=frame.convert("RGBA")
+            background=Image.new("RGB",frame.size,(255,255,255))
+            background.paste(frame,mask=frame.getchannel("A"))
+            frame=background
+        elif frame.mode!="RGB":
+            frame=frame.convert("RGB")
+        frame.thumbnail((IMAGE_MAX_SIDE,IMAGE_MAX_SIDE),Image.Resampling.LANCZOS)
+        output=io.BytesIO()
+        frame.save(output,format="JPEG",quality=IMAGE_JPEG_QUALITY,optimize=True)
+        return output.getvalue(),"image/jpeg"
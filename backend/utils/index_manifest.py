@@ -0,0 +1,56 @@
+import os
+import json
+import hashlib
+import threading
+from utils.index_registry import check_index_name
+from dotenv import load_dotenv
+load_dotenv()
+
+INDEX_MANIFEST_DIR=os.getenv("INDEX_MANIFEST_DIR",".cache/manifests")
+
+_locks={}
+_locks_lock=threading.Lock()
+
+
+def chunk_hash(text:str,key:str) -> str:
+    # The filekey is part of the hash so a move re-upserts the metadata too.
+    return hashlib.sha256(f"{key}\x00{text}".encode("utf-8")).hexdigest()[:32]
+
+def manifest_path(index_name:str,name:str) -> str:
+    digest=hashlib.sha1(name.encode("utf-8")).hexdigest()
+    return os.path.join(INDEX_MANIFEST_DIR,check_index_name(index_name),f"{digest}.json")
+
+def manifest_lock(index_name:str,name:str) -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault((index_name,name),threading.Lock())
+
+def load_manifest(index_name:str,name:str) -> dict|None:
+    path=manifest_path(index_name,name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path,"r") as f:
+            return json.load(f)
+    except (OSError,ValueError):
+        return None
+
+def file_digest(path:str) -> str:
+    digest=hashlib.sha256()
+    with open(path,"rb") as f:
+        for block in iter(lambda: f.read(1<<20),b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def save_manifest(index_name:str,name:str,key:str,chunks:dict,source_hash:str|None=None) -> None:
+    path=manifest_path(index_name,name)
+    os.makedirs(os.path.dirname(path),exist_ok=True)
+    tmp=f"{path}.{os.getpid()}.tmp"
+    with open(tmp,"w") as f:
+        json.dump({"name": name,"filekey": key,"source_hash": source_hash,"chunks": chunks},f)
+    os.replace(tmp,path)
+
+def diff_chunks(previous:dict,current:dict) -> tuple:
+    # previous/current map vector id -> chunk hash
+    changed=[chunk_id for chunk_id,digest in current.items() if previous.get(chunk_id)!=digest]
+    removed=[chunk_id for chunk_id in previous if chunk_id not in current]
+    return changed,removed
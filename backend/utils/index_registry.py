@@ -0,0 +1,120 @@
+import os
+import re
+import time
+import logging
+import threading
+from pinecone import ServerlessSpec
+from dotenv import load_dotenv
+load_dotenv()
+
+logger=logging.getLogger(__name__)
+
+INDEX_LIST_TTL=float(os.getenv("PINECONE_INDEX_LIST_TTL","300"))
+PINECONE_CLOUD=os.getenv("PINECONE_CLOUD","aws")
+PINECONE_REGION=os.getenv("PINECONE_REGION","us-east-1")
+# Pinecone's rule for index names. The keyword index, manifests and answer
+# cache build file paths from the name, so they check it too.
+INDEX_NAME_PATTERN=re.compile(r"[a-z0-9-]{1,45}")
+
+
+def check_index_name(index_name:str) -> str:
+    if not isinstance(index_name,str) or not INDEX_NAME_PATTERN.fullmatch(index_name):
+        raise ValueError(f"Invalid index name {index_name!r}: use 1-45 lowercase letters, digits or hyphens")
+    return index_name
+
+
+class IndexRegistry:
+    # Process-wide memo of index handles and of which indexes exist, so the
+    # hot path doesn't pay for list_indexes() on every call. client is the
+    # Pinecone client or one of the local stand-ins from services.vector_store.
+
+    def __init__(self,client,ttl:float=INDEX_LIST_TTL):
+        self.client=client
+        self.ttl=ttl
+        self._handles={}
+        self._known=set()
+        self._refreshed_at=0.0
+        self._lock=threading.Lock()
+        self._create_locks={}
+
+    def _refresh(self) -> None:
+        names={i["name"] for i in self.client.list_indexes()}
+        with self._lock:
+            self._known=names
+            self._refreshed_at=time.monotonic()
+            for name in list(self._handles):
+                if name not in names:
+                    del self._handles[name]
+
+    def _stale(self) -> bool:
+        return time.monotonic()-self._refreshed_at>self.ttl
+
+    def _create_lock(self,index_name:str) -> threading.Lock:
+        with self._lock:
+            return self._create_locks.setdefault(index_name,threading.Lock())
+
+    def exists(self,index_name:str) -> bool:
+        if self._stale() or index_name not in self._known:
+            self._refresh()
+        return index_name in self._known
+
+    def _ensure(self,index_name:str,dimension:int) -> None:
+        if index_name in self._known and not self._stale():
+            return
+        if self.exists(index_name):
+            return
+        with self._create_lock(index_name):
+            # Another request may have created it while we waited.
+            if index_name in self._known:
+                return
+            logger.info("Creating index: %s",index_name)
+            try:
+                self.client.create_index(
+                    name=index_name,
+                    dimension=dimension,
+                    metric="cosine",
+                    spec=ServerlessSpec(
+                        cloud=PINECONE_CLOUD,
+                        region=PINECONE_REGION,
+                    )
+                )
+            except Exception:
+                # Lost the race to another worker process; fine if it now exists.
+                self._refresh()
+                if index_name not in self._known:
+                    raise
+            with self._lock:
+                self._known.add(index_name)
+
+    def get(self,index_name:str,dimension:int=1536):
+        handle=self._handles.get(index_name)
+        if handle is not None and not self._stale():
+            return handle
+        self._ensure(index_name,dimension)
+        with self._lock:
+            handle=self._handles.get(index_name)
+            if handle is None:
+                handle=self.client.Index(index_name)
+                self._handles[index_name]=handle
+            return handle
+
+    def invalidate(self,index_name:str|None=None) -> None:
+        with self._lock:
+            if index_name is None:
+                self._refreshed_at=0.0
+            else:
+                self._known.discard(index_name)
+                self._handles.pop(index_name,None)
+
+
+_registry=None
+_registry_lock=threading.Lock()
+
+def get_registry() -> IndexRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from services.vector_store import get_vector_client
+                _registry=IndexRegistry(get_vector_client())
+    return _registry
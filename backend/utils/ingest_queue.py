@@ -0,0 +1,144 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+load_dotenv()
+
+logger=logging.getLogger(__name__)
+
+INGEST_WORKERS=int(os.getenv("INGEST_WORKERS","2"))
+# Files of one job processed at the same time.
+INGEST_FILE_CONCURRENCY=int(os.getenv("INGEST_FILE_CONCURRENCY","4"))
+# Extraction and chunking (OCR and Whisper fan out further into their own pools).
+INGEST_CPU_WORKERS=int(os.getenv("INGEST_CPU_WORKERS",str(os.cpu_count() or 2)))
+# Bucket uploads, embedding and vector upserts: mostly waiting on the network.
+INGEST_IO_WORKERS=int(os.getenv("INGEST_IO_WORKERS","16"))
+# Finished jobs stay queryable for this long.
+INGEST_JOB_TTL=float(os.getenv("INGEST_JOB_TTL","3600"))
+
+
+class IngestJob:
+
+    def __init__(self,index_name:str,files:list,room:str|None=None,loop=None):
+        self.id=uuid.uuid4().hex
+        self.index_name=index_name
+        self.room=room
+        self.loop=loop
+        self.status="queued"
+        self.error=None
+        self.files=[{"filename": f["filename"],"status": "queued"} for f in files]
+        self.inputs=files
+        self.created_at=time.time()
+        self.updated_at=self.created_at
+        self.finished_at=None
+        self._lock=threading.Lock()
+
+    def update_file(self,position:int,**fields) -> None:
+        with self._lock:
+            self.files[position].update(fields)
+            self.updated_at=time.time()
+
+    def set_status(self,status:str,error:str|None=None) -> None:
+        with self._lock:
+            self.status=status
+            self.error=error
+            self.updated_at=time.time()
+            if status in ("completed","failed"):
+                self.finished_at=self.updated_at
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            done=sum(1 for f in self.files if f["status"] in ("indexed","failed"))
+            return {
+                "job_id": self.id,
+                "index_name": self.index_name,
+                "status": self.status,
+                "error": self.error,
+                "progress": {"done": done,"total": len(self.files)},
+                "files": [dict(f) for f in self.files],
+                "created_at": self.created_at,
+                "updated_at": self.updated_at
+            }
+
+
+class IngestQueue:
+
+    def __init__(self,workers:int=INGEST_WORKERS,job_ttl:float=INGEST_JOB_TTL):
+        self.job_ttl=job_ttl
+        self._executor=ThreadPoolExecutor(max_workers=max(1,workers),thread_name_prefix="ingest")
+        self._jobs={}
+        self._lock=threading.Lock()
+
+    def submit(self,job:IngestJob,runner) -> IngestJob:
+        self._expire()
+        with self._lock:
+            self._jobs[job.id]=job
+        self._executor.submit(self._run,job,runner)
+        return job
+
+    def get(self,job_id:str) -> IngestJob|None:
+        self._expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self,job:IngestJob,runner) -> None:
+        job.set_status("running")
+        self.notify(job)
+        try:
+            runner(job,self)
+            failed=all(f["status"]=="failed" for f in job.files)
+            job.set_status("failed" if failed else "completed")
+        except Exception as e:
+            job.set_status("failed",error=str(e))
+            logger.exception("Ingest job %s failed: %s",job.id,e)
+        self.notify(job)
+
+    def notify(self,job:IngestJob) -> None:
+        # Workers are plain threads; hand the emit back to the server's loop.
+        if not job.room or job.loop is None or job.loop.is_closed():
+            return
+        from services.realtime import sio
+        asyncio.run_coroutine_threadsafe(
+            sio.emit('ingest_progress',job.to_dict(),room=job.room),
+            job.loop
+        )
+
+    def _expire(self) -> None:
+        cutoff=time.time()-self.job_ttl
+        with self._lock:
+            for job_id in [i for i,j in self._jobs.items() if j.finished_at and j.finished_at<cutoff]:
+                del self._jobs[job_id]
+
+
+_queue=None
+_queue_lock=threading.Lock()
+
+def get_queue() -> IngestQueue:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue=IngestQueue()
+    return _queue
+
+
+_pools={}
+_pools_lock=threading.Lock()
+
+def _pool(name:str,workers:int) -> ThreadPoolExecutor:
+    with _pools_lock:
+        pool=_pools.get(name)
+        if pool is None:
+            pool=ThreadPoolExecutor(max_workers=max(1,workers),thread_name_prefix=f"ingest-{name}")
+            _pools[name]=pool
+        return pool
+
+def get_cpu_pool() -> ThreadPoolExecutor:
+    return _pool("cpu",INGEST_CPU_WORKERS)
+
+def get_io_pool() -> ThreadPoolExecutor:
+    return _pool("io",INGEST_IO_WORKERS)
@@ -0,0 +1,180 @@
+import os
+import re
+import math
+import json
+import zlib
+import sqlite3
+import threading
+from collections import Counter,OrderedDict
+from utils.index_registry import check_index_name
+from dotenv import load_dotenv
+load_dotenv()
+
+KEYWORD_INDEX_DIR=os.getenv("KEYWORD_INDEX_DIR",".cache/keyword_index")
+# Open sqlite connections kept around; the least recently used is let go past this.
+KEYWORD_INDEX_OPEN_MAX=int(os.getenv("KEYWORD_INDEX_OPEN_MAX","64"))
+BM25_K1=1.2
+BM25_B=0.75
+
+_token=re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_stopwords=frozenset(
+    "a an and are as at be but by for from has have how i in is it its of on or "
+    "that the their there this to was what when where which who why will with you".split()
+)
+
+
+def tokenize(text:str) -> list:
+    # Part numbers and error codes stay whole ("err-1042", "v2.3.1") and are
+    # also indexed by their pieces so "1042" alone still matches.
+    terms=[]
+    for token in _token.findall(text.lower()):
+        if token in _stopwords:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-_./]",token) if part and part not in _stopwords)
+    return terms
+
+def is_keyword_query(query:str) -> bool:
+    # Short queries made only of identifier-like tokens (codes, part numbers,
+    # ALL-CAPS names) are served from the keyword index alone.
+    raw=query.split()
+    if not raw or len(raw)>4:
+        return False
+    return all(
+        any(c.isdigit() for c in word) or any(c in "-_./" for c in word.strip("-_./")) or (word.isupper() and len(word)>1)
+        for word in raw
+    )
+
+
+class KeywordIndex:
+    # BM25 over one sqlite file per index: postings are clustered by term
+    # (WITHOUT ROWID), chunk text is zlib-compressed, and a query only reads
+    # the postings of its own terms.
+
+    def __init__(self,path:str):
+        self.path=path
+        os.makedirs(os.path.dirname(path) or ".",exist_ok=True)
+        self._db=sqlite3.connect(path,check_same_thread=False,isolation_level=None)
+        self._lock=threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    doc_id TEXT PRIMARY KEY,
+                    length INTEGER NOT NULL,
+                    metadata BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_id);
+                CREATE TABLE IF NOT EXISTS stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    doc_count INTEGER NOT NULL,
+                    total_length INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO stats VALUES (0, 0, 0);
+            """)
+
+    def _remove(self,doc_ids:list) -> None:
+        for doc_id in doc_ids:
+            row=self._db.execute("SELECT length FROM docs WHERE doc_id=?",(doc_id,)).fetchone()
+            if row is None:
+                continue
+            self._db.execute("DELETE FROM postings WHERE doc_id=?",(doc_id,))
+            self._db.execute("DELETE FROM docs WHERE doc_id=?",(doc_id,))
+            self._db.execute("UPDATE stats SET doc_count=doc_count-1,total_length=total_length-? WHERE id=0",(row[0],))
+
+    def add(self,documents:list) -> None:
+        # documents: (doc_id, text, metadata) tuples; existing ids are replaced.
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._remove([doc_id for doc_id,_,_ in documents])
+                for doc_id,text,metadata in documents:
+                    counts=Counter(tokenize(text))
+                    length=sum(counts.values())
+                    blob=zlib.compress(json.dumps(metadata).encode("utf-8"))
+                    self._db.execute("INSERT INTO docs VALUES (?,?,?)",(doc_id,length,blob))
+                    self._db.executemany(
+                        "INSERT INTO postings VALUES (?,?,?)",
+                        [(term,doc_id,tf) for term,tf in counts.items()]
+                    )
+                    self._db.execute("UPDATE stats SET doc_count=doc_count+1,total_length=total_length+? WHERE id=0",(length,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def remove(self,doc_ids:list) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._remove(doc_ids)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def search(self,query:str,top_k:int=5) -> list:
+        terms=set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            doc_count,total_length=self._db.execute("SELECT doc_count,total_length FROM stats WHERE id=0").fetchone()
+            if not doc_count:
+                return []
+            average=total_length/doc_count
+            scores=Counter()
+            for term in terms:
+                postings=self._db.execute(
+                    "SELECT p.doc_id,p.tf,d.length FROM postings p JOIN docs d ON d.doc_id=p.doc_id WHERE p.term=?",
+                    (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf=math.log(1+(doc_count-len(postings)+0.5)/(len(postings)+0.5))
+                for doc_id,tf,length in postings:
+                    scores[doc_id]+=idf*tf*(BM25_K1+1)/(tf+BM25_K1*(1-BM25_B+BM25_B*length/average))
+            top=scores.most_common(top_k)
+            results=[]
+            for doc_id,score in top:
+                blob=self._db.execute("SELECT metadata FROM docs WHERE doc_id=?",(doc_id,)).fetchone()[0]
+                results.append({"id": doc_id,"score": score,"metadata": json.loads(zlib.decompress(blob))})
+            return results
+
+
+_indexes=OrderedDict()
+_indexes_lock=threading.Lock()
+
+def get_keyword_index(index_name:str,create:bool=True) -> KeywordIndex|None:
+    # Opened on first use per index and kept in an LRU. An evicted index's
+    # connection closes once the last caller holding it is done. With
+    # create=False (the query path) a missing file gives None instead of a new
+    # empty index.
+    path=os.path.join(KEYWORD_INDEX_DIR,f"{check_index_name(index_name)}.sqlite")
+    with _indexes_lock:
+        index=_indexes.get(index_name)
+        if index is None:
+            if not create and not os.path.exists(path):
+                return None
+            index=KeywordIndex(path)
+            _indexes[index_name]=index
+        _indexes.move_to_end(index_name)
+        while len(_indexes)>KEYWORD_INDEX_OPEN_MAX:
+            _indexes.popitem(last=False)
+        return index
+
+
+def reciprocal_rank_fusion(rankings:list,k:int=60) -> list:
+    # rankings: lists of ids, best first. Returns (id, fused score) best first.
+    scores=Counter()
+    for ranking in rankings:
+        for rank,doc_id in enumerate(ranking):
+            scores[doc_id]+=1.0/(k+rank+1)
+    return scores.most_common()
@@ -0,0 +1,389 @@
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from utils.embedding_cache import _FileLock
+from utils.memory_index import Match,QueryResponse
+load_dotenv()
+
+LOCAL_VECTOR_DIR=os.getenv("LOCAL_VECTOR_DIR",".cache/vector_store")
+# float32 keeps exact scores; int8 stores a quarter of the bytes with a
+# per-row scale and loses well under 1% of cosine precision.
+LOCAL_VECTOR_QUANTIZATION=os.getenv("LOCAL_VECTOR_QUANTIZATION","float32")
+# Above this many live vectors queries go through an IVF index instead of a
+# full scan; ivf probes trade recall for speed.
+LOCAL_VECTOR_IVF_MIN_ROWS=int(os.getenv("LOCAL_VECTOR_IVF_MIN_ROWS","100000"))
+LOCAL_VECTOR_IVF_PROBES=int(os.getenv("LOCAL_VECTOR_IVF_PROBES","16"))
+LOCAL_VECTOR_BLOCK_ROWS=int(os.getenv("LOCAL_VECTOR_BLOCK_ROWS","65536"))
+LOCAL_VECTOR_COMPACT_MIN_ROWS=int(os.getenv("LOCAL_VECTOR_COMPACT_MIN_ROWS","1024"))
+
+_dtypes={"float32": np.float32,"int8": np.int8}
+
+
+def _unit_rows(values:np.ndarray) -> np.ndarray:
+    norms=np.linalg.norm(values,axis=1,keepdims=True)
+    return values/np.where(norms==0,1.0,norms)
+
+
+def _quantize(unit:np.ndarray) -> tuple:
+    scales=np.abs(unit).max(axis=1)/127.0
+    scales=np.where(scales==0,1.0,scales).astype(np.float32)
+    return np.rint(unit/scales[:,None]).astype(np.int8),scales
+
+
+class _IVF:
+    # Inverted file over unit vectors: spherical k-means centroids, one row
+    # list per centroid. Rows appended after the build are scanned directly.
+
+    def __init__(self,index,rows:np.ndarray,seed:int=0):
+        rng=np.random.default_rng(seed)
+        self.built_rows=len(index._row_ids)
+        nlist=max(1,int(np.sqrt(len(rows))))
+        sample=index._vectors(np.sort(rng.choice(rows,size=min(len(rows),nlist*64),replace=False)))
+        centroids=sample[rng.choice(len(sample),size=nlist,replace=False)]
+        for _ in range(10):
+            assignment=np.argmax(sample@centroids.T,axis=1)
+            for cluster in range(nlist):
+                members=sample[assignment==cluster]
+                if len(members):
+                    centroids[cluster]=members.sum(axis=0)
+            centroids=_unit_rows(centroids)
+        self.centroids=centroids.astype(np.float32)
+
+        assignment=np.empty(len(rows),dtype=np.int64)
+        for start in range(0,len(rows),LOCAL_VECTOR_BLOCK_ROWS):
+            block=rows[start:start+LOCAL_VECTOR_BLOCK_ROWS]
+            assignment[start:start+len(block)]=np.argmax(index._vectors(block)@self.centroids.T,axis=1)
+        order=np.argsort(assignment,kind="stable")
+        bounds=np.searchsorted(assignment[order],np.arange(nlist+1))
+        self.lists=[rows[order[bounds[i]:bounds[i+1]]] for i in range(nlist)]
+
+    def candidates(self,query:np.ndarray,total_rows:int,probes:int) -> np.ndarray:
+        probes=min(probes,len(self.lists))
+        nearest=np.argpartition(-(self.centroids@query),probes-1)[:probes]
+        return np.concatenate([self.lists[i] for i in nearest]+[np.arange(self.built_rows,total_rows)])
+
+
+class LocalVectorIndex:
+    # Pinecone-compatible index kept on local disk. Unit-normalised rows are
+    # appended to a flat vectors file that is read through a memory map, so
+    # cosine similarity is a dot product. records.jsonl is the metadata
+    # sidecar: one line per upsert or delete, written only after the rows it
+    # points at are flushed. Replaced and deleted rows are dead space until a
+    # compaction rewrites both files. Other processes pick up appends by
+    # reading the log tail and full rewrites by the log's inode changing.
+    # The vectors file is mapped under the same file lock as the log is read,
+    # so a compaction can never pair one layout with the other's rows.
+
+    def __init__(self,directory:str):
+        self.directory=directory
+        with open(os.path.join(directory,"index.json"),"r") as f:
+            config=json.load(f)
+        self.dimension=config["dimension"]
+        self.quantization=config.get("quantization","float32")
+        self.dtype=_dtypes[self.quantization]
+        self.vectors_path=os.path.join(directory,f"vectors.{'i8' if self.quantization=='int8' else 'f32'}")
+        self.scales_path=os.path.join(directory,"scales.f32")
+        self.records_path=os.path.join(directory,"records.jsonl")
+        self._lock=threading.RLock()
+        self._reset()
+        with self._file_lock():
+            self._sync()
+
+    def _reset(self) -> None:
+        self._rows={}
+        self._row_ids=[]
+        self._metadata=[]
+        self._alive=np.zeros(0,dtype=bool)
+        self._map=None
+        self._scales=None
+        self._ivf=None
+        self._log_inode=None
+        self._log_offset=0
+
+    def _file_lock(self,shared:bool=False):
+        return _FileLock(self.records_path+".lock",shared=shared)
+
+    def _row_bytes(self) -> int:
+        return self.dimension*np.dtype(self.dtype).itemsize
+
+    def _stored_rows(self) -> int:
+        if not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path)//self._row_bytes()
+
+    def _changed(self) -> bool:
+        try:
+            stat=os.stat(self.records_path)
+        except FileNotFoundError:
+            return self._log_inode is not None
+        return stat.st_ino!=self._log_inode or stat.st_size!=self._log_offset
+
+    def _sync(self) -> None:
+        # Caller holds the file lock.
+        try:
+            stat=os.stat(self.records_path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if stat.st_ino!=self._log_inode:
+            self._reset()
+            self._log_inode=stat.st_ino
+        if stat.st_size!=self._log_offset:
+            with open(self.records_path,"rb") as f:
+                f.seek(self._log_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self._apply(json.loads(line))
+                    self._log_offset+=len(line)
+            self._map=None
+            self._scales=None
+        # Map before the lock is released: the map pins the vectors file that
+        # matches these rows even if a compaction replaces it afterwards.
+        self._mapped()
+
+    def _apply(self,record:dict) -> None:
+        previous=self._rows.pop(record["id"],None)
+        if previous is not None:
+            self._alive[previous]=False
+            self._metadata[previous]=None
+        if record.get("deleted"):
+            return
+        row=record["row"]
+        if row>=len(self._row_ids):
+            grow=row+1-len(self._row_ids)
+            self._row_ids.extend([None]*grow)
+            self._metadata.extend([None]*grow)
+            if row>=len(self._alive):
+                self._alive=np.concatenate([self._alive,np.zeros(max(row+1-len(self._alive),len(self._alive)),dtype=bool)])
+        self._rows[record["id"]]=row
+        self._row_ids[row]=record["id"]
+        self._metadata[row]=record.get("metadata") or {}
+        self._alive[row]=True
+
+    def _refresh(self) -> None:
+        if self._changed():
+            with self._file_lock(shared=True):
+                self._sync()
+
+    def _mapped(self):
+        rows=len(self._row_ids)
+        if self._map is None or self._map.shape[0]<rows:
+            self._map=np.memmap(self.vectors_path,dtype=self.dtype,mode="r",shape=(rows,self.dimension)) if rows else np.zeros((0,self.dimension),dtype=self.dtype)
+            if self.quantization=="int8":
+                self._scales=np.memmap(self.scales_path,dtype=np.float32,mode="r",shape=(rows,)) if rows else np.zeros(0,dtype=np.float32)
+        return self._map
+
+    def _vectors(self,rows) -> np.ndarray:
+        block=np.asarray(self._mapped()[rows],dtype=np.float32)
+        if self.quantization=="int8":
+            block*=self._scales[rows][...,None]
+        return block
+
+    def _live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self._alive[:len(self._row_ids)])
+
+    def _append(self,records:list) -> None:
+        with open(self.records_path,"a") as f:
+            for record in records:
+                f.write(json.dumps(record)+"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def upsert(self,vectors:list,namespace:str|None=None):
+        if not vectors:
+            return {"upserted_count": 0}
+        values=np.asarray([vector["values"] for vector in vectors],dtype=np.float32)
+        if values.ndim!=2 or values.shape[1]!=self.dimension:
+            raise ValueError(f"Vector dimension {values.shape[-1]} does not match index dimension {self.dimension}")
+        unit=_unit_rows(values)
+        with self._lock,self._file_lock():
+            self._sync()
+            start=self._stored_rows()
+            if self.quantization=="int8":
+                unit,scales=_quantize(unit)
+                with open(self.scales_path,"r+b" if os.path.exists(self.scales_path) else "wb") as f:
+                    f.seek(start*4)
+                    f.write(scales.tobytes())
+                    f.truncate()
+            with open(self.vectors_path,"ab") as f:
+                f.write(unit.astype(self.dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._append([
+                {"id": vector["id"],"row": start+offset,"metadata": vector.get("metadata") or {}}
+                for offset,vector in enumerate(vectors)
+            ])
+            self._sync()
+            self._maybe_compact()
+        return {"upserted_count": len(vectors)}
+
+    def delete(self,ids:list|None=None,delete_all:bool=False,namespace:str|None=None):
+        with self._lock,self._file_lock():
+            self._sync()
+            targets=list(self._rows) if delete_all else [i for i in ids or [] if i in self._rows]
+            if targets:
+                self._append([{"id": chunk_id,"deleted": True} for chunk_id in targets])
+                self._sync()
+                self._maybe_compact()
+        return {}
+
+    def _maybe_compact(self) -> None:
+        live=len(self._rows)
+        dead=self._stored_rows()-live
+        if dead>max(LOCAL_VECTOR_COMPACT_MIN_ROWS,live):
+            self._compact()
+
+    def _compact(self) -> None:
+        # Caller holds both locks. Rewrites live rows densely and swaps the
+        # files in; readers holding the old memory map keep a valid view.
+        rows=self._live_rows()
+        mapped=self._mapped()
+        with open(self.vectors_path+".tmp","wb") as f:
+            for start in range(0,len(rows),LOCAL_VECTOR_BLOCK_ROWS):
+                f.write(np.asarray(mapped[rows[start:start+LOCAL_VECTOR_BLOCK_ROWS]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        if self.quantization=="int8":
+            with open(self.scales_path+".tmp","wb") as f:
+                f.write(np.asarray(self._scales[rows]).tobytes())
+        with open(self.records_path+".tmp","w") as f:
+            for new_row,row in enumerate(rows):
+                f.write(json.dumps({"id": self._row_ids[row],"row": new_row,"metadata": self._metadata[row]})+"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.vectors_path+".tmp",self.vectors_path)
+        if self.quantization=="int8":
+            os.replace(self.scales_path+".tmp",self.scales_path)
+        os.replace(self.records_path+".tmp",self.records_path)
+        self._sync()
+
+    def fetch(self,ids:list,namespace:str|None=None) -> dict:
+        with self._lock:
+            self._refresh()
+            return {
+                "vectors": {
+                    i: {"id": i,"values": self._vectors([self._rows[i]])[0].tolist(),"metadata": self._metadata[self._rows[i]]}
+                    for i in ids if i in self._rows
+                }
+            }
+
+    def list(self,prefix:str="",namespace:str|None=None):
+        with self._lock:
+            self._refresh()
+            ids=[i for i in self._rows if i.startswith(prefix)]
+        for start in range(0,len(ids),100):
+            yield ids[start:start+100]
+
+    def _ivf_candidates(self,query:np.ndarray,live:int) -> np.ndarray|None:
+        if live<LOCAL_VECTOR_IVF_MIN_ROWS:
+            self._ivf=None
+            return None
+        total=len(self._row_ids)
+        if self._ivf is None or total-self._ivf.built_rows>0.2*self._ivf.built_rows:
+            self._ivf=_IVF(self,self._live_rows())
+        candidates=self._ivf.candidates(query,total,LOCAL_VECTOR_IVF_PROBES)
+        return candidates[self._alive[candidates]]
+
+    def _scan(self,query:np.ndarray,rows:np.ndarray|None) -> tuple:
+        # Scores in fixed-size blocks so int8 rows are never widened all at once.
+        total=len(self._row_ids)
+        scored_rows=[]
+        scores=[]
+        for start in range(0,total if rows is None else len(rows),LOCAL_VECTOR_BLOCK_ROWS):
+            if rows is None:
+                block=np.arange(start,min(start+LOCAL_VECTOR_BLOCK_ROWS,total))
+                block=block[self._alive[block]]
+            else:
+                block=np.sort(rows[start:start+LOCAL_VECTOR_BLOCK_ROWS])
+            if len(block):
+                scored_rows.append(block)
+                scores.append(self._vectors(block)@query)
+        if not scores:
+            return np.zeros(0,dtype=np.int64),np.zeros(0,dtype=np.float32)
+        return np.concatenate(scored_rows),np.concatenate(scores)
+
+    def query(self,vector,top_k:int=10,include_metadata:bool=False,include_values:bool=False,namespace:str|None=None,**kwargs) -> QueryResponse:
+        query=np.asarray(vector,dtype=np.float32)
+        norm=np.linalg.norm(query)
+        query=query/norm if norm else query
+        with self._lock:
+            self._refresh()
+            if not self._rows:
+                return QueryResponse([])
+            rows,scores=self._scan(query,self._ivf_candidates(query,len(self._rows)))
+            k=min(top_k,len(scores))
+            if not k:
+                return QueryResponse([])
+            top=np.argpartition(-scores,k-1)[:k]
+            top=top[np.argsort(-scores[top])]
+            return QueryResponse([
+                Match(
+                    id=self._row_ids[rows[i]],
+                    score=float(scores[i]),
+                    values=self._vectors([rows[i]])[0].tolist() if include_values else None,
+                    metadata=dict(self._metadata[rows[i]]) if include_metadata else None
+                )
+                for i in top
+            ])
+
+    def describe_index_stats(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return {
+                "dimension": self.dimension,
+                "total_vector_count": len(self._rows),
+                "stored_rows": self._stored_rows(),
+                "quantization": self.quantization
+            }
+
+
+class LocalVectorClient:
+    # The slice of the Pinecone client surface IndexRegistry uses, backed by
+    # one directory per index under LOCAL_VECTOR_DIR.
+
+    def __init__(self,directory:str=LOCAL_VECTOR_DIR,quantization:str=LOCAL_VECTOR_QUANTIZATION):
+        if quantization not in _dtypes:
+            raise ValueError(f"Unknown LOCAL_VECTOR_QUANTIZATION {quantization!r}")
+        self.directory=directory
+        self.quantization=quantization
+        self._indexes={}
+        self._lock=threading.Lock()
+        os.makedirs(directory,exist_ok=True)
+
+    def list_indexes(self) -> list:
+        return [
+            {"name": name}
+            for name in sorted(os.listdir(self.directory))
+            if os.path.exists(os.path.join(self.directory,name,"index.json"))
+        ]
+
+    def create_index(self,name:str,dimension:int,metric:str="cosine",spec=None,**kwargs) -> None:
+        if metric!="cosine":
+            raise ValueError("The local vector store only supports the cosine metric")
+        path=os.path.join(self.directory,name)
+        if os.path.exists(os.path.join(path,"index.json")):
+            raise ValueError(f"Index {name} already exists")
+        os.makedirs(path,exist_ok=True)
+        with open(os.path.join(path,"index.json.tmp"),"w") as f:
+            json.dump({"dimension": dimension,"metric": metric,"quantization": self.quantization},f)
+        os.replace(os.path.join(path,"index.json.tmp"),os.path.join(path,"index.json"))
+
+    def Index(self,name:str) -> LocalVectorIndex:
+        with self._lock:
+            index=self._indexes.get(name)
+            if index is None:
+                path=os.path.join(self.directory,name)
+                if not os.path.exists(os.path.join(path,"index.json")):
+                    raise ValueError(f"Index {name} does not exist")
+                index=LocalVectorIndex(path)
+                self._indexes[name]=index
+            return index
+
+    def delete_index(self,name:str) -> None:
+        with self._lock:
+            self._indexes.pop(name,None)
+            shutil.rmtree(os.path.join(self.directory,name),ignore_errors=True)
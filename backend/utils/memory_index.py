@@ -0,0 +1,172 @@
+import time
+import random
+import threading
+import numpy as np
+
+
+class Match:
+
+    def __init__(self,id:str,score:float,values=None,metadata=None):
+        self.id=id
+        self.score=score
+        self.values=values
+        self.metadata=metadata
+
+    def __getitem__(self,key):
+        return getattr(self,key)
+
+
+class QueryResponse:
+
+    def __init__(self,matches:list):
+        self.matches=matches
+
+    def __getitem__(self,key):
+        return getattr(self,key)
+
+
+class InMemoryIndex:
+    # Stand-in for a Pinecone Index handle: the same upsert/query/delete/fetch/list
+    # surface, kept in process. latency and failure_rate simulate a remote index
+    # for load-testing writers without network access.
+
+    def __init__(self,dimension:int=1536,latency:float=0.0,failure_rate:float=0.0,seed:int|None=None):
+        self.dimension=dimension
+        self.latency=latency
+        self.failure_rate=failure_rate
+        self.requests=0
+        self.failures=0
+        self._ids=[]
+        self._rows={}
+        self._metadata=[]
+        self._buffer=np.zeros((0,dimension),dtype=np.float32)
+        self._lock=threading.Lock()
+        self._rng=random.Random(seed)
+
+    def _request(self) -> None:
+        with self._lock:
+            self.requests+=1
+            fail=self.failure_rate and self._rng.random()<self.failure_rate
+            if fail:
+                self.failures+=1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError("simulated index failure")
+
+    def _grow(self,needed:int) -> None:
+        capacity=self._buffer.shape[0]
+        if needed<=capacity:
+            return
+        buffer=np.zeros((max(needed,capacity*2,64),self.dimension),dtype=np.float32)
+        buffer[:len(self._ids)]=self._buffer[:len(self._ids)]
+        self._buffer=buffer
+
+    @property
+    def _vectors(self):
+        return self._buffer[:len(self._ids)]
+
+    def upsert(self,vectors:list,namespace:str|None=None):
+        self._request()
+        with self._lock:
+            for vector in vectors:
+                values=np.asarray(vector["values"],dtype=np.float32)
+                if values.shape!=(self.dimension,):
+                    raise ValueError(f"Vector dimension {values.shape[0]} does not match index dimension {self.dimension}")
+                row=self._rows.get(vector["id"])
+                if row is None:
+                    row=len(self._ids)
+                    self._grow(row+1)
+                    self._ids.append(vector["id"])
+                    self._metadata.append(None)
+                    self._rows[vector["id"]]=row
+                self._buffer[row]=values
+                self._metadata[row]=vector.get("metadata") or {}
+        return {"upserted_count": len(vectors)}
+
+    def delete(self,ids:list|None=None,delete_all:bool=False,namespace:str|None=None):
+        self._request()
+        with self._lock:
+            for chunk_id in list(self._ids) if delete_all else ids or []:
+                row=self._rows.pop(chunk_id,None)
+                if row is None:
+                    continue
+                # Move the last row into the hole so storage stays dense.
+                last=len(self._ids)-1
+                if row!=last:
+                    moved=self._ids[last]
+                    self._buffer[row]=self._buffer[last]
+                    self._ids[row]=moved
+                    self._metadata[row]=self._metadata[last]
+                    self._rows[moved]=row
+                self._ids.pop()
+                self._metadata.pop()
+        return {}
+
+    def fetch(self,ids:list,namespace:str|None=None) -> dict:
+        self._request()
+        with self._lock:
+            return {
+                "vectors": {
+                    i: {"id": i,"values": self._vectors[self._rows[i]].tolist(),"metadata": self._metadata[self._rows[i]]}
+                    for i in ids if i in self._rows
+                }
+            }
+
+    def list(self,prefix:str="",namespace:str|None=None):
+        with self._lock:
+            ids=[i for i in self._ids if i.startswith(prefix)]
+        for start in range(0,len(ids),100):
+            yield ids[start:start+100]
+
+    def query(self,vector,top_k:int=10,include_metadata:bool=False,include_values:bool=False,namespace:str|None=None,**kwargs) -> QueryResponse:
+        self._request()
+        with self._lock:
+            if not self._ids:
+                return QueryResponse([])
+            query=np.asarray(vector,dtype=np.float32)
+            norms=np.linalg.norm(self._vectors,axis=1)*(np.linalg.norm(query) or 1.0)
+            scores=(self._vectors@query)/np.where(norms==0,1.0,norms)
+            k=min(top_k,len(scores))
+            top=np.argpartition(-scores,k-1)[:k]
+            top=top[np.argsort(-scores[top])]
+            return QueryResponse([
+                Match(
+                    id=self._ids[row],
+                    score=float(scores[row]),
+                    values=self._vectors[row].tolist() if include_values else None,
+                    metadata=dict(self._metadata[row]) if include_metadata else None
+                )
+                for row in top
+            ])
+
+    def describe_index_stats(self) -> dict:
+        return {"dimension": self.dimension,"total_vector_count": len(self._ids)}
+
+
+class InMemoryClient:
+    # Client counterpart of InMemoryIndex for VECTOR_STORE=memory; nothing
+    # survives the process.
+
+    def __init__(self):
+        self._indexes={}
+        self._lock=threading.Lock()
+
+    def list_indexes(self) -> list:
+        return [{"name": name} for name in self._indexes]
+
+    def create_index(self,name:str,dimension:int,metric:str="cosine",spec=None,**kwargs) -> None:
+        with self._lock:
+            if name in self._indexes:
+                raise ValueError(f"Index {name} already exists")
+            self._indexes[name]=InMemoryIndex(dimension=dimension)
+
+    def Index(self,name:str) -> InMemoryIndex:
+        index=self._indexes.get(name)
+        if index is None:
+            raise ValueError(f"Index {name} does not exist")
+        return index
+
+    def delete_index(self,name:str) -> None:
+        with self._lock:
+            self._indexes.pop(name,None)
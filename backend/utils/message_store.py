@@ -0,0 +1,174 @@
+import os
+import time
+import asyncio
+import logging
+from utils.metrics import count_error,observe
+from dotenv import load_dotenv
+load_dotenv()
+
+logger=logging.getLogger(__name__)
+
+# Rows per insert and the longest a message waits in the buffer.
+MESSAGE_BATCH_SIZE=int(os.getenv("MESSAGE_BATCH_SIZE","200"))
+MESSAGE_FLUSH_INTERVAL=float(os.getenv("MESSAGE_FLUSH_INTERVAL","0.5"))
+# While the database is failing rows are kept for retry up to this many; past
+# it the oldest are dropped rather than growing without bound.
+MESSAGE_BUFFER_MAX=int(os.getenv("MESSAGE_BUFFER_MAX","50000"))
+MESSAGE_RETRY_DELAY=float(os.getenv("MESSAGE_RETRY_DELAY","2.0"))
+
+MESSAGE_COLUMNS=("id","conversation_id","sender_id","type","content","created_at","reply_to_message_id")
+
+
+def is_permanent_error(error:Exception) -> bool:
+    # Errors the same rows will hit again on retry: Postgres data (22xxx),
+    # integrity (23xxx) and access/schema (42xxx) errors, and PostgREST request
+    # errors (PGRST1xx/2xx, or a bare 4xx when the body wasn't JSON). Network
+    # errors, 5xx, connection (PGRST0xx) and auth (PGRST3xx) errors are
+    # retried, since the next attempt can succeed.
+    from postgrest.exceptions import APIError
+    if not isinstance(error,APIError):
+        return False
+    code=str(error.code or "")
+    if code.isdigit() and len(code)==3:
+        return 400<=int(code)<500 and int(code) not in (408,429)
+    if code.startswith("PGRST"):
+        return code[5:6] in ("1","2")
+    return code[:2] in ("22","23","42")
+
+
+def default_insert(rows:list) -> None:
+    from services.supabase import supabase
+    supabase.table("messages").insert(rows).execute()
+
+
+class MessageWriter:
+    # Write-behind buffer for the messages table. add() only appends; a
+    # background task on the server's loop batch-inserts when MESSAGE_BATCH_SIZE
+    # rows are waiting or MESSAGE_FLUSH_INTERVAL has passed, and close() drains
+    # whatever is left on shutdown.
+
+    def __init__(
+        self,
+        insert=default_insert,
+        batch_size:int=MESSAGE_BATCH_SIZE,
+        flush_interval:float=MESSAGE_FLUSH_INTERVAL,
+        buffer_max:int=MESSAGE_BUFFER_MAX,
+        retry_delay:float=MESSAGE_RETRY_DELAY
+    ):
+        self.insert=insert
+        self.batch_size=max(1,batch_size)
+        self.flush_interval=flush_interval
+        self.buffer_max=max(self.batch_size,buffer_max)
+        self.retry_delay=retry_delay
+        self._buffer=[]
+        self._wakeup=None
+        self._task=None
+        self._closed=False
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._closed=False
+            self._wakeup=asyncio.Event()
+            self._task=asyncio.get_running_loop().create_task(self._run())
+
+    def add(self,row:dict) -> None:
+        if self._closed:
+            raise RuntimeError("MessageWriter is closed")
+        self.start()
+        self._buffer.append({k: row.get(k) for k in MESSAGE_COLUMNS if row.get(k) is not None})
+        if len(self._buffer)>self.buffer_max:
+            dropped=len(self._buffer)-self.buffer_max
+            del self._buffer[:dropped]
+            count_error("message_persist")
+            logger.error("Message buffer full, dropped %d unsaved messages",dropped)
+        if len(self._buffer)>=self.batch_size:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def _insert(self,rows:list) -> None:
+        start=time.perf_counter()
+        await asyncio.to_thread(self.insert,rows)
+        observe("message_persist",time.perf_counter()-start,len(rows))
+
+    async def _flush_batch(self) -> bool:
+        # A permanent error splits the batch in halves until the rows that
+        # cause it are isolated and dropped, so one bad message can't hold up
+        # the ones behind it. A transient error puts everything not yet
+        # written back in front, in order, for the retry.
+        batch=self._buffer[:self.batch_size]
+        del self._buffer[:len(batch)]
+        pending=[batch]
+        while pending:
+            rows=pending.pop(0)
+            try:
+                await self._insert(rows)
+            except Exception as e:
+                count_error("message_persist")
+                if not is_permanent_error(e):
+                    self._buffer[:0]=[row for part in [rows]+pending for row in part]
+                    logger.warning("Failed to persist %d messages, will retry: %s",len(rows),e)
+                    return False
+                if len(rows)==1:
+                    logger.error("Dropping message %s that can't be stored: %s",rows[0].get("id"),e)
+                    continue
+                middle=len(rows)//2
+                pending[:0]=[rows[:middle],rows[middle:]]
+        return True
+
+    async def flush(self) -> bool:
+        while self._buffer:
+            if not await self._flush_batch():
+                return False
+        return True
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not await self.flush():
+                await asyncio.sleep(self.retry_delay)
+
+    async def close(self,attempts:int=3) -> None:
+        self._closed=True
+        if self._task is not None:
+            # Let an insert in flight finish rather than cancelling it halfway.
+            self._wakeup.set()
+            await self._task
+            self._task=None
+        for attempt in range(attempts):
+            if await self.flush():
+                return
+            await asyncio.sleep(min(self.retry_delay,0.5*(attempt+1)))
+        if self._buffer:
+            logger.error("Shutting down with %d unsaved messages",len(self._buffer))
+
+
+# public.message_type, less 'system', which only the server writes.
+MESSAGE_TYPES=("text","image","file")
+
+
+def message_row(conversation_id:str,sender_id:str,data:dict,message_id:str,created_at:str) -> dict:
+    return {
+        "id": message_id,
+        "conversation_id": conversation_id,
+        "sender_id": sender_id,
+        "type": data.get("type") or "text",
+        "content": data.get("content"),
+        "created_at": created_at,
+        "reply_to_message_id": data.get("reply_to_message_id")
+    }
+
+
+_writer=None
+
+def get_message_writer() -> MessageWriter:
+    # Only touched from the server's event loop, so no lock.
+    global _writer
+    if _writer is None:
+        _writer=MessageWriter()
+    return _writer
@@ -0,0 +1,193 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+load_dotenv()
+
+METRICS_ENABLED=os.getenv("METRICS_ENABLED","true").lower()=="true"
+# Seconds; spans from a sub-millisecond cache hit to a minute-long OCR page.
+DEFAULT_BUCKETS=(0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0,30.0,60.0)
+
+
+def _format_labels(names:tuple,values:tuple,extra:dict|None=None) -> str:
+    pairs=list(zip(names,values))+list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped=(str(v).replace("\\","\\\\").replace('"','\\"').replace("\n","\\n") for _,v in pairs)
+    return "{"+",".join(f'{k}="{v}"' for (k,_),v in zip(pairs,escaped))+"}"
+
+
+def _format_value(value:float) -> str:
+    if value==float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value,float) else str(value)
+
+
+class Counter:
+
+    def __init__(self,name:str,documentation:str,labelnames:tuple=()):
+        self.name=name
+        self.documentation=documentation
+        self.labelnames=tuple(labelnames)
+        self._values={}
+        self._lock=threading.Lock()
+
+    def inc(self,amount:float=1,**labels) -> None:
+        key=tuple(str(labels.get(name,"")) for name in self.labelnames)
+        with self._lock:
+            self._values[key]=self._values.get(key,0)+amount
+
+    def collect(self) -> list:
+        lines=[f"# HELP {self.name} {self.documentation}",f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key,value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames,key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self,name:str,documentation:str,labelnames:tuple=(),buckets:tuple=DEFAULT_BUCKETS):
+        self.name=name
+        self.documentation=documentation
+        self.labelnames=tuple(labelnames)
+        self.buckets=tuple(sorted(buckets))
+        self._series={}
+        self._lock=threading.Lock()
+
+    def observe(self,value:float,**labels) -> None:
+        key=tuple(str(labels.get(name,"")) for name in self.labelnames)
+        slot=bisect.bisect_left(self.buckets,value)
+        with self._lock:
+            series=self._series.get(key)
+            if series is None:
+                series=self._series[key]=[[0]*(len(self.buckets)+1),0.0,0]
+            series[0][slot]+=1
+            series[1]+=value
+            series[2]+=1
+
+    def collect(self) -> list:
+        lines=[f"# HELP {self.name} {self.documentation}",f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key,(counts,total,count) in sorted(self._series.items()):
+                cumulative=0
+                for bound,bucket_count in zip(self.buckets+(float("inf"),),counts):
+                    cumulative+=bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames,key,{'le': _format_value(bound)})} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames,key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames,key)} {count}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics=[]
+
+    def register(self,metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4.
+        lines=[]
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines)+"\n"
+
+
+registry=Registry()
+
+stage_seconds=registry.register(Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in one unit of a pipeline stage (a file's extraction, an OCR page, an embedding batch, ...).",
+    ("stage",)
+))
+stage_items=registry.register(Counter(
+    "rag_stage_items_total",
+    "Items processed by a pipeline stage (pages, chunks, texts embedded, vectors written, ...).",
+    ("stage",)
+))
+stage_errors=registry.register(Counter(
+    "rag_stage_errors_total",
+    "Pipeline stage units that raised.",
+    ("stage",)
+))
+query_stage_seconds=registry.register(Histogram(
+    "rag_query_stage_duration_seconds",
+    "Per-request stage latency of /retrieve/query, as reported in its timings.",
+    ("stage",)
+))
+http_request_seconds=registry.register(Histogram(
+    "rag_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method","route","status")
+))
+
+
+def observe(stage:str,seconds:float,items:int|None=None) -> None:
+    if not METRICS_ENABLED:
+        return
+    stage_seconds.observe(seconds,stage=stage)
+    if items:
+        stage_items.inc(items,stage=stage)
+
+
+def count(stage:str,items:int=1) -> None:
+    if METRICS_ENABLED and items:
+        stage_items.inc(items,stage=stage)
+
+
+def count_error(stage:str) -> None:
+    if METRICS_ENABLED:
+        stage_errors.inc(stage=stage)
+
+
+@contextmanager
+def span(stage:str,items:int|None=None):
+    # Times the block under `stage`; works around awaits too. Errors are
+    # counted and re-raised.
+    start=time.perf_counter()
+    try:
+        yield
+    except Exception:
+        count_error(stage)
+        raise
+    finally:
+        observe(stage,time.perf_counter()-start,items)
+
+
+class timed_iter:
+    # Wraps a lazy producer (page or transcript iterators) and records the
+    # time spent inside it, excluding what the consumer does between items.
+
+    def __init__(self,iterable,stage:str):
+        self.iterable=iterable
+        self.stage=stage
+        self.seconds=0.0
+        self.items=0
+
+    def __iter__(self):
+        iterator=iter(self.iterable)
+        try:
+            while True:
+                start=time.perf_counter()
+                try:
+                    item=next(iterator)
+                except StopIteration:
+                    self.seconds+=time.perf_counter()-start
+                    break
+                except Exception:
+                    count_error(self.stage)
+                    raise
+                self.seconds+=time.perf_counter()-start
+                self.items+=1
+                yield item
+        finally:
+            observe(self.stage,self.seconds,self.items)
+
+
+def render() -> str:
+    return registry.render()
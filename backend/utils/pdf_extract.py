@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future,ProcessPoolExecutor
+from utils.metrics import count_error,observe
+from services.registry import registry
+from dotenv import load_dotenv
+load_dotenv()
+
+PDF_OCR_WORKERS=int(os.getenv("PDF_OCR_WORKERS",str(os.cpu_count() or 2)))
+PDF_OCR_DPI=int(os.getenv("PDF_OCR_DPI","200"))
+# Pages with fewer extractable characters than this are treated as scanned.
+PDF_OCR_MIN_CHARS=int(os.getenv("PDF_OCR_MIN_CHARS","1"))
+
+
+def _load_fitz():
+    import fitz
+    return fitz
+
+registry.register("fitz",_load_fitz)
+
+
+def _ocr_page(path:str,page_number:int,dpi:int) -> tuple:
+    # Runs in a worker process; rasterizes just this one page. Returns the
+    # text and the seconds spent, since metrics live in the parent.
+    import pytesseract
+    from pdf2image import convert_from_path
+    start=time.perf_counter()
+    images=convert_from_path(path,dpi=dpi,first_page=page_number,last_page=page_number)
+    try:
+        return "".join(pytesseract.image_to_string(image) for image in images),time.perf_counter()-start
+    finally:
+        for image in images:
+            image.close()
+
+
+def _page_text(item) -> str:
+    if not isinstance(item,Future):
+        return item
+    try:
+        text,seconds=item.result()
+    except Exception:
+        count_error("ocr")
+        raise
+    observe("ocr",seconds,1)
+    return text
+
+
+_pool=None
+_pool_lock=threading.Lock()
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool=ProcessPoolExecutor(
+                    max_workers=PDF_OCR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def iter_pdf_pages(path:str):
+    # Yields page text in page order. Text-less pages are OCR'd in the process
+    # pool while later pages are read; at most 2*PDF_OCR_WORKERS pages are held
+    # ahead of the consumer so memory stays bounded on long scans.
+    fitz=registry.get("fitz")
+    lookahead=max(1,PDF_OCR_WORKERS*2)
+    pending=deque()
+    with fitz.open(path) as doc:
+        for page in doc:
+            text=page.get_text("text")
+            if len(text.strip())<PDF_OCR_MIN_CHARS:
+                pending.append(get_ocr_pool().submit(_ocr_page,path,page.number+1,PDF_OCR_DPI))
+            else:
+                pending.append(text)
+            while pending and (not isinstance(pending[0],Future) or len(pending)>lookahead):
+                yield _page_text(pending.popleft())
+    while pending:
+        yield _page_text(pending.popleft())
+
+
+def extract_text_from_pdf(path:str) -> str:
+    return "".join(iter_pdf_pages(path))
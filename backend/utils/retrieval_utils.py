@@ -1,11 +1,14 @@
-from services.openai import openai_client
+from services.openai import openai_client,async_openai_client
 from services.supabase import supabase
+from utils.url_cache import SignedUrlCache
+from utils.context_builder import build_context
+from utils.metrics import span
+import logging
 
-def prepare_query(results:list)->str:
-    context=""
-    for res in results:
-        context+=res['text']+"\n\n"
-    return context
+logger=logging.getLogger(__name__)
+
+def prepare_query(results:list,vectors:dict|None=None)->str:
+    return build_context(results,vectors)["text"]
 
 
 def generate_prompt(context:str,query:str)->str:
@@ -17,31 +20,84 @@ Context:
 Question:
 {query}
 """
-    print(prompt)
+    logger.debug("Prompt: %s",prompt)
     return prompt
 
 
+SYSTEM_PROMPT=('You are an AI assistant helping '
+    'users find information from a knowledge base. '
+    'Use the following context to answer the question at the end. '
+    'If the context does not contain the answer, respond with "I don\'t know".'
+    'Also avoid including unnecessary or unwanted information.')
+
+def build_messages(prompt:str)->list:
+    return [
+        {"role":"system","content":SYSTEM_PROMPT},
+        {"role":"user","content":prompt}
+    ]
+
+
 def generate_response(prompt:str)->str:
-    response=openai_client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role":"system","content":'You are an AI assistant helping '
-                'users find information from a knowledge base. '
-                'Use the following context to answer the question at the end. '
-                'If the context does not contain the answer, respond with "I don\'t know".'
-                'Also avoid including unnecessary or unwanted information.'},
-            {"role":"user","content":prompt}
-        ],
-        max_tokens=500,
-        temperature=0.2,
-    )
-    print("LLM Response: ",response)
+    with span("llm"):
+        response=openai_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=build_messages(prompt),
+            max_tokens=500,
+            temperature=0.2,
+        )
+    logger.debug("LLM Response: %s",response)
     return response.choices[0].message.content
 
 
+def generate_response_stream(prompt:str):
+    # Yields content deltas as the model produces them.
+    with span("llm_stream"):
+        stream=openai_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=build_messages(prompt),
+            max_tokens=500,
+            temperature=0.2,
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+async def generate_response_async(prompt:str)->str:
+    with span("llm"):
+        response=await async_openai_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=build_messages(prompt),
+            max_tokens=500,
+            temperature=0.2,
+        )
+    return response.choices[0].message.content
+
+
+async def generate_response_stream_async(prompt:str):
+    with span("llm_stream"):
+        stream=await async_openai_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=build_messages(prompt),
+            max_tokens=500,
+            temperature=0.2,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+def sign_urls(bucket_name:str,object_keys:list,expiration_time:int)->list:
+    with span("sign_urls",items=len(object_keys)):
+        return supabase.storage.from_(bucket_name).create_signed_urls(
+            object_keys,expires_in=expiration_time
+        )
+
+url_cache=SignedUrlCache(sign_urls)
+
 def generate_presigned_urls(bucket_name:str,object_keys:list,expiration_time:int=3600)->list:
-    urls=supabase.storage.from_(bucket_name).create_signed_urls(
-        object_keys,expires_in=expiration_time
-    )
-    print(urls)
-    return urls
+    if not object_keys:
+        return []
+    return url_cache.get(bucket_name,object_keys,expiration_time)
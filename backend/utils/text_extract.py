@@ -0,0 +1,33 @@
+import os
+import mmap
+import codecs
+from dotenv import load_dotenv
+load_dotenv()
+
+TEXT_SEGMENT_BYTES=int(os.getenv("TEXT_SEGMENT_BYTES",str(1<<20)))
+
+
+def iter_text_file(path:str,segment_bytes:int=TEXT_SEGMENT_BYTES):
+    # Maps the file and yields it as UTF-8 text one segment at a time, cut
+    # after a newline or space where possible, so only one segment is ever
+    # held as a str. Undecodable bytes become U+FFFD rather than failing.
+    if os.path.getsize(path)==0:
+        return
+    with open(path,"rb") as f,mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as mapped:
+        decoder=codecs.getincrementaldecoder("utf-8")(errors="replace")
+        size=len(mapped)
+        start=len(codecs.BOM_UTF8) if mapped[:len(codecs.BOM_UTF8)]==codecs.BOM_UTF8 else 0
+        while start<size:
+            end=min(start+segment_bytes,size)
+            if end<size:
+                cut=mapped.rfind(b"\n",start,end)
+                if cut<=start:
+                    cut=mapped.rfind(b" ",start,end)
+                if cut>start:
+                    end=cut+1
+            yield decoder.decode(mapped[start:end],final=end>=size)
+            start=end
+
+
+def extract_text_from_txt(path:str) -> str:
+    return "".join(iter_text_file(path))
@@ -0,0 +1,128 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor,ProcessPoolExecutor
+import numpy as np
+from services.registry import registry
+from dotenv import load_dotenv
+load_dotenv()
+
+WHISPER_MODEL=os.getenv("WHISPER_MODEL","small")
+WHISPER_DEVICE=os.getenv("WHISPER_DEVICE") or None
+WHISPER_PRECISION=os.getenv("WHISPER_PRECISION","auto")
+WHISPER_LANGUAGE=os.getenv("WHISPER_LANGUAGE") or None
+WHISPER_POOL=os.getenv("WHISPER_POOL","thread")
+WHISPER_WORKERS=int(os.getenv("WHISPER_WORKERS","2"))
+WHISPER_SEGMENT_SECONDS=int(os.getenv("WHISPER_SEGMENT_SECONDS","600"))
+
+SAMPLE_RATE=16000
+# Segment cuts are nudged to the quietest 100ms frame within this many seconds
+# of the nominal boundary so we don't split words.
+CUT_SEARCH_SECONDS=3
+
+# Each worker owns its model. whisper installs kv-cache hooks on the model's
+# modules for every decode, so two threads decoding on one model at the same
+# time would read each other's cache.
+_local=threading.local()
+
+
+def _load_whisper():
+    # Just the package (and torch); models are loaded per worker on first use.
+    import whisper
+    return whisper
+
+registry.register("whisper",_load_whisper)
+
+
+def _use_fp16(device) -> bool:
+    if WHISPER_PRECISION=="fp16":
+        return True
+    if WHISPER_PRECISION=="fp32":
+        return False
+    return str(device).startswith("cuda")
+
+def _worker_model():
+    model=getattr(_local,"model",None)
+    if model is None:
+        import whisper
+        model=whisper.load_model(WHISPER_MODEL,device=WHISPER_DEVICE)
+        _local.model=model
+    return model
+
+def _transcribe_segment(audio) -> str:
+    model=_worker_model()
+    result=model.transcribe(audio,fp16=_use_fp16(model.device),language=WHISPER_LANGUAGE)
+    return result["text"]
+
+
+_pool=None
+_pool_lock=threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if WHISPER_POOL=="process":
+                    # spawn, not fork: forking a process that already holds torch state is unsafe
+                    _pool=ProcessPoolExecutor(
+                        max_workers=WHISPER_WORKERS,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    _pool=ThreadPoolExecutor(max_workers=WHISPER_WORKERS,thread_name_prefix="whisper")
+    return _pool
+
+def warm_up() -> None:
+    # Loads models ahead of the first upload instead of on it.
+    pool=get_pool()
+    futures=[pool.submit(_transcribe_segment,np.zeros(SAMPLE_RATE,dtype=np.float32)) for _ in range(WHISPER_WORKERS)]
+    for future in futures:
+        future.result()
+
+
+def _cut_points(audio,segment_samples:int) -> list:
+    frame=SAMPLE_RATE//10
+    search=CUT_SEARCH_SECONDS*SAMPLE_RATE
+    cuts=[0]
+    while len(audio)-cuts[-1]>segment_samples:
+        nominal=cuts[-1]+segment_samples
+        lo=max(cuts[-1]+frame,nominal-search)
+        hi=min(len(audio)-frame,nominal+search)
+        frames=(hi-lo)//frame
+        if frames<=0:
+            cuts.append(nominal)
+            continue
+        window=audio[lo:lo+frames*frame].reshape(frames,frame)
+        quietest=int(np.argmin((window*window).mean(axis=1)))
+        cuts.append(lo+quietest*frame+frame//2)
+    cuts.append(len(audio))
+    return cuts
+
+def split_audio(audio,segment_seconds:int=WHISPER_SEGMENT_SECONDS) -> list:
+    segment_samples=segment_seconds*SAMPLE_RATE
+    if len(audio)<=segment_samples:
+        return [audio]
+    cuts=_cut_points(audio,segment_samples)
+    return [audio[start:end] for start,end in zip(cuts,cuts[1:])]
+
+
+def iter_transcript(file_path:str):
+    # Yields each window's text in order as soon as it and its predecessors are done.
+    import whisper
+    audio=whisper.load_audio(file_path)
+    pool=get_pool()
+    futures=[pool.submit(_transcribe_segment,segment) for segment in split_audio(audio)]
+    del audio
+    for future in futures:
+        text=future.result().strip()
+        if text:
+            yield text+" "
+
+def transcribe_audio(file_path:str)->str:
+    return "".join(iter_transcript(file_path)).strip()
+
+async def transcribe_audio_async(file_path:str)->str:
+    loop=asyncio.get_running_loop()
+    return await loop.run_in_executor(None,transcribe_audio,file_path)
@@ -0,0 +1,41 @@
+import os
+import shutil
+import asyncio
+import tempfile
+from dotenv import load_dotenv
+load_dotenv()
+
+# Uploads are copied to disk this many bytes at a time.
+UPLOAD_CHUNK_BYTES=int(os.getenv("UPLOAD_CHUNK_BYTES",str(1<<20)))
+# Defaults to the system temp directory.
+UPLOAD_SPOOL_DIR=os.getenv("UPLOAD_SPOOL_DIR") or None
+
+
+def _copy(source,path:str) -> None:
+    source.seek(0)
+    with open(path,"wb") as f:
+        shutil.copyfileobj(source,f,UPLOAD_CHUNK_BYTES)
+
+
+async def spool_upload(upload_file,suffix:str="") -> str:
+    # Copies an UploadFile to a temp file of its own, which outlives the
+    # request, without reading it into memory. The caller owns the path;
+    # a partial file is removed if the copy fails.
+    if UPLOAD_SPOOL_DIR:
+        os.makedirs(UPLOAD_SPOOL_DIR,exist_ok=True)
+    fd,path=tempfile.mkstemp(suffix=suffix,prefix="upload-",dir=UPLOAD_SPOOL_DIR)
+    os.close(fd)
+    try:
+        await asyncio.to_thread(_copy,upload_file.file,path)
+    except BaseException:
+        remove_spooled(path)
+        raise
+    return path
+
+
+def remove_spooled(*paths:str) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
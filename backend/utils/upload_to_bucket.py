@@ -1,16 +1,23 @@
 from services.supabase import supabase
+from utils.metrics import span
 import mimetypes
+import logging
+
+logger=logging.getLogger(__name__)
 
 def upload_to_bucket(bucket_name: str, file_obj, file_name: str,index_name:str):
 
     try:
         file_type=get_content_type(file_name)
         file_path=f"{index_name}/{file_name}"
-        print("Uploading file to bucket at path:", file_path)
-        response = supabase.storage.from_(bucket_name).upload(path=file_path, file=file_obj,file_options={
-            "content-type": file_type
-        })
-        print("File uploaded to bucket successfully:", response)
+        logger.debug("Uploading file to bucket at path: %s", file_path)
+        with span("bucket_upload"):
+            response = supabase.storage.from_(bucket_name).upload(path=file_path, file=file_obj,file_options={
+                "content-type": file_type,
+                # re-uploads replace the object so the file can be re-indexed incrementally
+                "upsert": "true"
+            })
+        logger.debug("File uploaded to bucket successfully: %s", response)
         return response
     except Exception as e:
         raise Exception(f"Failed to upload file to bucket: {str(e)}")
@@ -19,5 +26,4 @@ def get_content_type(file_name: str) -> str:
     content_type, _ = mimetypes.guess_type(file_name)
     if content_type is None:
         content_type = "application/octet-stream"
-    print(content_type)
     return content_type
\ No newline at end of file
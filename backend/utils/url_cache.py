@@ -0,0 +1,72 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+load_dotenv()
+
+# A cached URL is only handed out if it stays valid at least this long, so a
+# client never receives a link that dies before it's clicked.
+URL_CACHE_MIN_TTL=float(os.getenv("URL_CACHE_MIN_TTL","600"))
+URL_CACHE_MAX_ENTRIES=int(os.getenv("URL_CACHE_MAX_ENTRIES","10000"))
+
+
+class SignedUrlCache:
+
+    def __init__(self,signer,min_ttl:float=URL_CACHE_MIN_TTL,max_entries:int=URL_CACHE_MAX_ENTRIES):
+        # signer(bucket_name, object_keys, expires_in) -> list of supabase signed-url dicts
+        self.signer=signer
+        self.min_ttl=min_ttl
+        self.max_entries=max_entries
+        self._entries=OrderedDict()
+        self._lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+
+    def _evict(self,now:float) -> None:
+        for key in [k for k,(_,expires_at) in self._entries.items() if expires_at-now<self.min_ttl]:
+            del self._entries[key]
+        while len(self._entries)>self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self,bucket_name:str,object_keys:list,expires_in:int=3600) -> list:
+        now=time.time()
+        found={}
+        with self._lock:
+            self._evict(now)
+            for key in object_keys:
+                entry=self._entries.get((bucket_name,key))
+                if entry is not None:
+                    self._entries.move_to_end((bucket_name,key))
+                    found[key]=dict(entry[0])
+        missing=[key for key in dict.fromkeys(object_keys) if key not in found]
+        self.hits+=len(object_keys)-len(missing)
+        self.misses+=len(missing)
+
+        if missing:
+            # Expiry is measured from before the request so we never overestimate it.
+            signed_at=time.time()
+            signed=self.signer(bucket_name,missing,expires_in)
+            with self._lock:
+                for key,entry in zip(missing,signed):
+                    key=entry.get("path") or key
+                    found[key]=entry
+                    if entry.get("error") or expires_in<=self.min_ttl:
+                        continue
+                    self._entries[(bucket_name,key)]=(dict(entry),signed_at+expires_in)
+                    self._entries.move_to_end((bucket_name,key))
+                self._evict(signed_at)
+        return [found[key] for key in object_keys if key in found]
+
+    def invalidate(self,bucket_name:str,object_key:str) -> None:
+        with self._lock:
+            self._entries.pop((bucket_name,object_key),None)
+
+    def stats(self) -> dict:
+        lookups=self.hits+self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits/lookups if lookups else 0.0,
+            "entries": len(self._entries)
+        }
@@ -0,0 +1,144 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+load_dotenv()
+
+# Shorter queries match by prefix, longer ones anywhere in the username
+# (must agree with min_contains_length in public.search_profiles).
+USER_SEARCH_MIN_CONTAINS=int(os.getenv("USER_SEARCH_MIN_CONTAINS","3"))
+# First pages fetch this many rows so that, when a query has few matches, the
+# whole set is cached and the next keystrokes are filtered locally.
+USER_SEARCH_PREFETCH=int(os.getenv("USER_SEARCH_PREFETCH","100"))
+# New signups show up in cached results after at most this long.
+USER_SEARCH_CACHE_TTL=float(os.getenv("USER_SEARCH_CACHE_TTL","30"))
+USER_SEARCH_CACHE_SIZE=int(os.getenv("USER_SEARCH_CACHE_SIZE","5000"))
+
+
+def sort_key(row:dict) -> tuple:
+    # The function's ORDER BY: lower(username), username, both in "C" order
+    # (UTF-8 byte order is code point order, which Python compares).
+    return (row["username"].lower(),row["username"])
+
+
+def fetch_profiles(query:str,after:str|None,limit:int) -> list:
+    from services.supabase import supabase
+    return supabase.rpc("search_profiles",{
+        "search_query": query,
+        "after_username": after,
+        "result_limit": limit,
+        "min_contains_length": USER_SEARCH_MIN_CONTAINS
+    }).execute().data
+
+
+class UserSearch:
+    # Keyset-paginated profile search with a cache of recent lookups. Each
+    # entry holds the rows for one normalized query from its start, plus
+    # whether that's every match. A query whose shorter ancestor (typeahead:
+    # "al" -> "ali" -> "alic") is cached complete is answered by filtering the
+    # ancestor's rows, without a round trip.
+
+    def __init__(
+        self,
+        fetch=fetch_profiles,
+        min_contains:int=USER_SEARCH_MIN_CONTAINS,
+        prefetch:int=USER_SEARCH_PREFETCH,
+        ttl:float=USER_SEARCH_CACHE_TTL,
+        max_entries:int=USER_SEARCH_CACHE_SIZE
+    ):
+        self.fetch=fetch
+        self.min_contains=min_contains
+        self.prefetch=prefetch
+        self.ttl=ttl
+        self.max_entries=max_entries
+        self._entries=OrderedDict()
+        self._lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+
+    def _matches(self,query:str,username:str) -> bool:
+        if len(query)<self.min_contains:
+            return username.lower().startswith(query)
+        return query in username.lower()
+
+    def _covers(self,ancestor:str,query:str) -> bool:
+        # Every match of query is a match of ancestor when both match the same
+        # way: a longer prefix narrows a prefix search, and a string containing
+        # ancestor narrows a substring search.
+        return (len(ancestor)<self.min_contains)==(len(query)<self.min_contains)
+
+    def _lookup(self,query:str,now:float):
+        # Deepest live entry on the path from query back to its first character.
+        for end in range(len(query),0,-1):
+            key=query[:end]
+            entry=self._entries.get(key)
+            if entry is None:
+                continue
+            if entry["expires_at"]<=now:
+                del self._entries[key]
+                continue
+            if key==query:
+                self._entries.move_to_end(key)
+                return entry
+            if entry["complete"] and self._covers(key,query):
+                self._entries.move_to_end(key)
+                rows=[row for row in entry["rows"] if self._matches(query,row["username"])]
+                derived={"rows": rows,"complete": True,"expires_at": entry["expires_at"]}
+                self._store(query,derived)
+                return derived
+        return None
+
+    def _store(self,query:str,entry:dict) -> None:
+        self._entries[query]=entry
+        self._entries.move_to_end(query)
+        while len(self._entries)>self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _page(rows:list,after:str|None,limit:int) -> tuple:
+        # Rows past the cursor, and whether the cached rows reach that far.
+        start=0
+        if after is not None:
+            cursor=(after.lower(),after)
+            start=next((i for i,row in enumerate(rows) if sort_key(row)>cursor),len(rows))
+        return rows[start:start+limit],start+limit<=len(rows)
+
+    def search(self,query:str,limit:int=10,after:str|None=None) -> list:
+        query=query.strip().lower()
+        if not query:
+            return []
+        now=time.monotonic()
+        with self._lock:
+            entry=self._lookup(query,now)
+            if entry is not None:
+                page,enough=self._page(entry["rows"],after,limit)
+                if enough or entry["complete"]:
+                    self.hits+=1
+                    return page
+        self.misses+=1
+
+        if after is None:
+            fetch_limit=max(limit,self.prefetch)
+            rows=self.fetch(query,None,fetch_limit)
+            with self._lock:
+                self._store(query,{"rows": rows,"complete": len(rows)<fetch_limit,"expires_at": now+self.ttl})
+            return rows[:limit]
+        # Deep pages past what's cached go straight to the keyset query.
+        return self.fetch(query,after,limit)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_search=None
+_search_lock=threading.Lock()
+
+def get_user_search() -> UserSearch:
+    global _search
+    if _search is None:
+        with _search_lock:
+            if _search is None:
+                _search=UserSearch()
+    return _search
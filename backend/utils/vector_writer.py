@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from utils.metrics import count_error,observe,span
+from dotenv import load_dotenv
+load_dotenv()
+
+VECTOR_UPSERT_BATCH_SIZE=int(os.getenv("VECTOR_UPSERT_BATCH_SIZE","100"))
+# Pinecone rejects upsert requests over 2MB; leave headroom for the envelope.
+VECTOR_UPSERT_MAX_BYTES=int(os.getenv("VECTOR_UPSERT_MAX_BYTES",str(1_800_000)))
+VECTOR_UPSERT_CONCURRENCY=int(os.getenv("VECTOR_UPSERT_CONCURRENCY","4"))
+VECTOR_UPSERT_MAX_RETRIES=int(os.getenv("VECTOR_UPSERT_MAX_RETRIES","4"))
+VECTOR_DELETE_BATCH_SIZE=1000
+
+_executor=ThreadPoolExecutor(max_workers=max(1,VECTOR_UPSERT_CONCURRENCY),thread_name_prefix="upsert")
+
+
+def estimate_vector_bytes(vector:dict) -> int:
+    # ~20 bytes per JSON float plus the serialized metadata and id.
+    metadata=json.dumps(vector.get("metadata") or {},ensure_ascii=False)
+    return len(vector["values"])*20+len(metadata.encode("utf-8"))+len(vector["id"])+64
+
+def make_batches(vectors:list,max_count:int=VECTOR_UPSERT_BATCH_SIZE,max_bytes:int=VECTOR_UPSERT_MAX_BYTES) -> list:
+    batches=[]
+    current=[]
+    current_bytes=0
+    for vector in vectors:
+        size=estimate_vector_bytes(vector)
+        if current and (len(current)>=max_count or current_bytes+size>max_bytes):
+            batches.append((current,current_bytes))
+            current=[]
+            current_bytes=0
+        current.append(vector)
+        current_bytes+=size
+    if current:
+        batches.append((current,current_bytes))
+    return batches
+
+
+class VectorWriteError(Exception):
+
+    def __init__(self,message:str,report:dict):
+        super().__init__(message)
+        self.report=report
+
+
+class VectorWriter:
+
+    def __init__(self,index,executor=None,max_retries:int=VECTOR_UPSERT_MAX_RETRIES,backoff_base:float=0.5,backoff_max:float=10.0):
+        self.index=index
+        self.executor=executor or _executor
+        self.max_retries=max_retries
+        self.backoff_base=backoff_base
+        self.backoff_max=backoff_max
+
+    def _with_retries(self,call) -> int:
+        attempt=0
+        while True:
+            attempt+=1
+            try:
+                call()
+                return attempt
+            except Exception:
+                if attempt>self.max_retries:
+                    raise
+                delay=min(self.backoff_max,self.backoff_base*(2**(attempt-1)))
+                time.sleep(delay*random.uniform(0.5,1.0))
+
+    def _upsert_batch(self,number:int,batch:list,size:int) -> dict:
+        start=time.perf_counter()
+        timing={"batch": number,"count": len(batch),"bytes": size}
+        try:
+            timing["attempts"]=self._with_retries(lambda: self.index.upsert(vectors=batch))
+            timing["ok"]=True
+        except Exception as e:
+            timing["attempts"]=self.max_retries+1
+            timing["ok"]=False
+            timing["error"]=str(e)
+        elapsed=time.perf_counter()-start
+        timing["seconds"]=round(elapsed,4)
+        observe("upsert",elapsed,len(batch) if timing["ok"] else None)
+        if not timing["ok"]:
+            count_error("upsert")
+        return timing
+
+    def upsert(self,vectors:list) -> dict:
+        # Every batch is attempted (and retried on its own) before any failure is raised.
+        start=time.perf_counter()
+        batches=make_batches(vectors)
+        futures=[self.executor.submit(self._upsert_batch,n,batch,size) for n,(batch,size) in enumerate(batches)]
+        timings=[future.result() for future in futures]
+        report={
+            "vectors": len(vectors),
+            "batches": len(batches),
+            "failed_batches": sum(1 for t in timings if not t["ok"]),
+            "retries": sum(t["attempts"]-1 for t in timings),
+            "seconds": round(time.perf_counter()-start,4),
+            "batch_timings": timings
+        }
+        if report["failed_batches"]:
+            errors="; ".join(t["error"] for t in timings if not t["ok"])
+            raise VectorWriteError(f"{report['failed_batches']} of {len(batches)} upsert batches failed: {errors}",report)
+        return report
+
+    def delete(self,ids:list) -> int:
+        batches=[ids[i:i+VECTOR_DELETE_BATCH_SIZE] for i in range(0,len(ids),VECTOR_DELETE_BATCH_SIZE)]
+        futures=[self.executor.submit(self._with_retries,lambda batch=batch: self.index.delete(ids=batch)) for batch in batches]
+        with span("delete",items=len(ids)):
+            for future in futures:
+                future.result()
+        return len(ids)